@@ -0,0 +1,120 @@
+"""
+Microbenchmark of the persistent response cache.
+
+Fills a SharedResponseCache file with responses shaped like JSON
+extraction results, then measures, in a fresh process, how long it takes
+to open the file and answer the first lookup and how long steady-state
+lookups take, on the disk tier alone and through the memory tier:
+
+    python benchmarks/bench_cache.py --entries 50000 --lookups 20000
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from grok_client.cache import ResponseCache, TieredCache, make_key  # noqa: E402
+from grok_client.shared_cache import SharedResponseCache  # noqa: E402
+
+
+def response(index, fields):
+    """A JSON extraction result of about ``fields`` fields"""
+    rng = random.Random(index)
+    words = ["invoice", "total", "customer", "address", "due", "paid", "item", "quantity", "price", "tax"]
+    record = {
+        f"{rng.choice(words)}_{field}": " ".join(rng.choice(words) for _ in range(rng.randint(1, 8)))
+        for field in range(fields)
+    }
+    return json.dumps({"id": index, "record": record}, indent=2)
+
+
+def key(index):
+    return make_key(model="grok-3", conversation=f"Extract the fields of document {index}")
+
+
+def fill(path, entries, fields):
+    cache = SharedResponseCache(path, max_entries=entries, max_bytes=1 << 40, ttl=86400)
+    raw = 0
+    elapsed = 0.0
+    for index in range(entries):
+        value = response(index, fields)
+        lookup = key(index)
+        raw += len(value.encode("utf-8"))
+        started = time.perf_counter()
+        cache.set(lookup, value)
+        elapsed += time.perf_counter() - started
+    stored = cache.stats()["bytes"]
+    print(f"filled {entries} entries in {elapsed:.1f}s ({elapsed / entries * 1e6:.0f} us/set)")
+    print(f"{raw / 1e6:.1f} MB of responses stored in {stored / 1e6:.1f} MB ({raw / stored:.1f}x), "
+          f"file {os.path.getsize(path) / 1e6:.1f} MB")
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def probe(path, entries, lookups):
+    """Runs in a fresh process: time the first lookup, then steady-state ones"""
+    lookup = key(entries // 2)
+    started = time.perf_counter()
+    disk = SharedResponseCache(path, max_entries=entries, max_bytes=1 << 40, ttl=86400)
+    opened = time.perf_counter()
+    assert disk.get(lookup) is not None
+    print(f"cold process: open {(opened - started) * 1e3:.2f} ms, "
+          f"first lookup {(time.perf_counter() - opened) * 1e3:.3f} ms")
+
+    rng = random.Random(0)
+    # Zipf-ish traffic: most lookups go to a small set of hot responses
+    indexes = [min(entries - 1, int(rng.paretovariate(1.2)) - 1) for _ in range(lookups)]
+    tiers = [
+        ("disk tier", disk),
+        ("memory + disk tiers", TieredCache(ResponseCache(max_entries=1024), disk)),
+    ]
+    for name, cache in tiers:
+        samples = []
+        for index in indexes:
+            lookup = key(index)
+            started = time.perf_counter()
+            value = cache.get(lookup)
+            samples.append(time.perf_counter() - started)
+            assert value is not None
+        print(f"{name:<20} p50 {percentile(samples, 50) * 1e6:7.1f} us  p99 {percentile(samples, 99) * 1e6:7.1f} us")
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the persistent response cache")
+    parser.add_argument("--entries", type=int, default=50000, help="Cached responses (default: 50000)")
+    parser.add_argument("--fields", type=int, default=20, help="Fields per JSON response (default: 20)")
+    parser.add_argument("--lookups", type=int, default=20000, help="Timed lookups (default: 20000)")
+    parser.add_argument("--path", help="Cache file (default: a temporary file)")
+    parser.add_argument("--probe", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    if args.probe:
+        probe(args.path, args.entries, args.lookups)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.path or os.path.join(directory, "cache.sqlite")
+        fill(path, args.entries, args.fields)
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--probe", "--path", path,
+             "--entries", str(args.entries), "--lookups", str(args.lookups)],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Microbenchmark of JSON-mode response handling.
+
+Compares the incremental JSONScanner, fed one streamed token at a time,
+with the post-hoc path it replaces (join the tokens, strip code fences
+with regexes, json.loads, json.dumps) on a fenced JSON answer followed
+by trailing chatter:
+
+    python benchmarks/bench_json.py --records 50 --repeat 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grok_client.client import GrokClient  # noqa: E402
+from grok_client.json_stream import JSONScanner  # noqa: E402
+
+
+def build_tokens(records, token_chars=4, trailing=400):
+    """A fenced JSON answer with trailing chatter, split into token-sized pieces"""
+    value = {
+        "records": [
+            {"id": index, "name": f"Record {index}", "tags": ["alpha", "beta"], "score": index * 0.5, "valid": True}
+            for index in range(records)
+        ]
+    }
+    text = "```json\n" + json.dumps(value, indent=2) + "\n```\n" + "Let me know if you need anything else. " * (trailing // 40)
+    return [text[i:i + token_chars] for i in range(0, len(text), token_chars)], len(text)
+
+
+def legacy(tokens):
+    """What the server did: clean, parse to validate, and wrap what did not parse"""
+    response = GrokClient._clean_json_response("".join(tokens).strip())
+    try:
+        json.loads(response)
+        return response
+    except json.JSONDecodeError:
+        return json.dumps({"response": response})
+
+
+def incremental(tokens):
+    scanner = JSONScanner()
+    parts = []
+    for token in tokens:
+        parts.append(scanner.feed(token))
+        if scanner.done:
+            break
+    parts.append(scanner.finish())
+    return "".join(parts)
+
+
+def measure(run, tokens, repeat):
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat // 5):
+            run(tokens)
+        best = min(best, (time.perf_counter() - start) / (repeat // 5))
+    return best
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark JSON-mode response handling")
+    parser.add_argument("--records", type=int, default=50, help="Records in the JSON answer (default: 50)")
+    parser.add_argument("--repeat", type=int, default=200, help="Responses per variant (default: 200)")
+    parser.add_argument("--trailing", type=int, default=400, help="Characters of chatter after the JSON (default: 400)")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Upstream generation rate (default: 50)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    tokens, size = build_tokens(args.records, trailing=args.trailing)
+    parsed = json.loads(incremental(tokens))
+    assert "records" in parsed, "the scanner did not extract the JSON value"
+    if "records" not in json.loads(legacy(tokens)):
+        print("(the post-hoc path wraps this answer in {\"response\": ...} because of the trailing text)")
+
+    consumed = 0
+    scanner = JSONScanner()
+    for token in tokens:
+        consumed += 1
+        scanner.feed(token)
+        if scanner.done:
+            break
+    skipped = len(tokens) - consumed
+    print(f"{size} characters in {len(tokens)} tokens; the scanner stops after {consumed} tokens, "
+          f"{skipped / args.tokens_per_second * 1e3:.0f} ms sooner at {args.tokens_per_second:g} tokens/s")
+    for name, run in (("join + regex + json.loads", legacy), ("JSONScanner per token", incremental)):
+        elapsed = measure(run, tokens, args.repeat)
+        print(f"{name:<28} {elapsed * 1e6:10.1f} us/response {elapsed / consumed * 1e6:6.2f} us/token")
+
+
+if __name__ == "__main__":
+    main()
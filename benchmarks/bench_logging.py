@@ -0,0 +1,120 @@
+"""
+Cost of logging in the streaming loop.
+
+Streams a synthetic Grok response through GrokClient.stream_message
+(with the HTTP response replaced by an in-memory body) under several
+logging setups, next to the original read loop that formatted every
+line, parsed frame and the growing response as DEBUG f-strings:
+
+    python benchmarks/bench_logging.py --tokens 2000 --repeat 10
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_parser import build_body, chunked  # noqa: E402
+from grok_client import GrokClient, logs  # noqa: E402
+
+legacy_logger = logging.getLogger("grok_client.legacy")
+
+
+class InMemoryResponse:
+    """Stands in for the streaming requests.Response of one upstream call"""
+
+    status_code = 200
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def iter_content(self, chunk_size=None):
+        return iter(self.chunks)
+
+    def close(self):
+        pass
+
+
+def legacy_loop(chunks):
+    """The original send_message loop, including its per-token DEBUG f-strings"""
+    full_response = ""
+    pending = b""
+    for chunk in chunks:
+        lines = (pending + chunk).splitlines()
+        pending = lines.pop() if lines and not chunk.endswith(b"\n") else b""
+        for line in lines:
+            if not line:
+                continue
+            decoded_line = line.decode("utf-8")
+            legacy_logger.debug(f"Received line: {decoded_line}")
+            json_data = json.loads(decoded_line)
+            legacy_logger.debug(f"Parsed JSON: {json_data}")
+            response_data = json_data.get("result", {}).get("response", {})
+            legacy_logger.debug(f"Response data: {response_data}")
+            if "modelResponse" in response_data:
+                return response_data["modelResponse"].get("message", "")
+            token = response_data.get("token", "")
+            if token:
+                full_response += token
+                legacy_logger.debug(f"Current response: {full_response}")
+    return full_response
+
+
+def measure(run, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark logging overhead of the streaming loop")
+    parser.add_argument("--tokens", type=int, default=2000, help="Tokens per response (default: 2000)")
+    parser.add_argument("--chunk-size", type=int, default=1400, help="Bytes per network read (default: 1400)")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per variant; the best is reported (default: 10)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    body, frames = build_body(args.tokens, 0)
+    chunks = chunked(body, args.chunk_size)
+
+    client = GrokClient({"sso": "benchmark", "sso-rw": "benchmark"})
+    client._open_stream = lambda message, conversation=None, session=None: InMemoryResponse(chunks)
+
+    def stream():
+        for _ in client.stream_message("benchmark"):
+            pass
+
+    devnull = open(os.devnull, "w")
+    variants = [
+        ("legacy loop, DEBUG off", lambda: legacy_loop(chunks), dict(level="INFO")),
+        ("legacy loop, DEBUG on", lambda: legacy_loop(chunks), dict(level="DEBUG")),
+        ("stream_message, DEBUG off", stream, dict(level="INFO")),
+        ("stream_message, DEBUG text 1/100", stream, dict(level="DEBUG", sample=100)),
+        ("stream_message, DEBUG json 1/100", stream, dict(level="DEBUG", sample=100, json_output=True)),
+        ("stream_message, DEBUG json 1/1", stream, dict(level="DEBUG", sample=1, json_output=True)),
+    ]
+
+    print(f"{args.tokens} tokens, {frames} frames, {len(body)} bytes")
+    try:
+        for name, run, setup in variants:
+            logs.configure_logging(level=setup["level"], json_output=setup.get("json_output", False), stream=devnull)
+            logs.frame_sampler.every = setup.get("sample", 100)
+            elapsed = measure(run, args.repeat)
+            print(f"{name:<36} {elapsed * 1000:9.2f} ms/stream  {args.tokens / elapsed:>12,.0f} tokens/s")
+    finally:
+        devnull.close()
+
+
+if __name__ == "__main__":
+    main()
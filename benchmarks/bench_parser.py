@@ -0,0 +1,146 @@
+"""
+Microbenchmark of the upstream NDJSON frame parser.
+
+Replays a synthetic Grok response body, split into network-sized
+chunks, through the read loop the client used before FrameParser
+(line splitting, str decode, json.loads and per-frame debug f-strings)
+and through FrameParser with each available JSON backend:
+
+    python benchmarks/bench_parser.py --tokens 2000 --repeat 20
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grok_client import stream_parser  # noqa: E402
+from grok_client.stream_parser import FrameParser  # noqa: E402
+
+logger = logging.getLogger("bench_parser")
+
+
+def build_body(tokens, metadata_frames):
+    """Build a response body shaped like a grok.com stream"""
+    frames = [
+        {"result": {"conversation": {"conversationId": "5b4c0bd5-3e1c-4b8e-9d3a-1f0e8f1d2c3b"}}},
+        {"result": {"response": {"userResponse": {"message": "Explain NDJSON", "sender": "human"}}}},
+    ]
+    for index in range(tokens):
+        frames.append({"result": {"response": {
+            "token": f"word{index % 97} ",
+            "isThinking": False,
+            "isSoftStop": False,
+            "responseId": "0f6c1e2d-8a7b-4c5d-9e0f-a1b2c3d4e5f6",
+        }}})
+        if metadata_frames and index % metadata_frames == 0:
+            frames.append({"result": {"response": {"webSearchResults": {"results": [
+                {"url": "https://example.com/page", "title": "Example", "preview": "x" * 200}
+            ]}}}})
+    frames.append({"result": {"response": {"modelResponse": {
+        "responseId": "0f6c1e2d-8a7b-4c5d-9e0f-a1b2c3d4e5f6",
+        "message": "".join(f"word{index % 97} " for index in range(tokens)),
+        "sender": "ASSISTANT",
+    }}}})
+    body = b"".join(json.dumps(frame).encode("utf-8") + b"\n" for frame in frames)
+    return body, len(frames)
+
+
+def chunked(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+def legacy_loop(chunks):
+    """The per-line loop of the original GrokClient.send_message"""
+    tokens = []
+    pending = b""
+    for chunk in chunks:
+        # What requests' iter_lines does with each chunk
+        lines = (pending + chunk).splitlines()
+        pending = lines.pop() if lines and not chunk.endswith(b"\n") else b""
+        for line in lines:
+            if not line:
+                continue
+            decoded_line = line.decode("utf-8")
+            logger.debug(f"Received line: {decoded_line}")
+            json_data = json.loads(decoded_line)
+            logger.debug(f"Parsed JSON: {json_data}")
+            if "error" in json_data:
+                raise Exception(json_data["error"])
+            result = json_data.get("result", {})
+            response_data = result.get("response", {})
+            logger.debug(f"Response data: {response_data}")
+            if "modelResponse" in response_data:
+                return response_data["modelResponse"].get("message", "")
+            token = response_data.get("token", "")
+            if token:
+                tokens.append(token)
+    return "".join(tokens)
+
+
+def parser_loop(chunks):
+    """The FrameParser based loop of the current client"""
+    tokens = []
+    parser = FrameParser()
+    for chunk in chunks:
+        for response_data in parser.feed(chunk):
+            if "modelResponse" in response_data:
+                return response_data["modelResponse"].get("message", "")
+            token = response_data.get("token", "")
+            if token:
+                tokens.append(token)
+    return "".join(tokens)
+
+
+def measure(loop, chunks, frames, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        loop(chunks)
+        best = min(best, time.perf_counter() - start)
+    return frames / best
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the upstream NDJSON frame parser")
+    parser.add_argument("--tokens", type=int, default=2000, help="Token frames per body (default: 2000)")
+    parser.add_argument("--metadata-every", type=int, default=50,
+                        help="Insert a search-results frame every N tokens, 0 for none (default: 50)")
+    parser.add_argument("--chunk-size", type=int, default=1400, help="Bytes per network read (default: 1400)")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per variant; the best is reported (default: 20)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    # Debug logging off, as in production: the f-strings are still formatted
+    logging.getLogger().setLevel(logging.WARNING)
+
+    body, frames = build_body(args.tokens, args.metadata_every)
+    chunks = chunked(body, args.chunk_size)
+    expected = legacy_loop(chunks)
+
+    default_loads = stream_parser.loads
+    variants = [("legacy iter_lines + json", legacy_loop, default_loads)]
+    variants.append((f"FrameParser ({stream_parser.JSON_BACKEND})", parser_loop, default_loads))
+    if stream_parser.JSON_BACKEND != "json":
+        variants.append(("FrameParser (json)", parser_loop, json.loads))
+
+    print(f"{frames} frames, {len(body)} bytes, {len(chunks)} chunks of {args.chunk_size} bytes")
+    baseline = None
+    try:
+        for name, loop, loads in variants:
+            stream_parser.loads = loads
+            assert loop(chunks) == expected, f"{name} returned a different response"
+            rate = measure(loop, chunks, frames, args.repeat)
+            baseline = baseline or rate
+            print(f"{name:<28} {rate:>12,.0f} frames/s  {rate / baseline:5.2f}x")
+    finally:
+        stream_parser.loads = default_loads
+
+if __name__ == "__main__":
+    main()
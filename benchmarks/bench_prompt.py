@@ -0,0 +1,122 @@
+"""
+Microbenchmark of prompt assembly with large function schemas.
+
+Prepares the same request, carrying a list of large function schemas,
+the way the server did before the prompt cache (re-rendering the
+system prompt and re-serializing the schemas for the response cache
+key) and through GrokAPI with and without the prompt cache:
+
+    python benchmarks/bench_prompt.py --functions 30 --properties 15 --repeat 2000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grok_client import prompt  # noqa: E402
+from grok_client.cache import make_key  # noqa: E402
+from grok_client.prompt import PromptCache  # noqa: E402
+from grok_client.server import ChatCompletionRequest, GrokAPI  # noqa: E402
+
+
+def build_request(functions, properties, messages):
+    """A function-calling request shaped like the ones agents send"""
+    schemas = []
+    for index in range(functions):
+        schemas.append({
+            "name": f"tool_{index}",
+            "description": f"Tool number {index}. " + "Explains what the tool does and when to call it. " * 3,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    f"arg_{name}": {
+                        "type": "string",
+                        "description": f"Argument {name} of tool {index}, with a sentence of guidance.",
+                        "enum": [f"choice_{choice}" for choice in range(5)],
+                    }
+                    for name in range(properties)
+                },
+                "required": [f"arg_{name}" for name in range(min(properties, 3))],
+            },
+        })
+    history = [
+        {"role": "user" if index % 2 == 0 else "assistant", "content": f"Message {index} of the conversation."}
+        for index in range(messages)
+    ]
+    body = {"model": "grok-3", "messages": history, "functions": schemas, "function_call": "auto"}
+    return ChatCompletionRequest(**body), len(json.dumps(schemas))
+
+
+def legacy_prepare(request):
+    """System prompt, flattened conversation and cache key as the server built them before"""
+    system_content = "You are a helpful assistant that provides structured data."
+    system_content += f" Available functions: {[f.name for f in request.functions]}"
+    system_content += f" Function schemas: {json.dumps([f.dict() for f in request.functions])}"
+    conversation = f"system: {system_content}\n" + "\n".join([f"{msg.role}: {msg.content}" for msg in request.messages])
+    key = make_key(
+        model=request.model,
+        conversation=conversation,
+        functions=[f.dict() for f in request.functions],
+        function_call=request.function_call,
+        response_format=request.response_format,
+    )
+    return conversation, key
+
+
+def current_prepare(prompts):
+    def run(request):
+        # The server builds one GrokAPI per request
+        grok = GrokAPI({"sso": "benchmark", "sso-rw": "benchmark"}, prompts=prompts)
+        turn = grok._prepare_turn(request)
+        return turn.conversation, grok._request_key(request, turn.conversation)
+    return run
+
+
+def measure(run, request, repeat):
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat // 5):
+            run(request)
+        best = min(best, (time.perf_counter() - start) / (repeat // 5))
+    return best
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark prompt assembly with large function schemas")
+    parser.add_argument("--functions", type=int, default=30, help="Functions per request (default: 30)")
+    parser.add_argument("--properties", type=int, default=15, help="Parameters per function (default: 15)")
+    parser.add_argument("--messages", type=int, default=20, help="Messages per request (default: 20)")
+    parser.add_argument("--repeat", type=int, default=2000, help="Requests per variant (default: 2000)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    # BaseModel.dict() is deprecated in pydantic 2; the legacy path still calls it
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    request, schema_bytes = build_request(args.functions, args.properties, args.messages)
+    expected = legacy_prepare(request)[0]
+    variants = [
+        ("legacy", legacy_prepare),
+        ("GrokAPI, no prompt cache", current_prepare(None)),
+        (f"GrokAPI, prompt cache ({'orjson' if prompt.orjson else 'json'})", current_prepare(PromptCache())),
+    ]
+
+    print(f"{args.functions} functions, {schema_bytes} bytes of schemas, {args.messages} messages")
+    baseline = None
+    for name, run in variants:
+        assert run(request)[0] == expected, f"{name} built a different prompt"
+        elapsed = measure(run, request, args.repeat)
+        baseline = baseline or elapsed
+        print(f"{name:<36} {elapsed * 1e6:10.1f} us/request  {baseline / elapsed:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
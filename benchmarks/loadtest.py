@@ -0,0 +1,282 @@
+"""
+End-to-end load test for the OpenAI-compatible proxy.
+
+Drives /v1/chat/completions at a fixed concurrency and reports time to
+first token, inter-token latency, end-to-end latency percentiles,
+throughput and memory. The proxy coalesces tokens into SSE events, so
+tokens are counted from the content received, the same way for both
+modes, and the gap between events is reported on its own. With --spawn it starts the fake upstream and the
+proxy itself, so it runs fully offline:
+
+    python benchmarks/loadtest.py --spawn --concurrency 64 --requests 2000
+
+Thresholds (--max-p99-ms, --max-ttft-p99-ms, --max-error-rate) make the
+process exit non-zero, so the script can gate CI on hot-path regressions.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def rss_kb(pid):
+    """Current and peak resident set size of a process in KiB (Linux only)"""
+    current = peak = 0
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1])
+                elif line.startswith("VmHWM:"):
+                    peak = int(line.split()[1])
+    except OSError:
+        pass
+    return current, peak
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port} after {timeout}s")
+
+
+def spawn_stack(args):
+    """Start the fake upstream and the proxy, returning (processes, proxy_url)"""
+    upstream_port = free_port()
+    proxy_port = free_port()
+    upstream = subprocess.Popen(
+        [sys.executable, "-m", "grok_client.fake_upstream",
+         "--port", str(upstream_port),
+         "--latency-ms", str(args.upstream_latency_ms),
+         "--token-rate", str(args.upstream_token_rate),
+         "--tokens", str(args.upstream_tokens),
+         "--error-rate", str(args.upstream_error_rate),
+         "--stall-rate", str(args.upstream_stall_rate),
+         "--stall-ms", str(args.upstream_stall_ms)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    env = dict(os.environ, GROK_API_URL=f"http://127.0.0.1:{upstream_port}/rest/app-chat")
+    if args.workers > 1:
+        command = [sys.executable, "-m", "grok_client.serve", "--workers", str(args.workers)]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "grok_client.server:app"]
+    proxy = subprocess.Popen(
+        command + ["--port", str(proxy_port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    wait_for_port(upstream_port)
+    wait_for_port(proxy_port)
+    return [upstream, proxy], f"http://127.0.0.1:{proxy_port}"
+
+
+def count_tokens(text):
+    """Tokens of a reply; the fake upstream streams one word per token"""
+    return len(text.split())
+
+
+class Stats:
+    def __init__(self):
+        self.ttft = []
+        # Mean inter-token latency of each streamed reply
+        self.itl = []
+        # Gaps between SSE events carrying content, each holding one or more tokens
+        self.event_gaps = []
+        self.e2e = []
+        self.tokens = 0
+        self.events = 0
+        self.errors = 0
+        self.completed = 0
+
+
+async def run_one(client, url, args, index, stats):
+    body = {
+        "model": "grok-3",
+        "messages": [{"role": "user", "content": f"{args.prompt} #{index % args.unique_prompts}"}],
+        "stream": args.stream,
+    }
+    start = time.perf_counter()
+    try:
+        if not args.stream:
+            response = await client.post(url, json=body)
+            if response.status_code != 200 or "error" in response.json():
+                stats.errors += 1
+                return
+            elapsed = time.perf_counter() - start
+            stats.ttft.append(elapsed)
+            stats.e2e.append(elapsed)
+            stats.tokens += count_tokens(response.json()["choices"][0]["message"]["content"])
+            stats.completed += 1
+            return
+
+        first = last = None
+        content = []
+        async with client.stream("POST", url, json=body) as response:
+            if response.status_code != 200:
+                stats.errors += 1
+                return
+            async for line in response.aiter_lines():
+                if not line.startswith("data: ") or line == "data: [DONE]":
+                    continue
+                chunk = json.loads(line[6:])
+                if "error" in chunk:
+                    stats.errors += 1
+                    return
+                delta = chunk["choices"][0].get("delta", {})
+                if not delta.get("content"):
+                    continue
+                now = time.perf_counter()
+                if last is None:
+                    first = now
+                    stats.ttft.append(now - start)
+                else:
+                    stats.event_gaps.append(now - last)
+                last = now
+                content.append(delta["content"])
+                stats.events += 1
+        tokens = count_tokens("".join(content))
+        if tokens > 1:
+            stats.itl.append((last - first) / (tokens - 1))
+        stats.tokens += tokens
+        stats.e2e.append(time.perf_counter() - start)
+        stats.completed += 1
+    except httpx.HTTPError:
+        stats.errors += 1
+
+
+async def run_load(url, args):
+    stats = Stats()
+    counter = iter(range(args.requests))
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    headers = {"Cookie": args.cookie}
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits, headers=headers) as client:
+        async def worker():
+            for index in counter:
+                await run_one(client, url + "/v1/chat/completions", args, index, stats)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+        stats.wall = time.perf_counter() - start
+    return stats
+
+
+def summarize(stats, args, proxy_pid=None):
+    ms = lambda seconds: round(seconds * 1000, 2)
+    total = stats.completed + stats.errors
+    report = {
+        "concurrency": args.concurrency,
+        "requests": total,
+        "completed": stats.completed,
+        "error_rate": round(stats.errors / total, 4) if total else 0.0,
+        "wall_s": round(stats.wall, 3),
+        "throughput_rps": round(stats.completed / stats.wall, 2) if stats.wall else 0.0,
+        "tokens_per_s": round(stats.tokens / stats.wall, 1) if stats.wall else 0.0,
+        "ttft_ms": {"p50": ms(percentile(stats.ttft, 50)), "p99": ms(percentile(stats.ttft, 99))},
+        "itl_ms": {"p50": ms(percentile(stats.itl, 50)), "p99": ms(percentile(stats.itl, 99))},
+        "e2e_ms": {"p50": ms(percentile(stats.e2e, 50)), "p99": ms(percentile(stats.e2e, 99))},
+        "client_max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    if args.stream:
+        # How often the proxy flushed, as opposed to how fast tokens arrived
+        report["event_gap_ms"] = {"p50": ms(percentile(stats.event_gaps, 50)), "p99": ms(percentile(stats.event_gaps, 99))}
+        report["tokens_per_event"] = round(stats.tokens / stats.events, 2) if stats.events else 0.0
+    if proxy_pid is not None:
+        current, peak = rss_kb(proxy_pid)
+        report["proxy_rss_kb"] = current
+        report["proxy_peak_rss_kb"] = peak
+    return report
+
+
+def check_thresholds(report, args):
+    failures = []
+    if args.max_p99_ms is not None and report["e2e_ms"]["p99"] > args.max_p99_ms:
+        failures.append(f"e2e p99 {report['e2e_ms']['p99']}ms > {args.max_p99_ms}ms")
+    if args.max_ttft_p99_ms is not None and report["ttft_ms"]["p99"] > args.max_ttft_p99_ms:
+        failures.append(f"TTFT p99 {report['ttft_ms']['p99']}ms > {args.max_ttft_p99_ms}ms")
+    if report["error_rate"] > args.max_error_rate:
+        failures.append(f"error rate {report['error_rate']} > {args.max_error_rate}")
+    return failures
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Load test /v1/chat/completions")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Proxy base URL")
+    parser.add_argument("--spawn", action="store_true", help="Start the fake upstream and proxy locally")
+    parser.add_argument("--workers", type=int, default=1, help="Proxy worker processes with --spawn (via grok_client.serve)")
+    parser.add_argument("--concurrency", type=int, default=32, help="In-flight requests")
+    parser.add_argument("--requests", type=int, default=500, help="Total requests")
+    parser.add_argument("--no-stream", dest="stream", action="store_false", help="Use non-streaming completions")
+    parser.add_argument("--prompt", default="Tell me about load testing", help="Prompt prefix")
+    parser.add_argument("--unique-prompts", type=int, default=1000000, help="Distinct prompts cycled through")
+    parser.add_argument("--cookie", default="sso=bench; sso-rw=bench", help="Cookie header sent to the proxy")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--upstream-latency-ms", type=float, default=100.0, help="Fake upstream first-byte latency")
+    parser.add_argument("--upstream-token-rate", type=float, default=200.0, help="Fake upstream tokens per second")
+    parser.add_argument("--upstream-tokens", type=int, default=64, help="Fake upstream tokens per response")
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0, help="Fake upstream error rate")
+    parser.add_argument("--upstream-stall-rate", type=float, default=0.0, help="Fake upstream stalled-stream rate")
+    parser.add_argument("--upstream-stall-ms", type=float, default=5000.0, help="Fake upstream stall length")
+    parser.add_argument("--max-p99-ms", type=float, help="Fail if e2e p99 exceeds this")
+    parser.add_argument("--max-ttft-p99-ms", type=float, help="Fail if TTFT p99 exceeds this")
+    parser.add_argument("--max-error-rate", type=float, default=0.0, help="Fail if the error rate exceeds this")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    processes = []
+    url = args.url
+    try:
+        if args.spawn:
+            processes, url = spawn_stack(args)
+        stats = asyncio.run(run_load(url, args))
+        report = summarize(stats, args, proxy_pid=processes[-1].pid if processes else None)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for key, value in report.items():
+            print(f"{key:>20}: {value}")
+
+    failures = check_thresholds(report, args)
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
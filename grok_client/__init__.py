@@ -1,4 +1,5 @@
-from .client import GrokClient
+from .client import GrokClient, ConversationRef
+from .async_client import AsyncGrokClient
 
 __version__ = "0.1.0"
-__all__ = ['GrokClient']
\ No newline at end of file
+__all__ = ['GrokClient', 'AsyncGrokClient', 'ConversationRef']
\ No newline at end of file
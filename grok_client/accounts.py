@@ -0,0 +1,247 @@
+import json
+import logging
+import os
+import time
+
+from .async_client import AsyncGrokClient
+from .exceptions import NoAccountAvailable, Overloaded
+from .pool import credential_key
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Upstream statuses that mean "stop using this account for a while"
+QUARANTINE_STATUSES = (401, 403, 429)
+
+
+class Account:
+    """A Grok credential owned by the server, with its routing statistics."""
+
+    def __init__(self, cookies, name=None):
+        """
+        Initialize the account
+
+        Args:
+            cookies (dict): Cookie values, at least sso and sso-rw
+            name (str, optional): Label used in logs and metrics
+        """
+        self.cookies = cookies
+        self.key = credential_key(cookies)
+        self.name = name or f"account-{self.key[:8]}"
+        self.client = AsyncGrokClient(cookies, account_name=self.name)
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.error_rate = 0.0
+        self.strikes = 0
+        self.quarantined_until = 0.0
+
+    def available(self, now):
+        return self.quarantined_until <= now
+
+    def __repr__(self):
+        return f"Account({self.name!r}, in_flight={self.in_flight}, error_rate={self.error_rate:.2f})"
+
+
+class AccountPool:
+    """
+    Server-side pool of Grok accounts with least-loaded routing.
+
+    Each request is routed to the available account with the fewest
+    in-flight requests, weighted by its recent (exponentially decayed)
+    error rate. Accounts that fail with an auth or rate-limit status are
+    quarantined for an exponentially growing period and re-admitted
+    automatically once it expires.
+    """
+
+    def __init__(self, accounts, quarantine_seconds=60.0, max_quarantine_seconds=900.0,
+                 error_decay=0.2, error_weight=4.0, max_in_flight=0):
+        """
+        Initialize the pool
+
+        Args:
+            accounts (List[Account]): The accounts to route between
+            quarantine_seconds (float): First quarantine period
+            max_quarantine_seconds (float): Upper bound of the quarantine period
+            error_decay (float): Weight of the latest outcome in the error rate
+            error_weight (float): In-flight requests one unit of error rate is worth
+            max_in_flight (int): Requests one account may run at once, 0 for no limit
+        """
+        self.accounts = list(accounts)
+        self.quarantine_seconds = quarantine_seconds
+        self.max_quarantine_seconds = max_quarantine_seconds
+        self.error_decay = error_decay
+        self.error_weight = error_weight
+        self.max_in_flight = max_in_flight
+
+    def acquire(self, prefer=None, avoid=None):
+        """
+        Pick an account for a new upstream request
+
+        Args:
+            prefer (str, optional): Credential key of an account to use if
+                it is available, e.g. the owner of a conversation
+            avoid (str, optional): Credential key of an account to use only
+                if no other is available, e.g. the one a hedged request
+                is already waiting on
+
+        Returns:
+            Account: The least loaded available account
+
+        Raises:
+            NoAccountAvailable: If every account is quarantined
+            Overloaded: If every available account is at max_in_flight
+        """
+        now = time.monotonic()
+        candidates = [account for account in self.accounts if account.available(now)]
+        if not candidates:
+            retry_after = min(account.quarantined_until for account in self.accounts) - now
+            raise NoAccountAvailable("All Grok accounts are quarantined", retry_after=max(1, int(retry_after + 1)))
+        if self.max_in_flight:
+            candidates = [account for account in candidates if account.in_flight < self.max_in_flight]
+            if not candidates:
+                raise Overloaded("Every Grok account is at its concurrency limit", retry_after=1)
+        if avoid is not None:
+            candidates = [account for account in candidates if account.key != avoid] or candidates
+
+        preferred = [account for account in candidates if account.key == prefer]
+        account = preferred[0] if preferred else min(
+            candidates,
+            key=lambda a: (a.in_flight + a.error_rate * self.error_weight, a.requests)
+        )
+        account.in_flight += 1
+        account.requests += 1
+        return account
+
+    def release(self, account, error=None):
+        """
+        Return an account after its request finished
+
+        Args:
+            account (Account): The account returned by acquire
+            error (Exception, optional): The failure of the request, if any
+        """
+        account.in_flight -= 1
+        failed = 1.0 if error is not None else 0.0
+        account.error_rate += self.error_decay * (failed - account.error_rate)
+
+        if error is None:
+            account.strikes = 0
+            return
+
+        account.errors += 1
+        if getattr(error, "status_code", None) in QUARANTINE_STATUSES:
+            period = min(self.quarantine_seconds * (2 ** account.strikes), self.max_quarantine_seconds)
+            account.strikes += 1
+            account.quarantined_until = time.monotonic() + period
+            logger.warning(f"Quarantined {account.name} for {period:.0f}s after status {error.status_code}")
+
+    def stats(self):
+        """
+        Report the state of every account
+
+        Returns:
+            List[dict]: Name, load, error rate and quarantine status per account
+        """
+        now = time.monotonic()
+        return [
+            {
+                "name": account.name,
+                "in_flight": account.in_flight,
+                "requests": account.requests,
+                "errors": account.errors,
+                "error_rate": round(account.error_rate, 4),
+                "quarantined_for": max(0.0, round(account.quarantined_until - now, 1)),
+            }
+            for account in self.accounts
+        ]
+
+    def __len__(self):
+        return len(self.accounts)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """
+        Load accounts from a JSON or .env style file
+
+        JSON files hold a list of objects, each either with a ``cookie``
+        header string or with the individual cookie values, and an
+        optional ``name``::
+
+            [{"name": "a", "sso": "...", "sso-rw": "..."},
+             {"cookie": "sso=...; sso-rw=..."}]
+
+        .env style files pair ``GROK_SSO``/``GROK_SSO_RW`` and any number
+        of suffixed ``GROK_SSO_<name>``/``GROK_SSO_RW_<name>`` entries.
+
+        Args:
+            path (str): Path to the accounts file
+            **kwargs: Passed on to AccountPool
+
+        Returns:
+            AccountPool: The loaded pool
+        """
+        if path.endswith(".json"):
+            with open(path) as f:
+                entries = json.load(f)
+            accounts = []
+            for entry in entries:
+                entry = dict(entry)
+                name = entry.pop("name", None)
+                if "cookie" in entry:
+                    entry = parse_cookie_header(entry["cookie"])
+                accounts.append(Account(entry, name=name))
+            return cls(accounts, **kwargs)
+
+        from dotenv import dotenv_values
+
+        values = dotenv_values(path)
+        accounts = []
+        for variable, sso in values.items():
+            if not variable.startswith("GROK_SSO") or variable.startswith("GROK_SSO_RW") or not sso:
+                continue
+            suffix = variable[len("GROK_SSO"):]
+            sso_rw = values.get(f"GROK_SSO_RW{suffix}")
+            if not sso_rw:
+                logger.warning(f"Skipping {variable}: no matching GROK_SSO_RW{suffix}")
+                continue
+            accounts.append(Account({"sso": sso, "sso-rw": sso_rw}, name=suffix.lstrip("_") or None))
+        return cls(accounts, **kwargs)
+
+    @classmethod
+    def from_env(cls):
+        """
+        Load the pool configured by the GROK_ACCOUNTS_FILE environment variable
+
+        Returns:
+            Optional[AccountPool]: The pool, or None when no accounts are configured
+        """
+        path = os.getenv("GROK_ACCOUNTS_FILE")
+        if not path:
+            return None
+        pool = cls.from_file(
+            path,
+            quarantine_seconds=float(os.getenv("GROK_ACCOUNT_QUARANTINE", "60")),
+            max_quarantine_seconds=float(os.getenv("GROK_ACCOUNT_MAX_QUARANTINE", "900")),
+            max_in_flight=int(os.getenv("GROK_MAX_CONCURRENCY_PER_ACCOUNT", "0")),
+        )
+        logger.info(f"Loaded {len(pool)} Grok accounts from {path}")
+        return pool if len(pool) else None
+
+
+def parse_cookie_header(header):
+    """
+    Split a Cookie header into a name to value mapping
+
+    Args:
+        header (str): A header such as ``"sso=...; sso-rw=..."``
+
+    Returns:
+        dict: The individual cookie values
+    """
+    cookies = {}
+    for cookie in header.split(";"):
+        if cookie.strip():
+            name, value = cookie.strip().split("=", 1)
+            cookies[name.strip()] = value.strip()
+    return cookies
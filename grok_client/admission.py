@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+
+from . import metrics
+from .exceptions import Overloaded
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded FIFO wait queue.
+
+    Requests beyond ``max_concurrency`` wait in line for a slot. A request
+    is shed with Overloaded instead of queued when the line is full, or
+    when its estimated wait, derived from how long recent requests held
+    their slots, would run past its deadline. Shedding early keeps the
+    latency of admitted requests stable under overload.
+    """
+
+    def __init__(self, max_concurrency, max_queue=0, max_queue_wait=30.0, name="global"):
+        """
+        Initialize the controller
+
+        Args:
+            max_concurrency (int): Requests allowed to run at once
+            max_queue (int): Requests allowed to wait for a slot
+            max_queue_wait (float): Longest time a request waits in line
+            name (str): Label used in logs and metrics
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+        self.name = name
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        # Exponentially weighted mean of how long a slot is held
+        self.mean_hold = 1.0
+        self._waiters = deque()
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def estimated_wait(self, position=None):
+        """
+        Estimate how long a newly queued request would wait
+
+        Args:
+            position (int, optional): Place in line. Defaults to the end.
+
+        Returns:
+            float: Seconds until a slot frees up for it
+        """
+        position = self.queued if position is None else position
+        return math.ceil((position + 1) / self.max_concurrency) * self.mean_hold
+
+    def _reject(self, reason, wait):
+        self.rejected += 1
+        metrics.admission_rejected.labels(self.name, reason).inc()
+        retry_after = max(1, int(math.ceil(wait)))
+        logger.warning(f"Shedding request at {self.name} limit ({reason}), retry after {retry_after}s")
+        raise Overloaded(f"Server is at capacity ({reason})", retry_after=retry_after)
+
+    async def acquire(self, deadline=None):
+        """
+        Wait for a slot
+
+        Args:
+            deadline (float, optional): time.monotonic() by which the
+                request must be done, as given by the client
+
+        Returns:
+            float: time.monotonic() when the slot was granted
+
+        Raises:
+            Overloaded: If the request is shed
+        """
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return time.monotonic()
+
+        wait = self.estimated_wait()
+        if self.queued >= self.max_queue:
+            self._reject("queue_full", wait)
+        timeout = self.max_queue_wait
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                self._reject("deadline", wait)
+            timeout = min(timeout, remaining)
+
+        queued_at = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # A slot was handed over just as we gave up; pass it on
+                self._handoff()
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("queue_timeout", self.estimated_wait())
+            raise
+        self.admitted += 1
+        granted = time.monotonic()
+        metrics.admission_wait.labels(self.name).observe(granted - queued_at)
+        return granted
+
+    def release(self, granted):
+        """
+        Give a slot back, handing it to the next request in line
+
+        Args:
+            granted (float): The value returned by acquire
+        """
+        self.mean_hold += 0.2 * ((time.monotonic() - granted) - self.mean_hold)
+        self._handoff()
+
+    def _handoff(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot moves to the waiter; in_flight stays the same
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "mean_hold": round(self.mean_hold, 3),
+        }
+
+
+class Admission:
+    """
+    Global and per-account admission control in front of the upstream.
+
+    ``per_account`` limits the requests of one caller-supplied credential;
+    the accounts of the server's pool are limited by the pool itself.
+    """
+
+    def __init__(self, max_concurrency=0, per_account=0, max_queue=0, max_queue_wait=30.0):
+        """
+        Initialize the limits
+
+        Args:
+            max_concurrency (int): Requests running at once, 0 for no limit
+            per_account (int): Requests per credential, 0 for no limit
+            max_queue (int): Requests waiting for each limit
+            max_queue_wait (float): Longest time a request waits in line
+        """
+        self.per_account = per_account
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+        self.controller = AdmissionController(max_concurrency, max_queue, max_queue_wait) if max_concurrency else None
+        self._accounts = {}
+
+    async def admit(self, account_key=None, deadline=None):
+        """
+        Wait until a request may run
+
+        Args:
+            account_key (str, optional): Credential key of the caller's cookies
+            deadline (float, optional): time.monotonic() deadline of the client
+
+        Returns:
+            Ticket: Pass to release once the request has finished
+
+        Raises:
+            Overloaded: If the request is shed
+        """
+        ticket = Ticket(self)
+        if self.per_account and account_key is not None:
+            account = self._accounts.get(account_key)
+            if account is None:
+                account = self._accounts[account_key] = AdmissionController(
+                    self.per_account, self.max_queue, self.max_queue_wait, name="account"
+                )
+            ticket.slots.append((account, await account.acquire(deadline), account_key))
+        if self.controller is not None:
+            try:
+                ticket.slots.append((self.controller, await self.controller.acquire(deadline), None))
+            except BaseException:
+                ticket.release()
+                raise
+        return ticket
+
+    def release(self, ticket):
+        for controller, granted, account_key in ticket.slots:
+            controller.release(granted)
+            if account_key is not None and controller.in_flight == 0 and not controller.queued:
+                # Forget idle credentials so callers cannot grow the map forever
+                self._accounts.pop(account_key, None)
+        ticket.slots = []
+
+    def stats(self):
+        return {
+            "global": self.controller.stats() if self.controller is not None else None,
+            "accounts": len(self._accounts),
+        }
+
+
+class Ticket:
+    """The slots held by one admitted request; releasing it twice is harmless."""
+
+    def __init__(self, admission):
+        self.admission = admission
+        self.slots = []
+
+    def release(self):
+        if self.slots:
+            self.admission.release(self)
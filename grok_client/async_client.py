@@ -0,0 +1,222 @@
+import asyncio
+import httpx
+import logging
+import time
+
+from . import metrics
+from .client import GrokClient
+from .exceptions import GrokError, UpstreamTimeout, UpstreamUnavailable
+from .logs import frame_sampler
+from .pool import async_client_pool
+from .resilience import error_class
+from .stream_parser import FrameParser
+from .tracing import UpstreamTimer
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+async def close_http_client():
+    """Close every pooled async HTTP client and release its connections"""
+    await async_client_pool.aclose()
+
+
+class AsyncGrokClient(GrokClient):
+    """
+    asyncio flavour of GrokClient.
+
+    Shares cookie handling, payload construction and NDJSON parsing with
+    GrokClient, but performs the upstream request on a pooled httpx
+    client so it never blocks the event loop.
+    """
+
+    async def _iter_response_data(self, message, conversation=None):
+        """
+        Send a message to Grok and yield the response data of every frame
+
+        Transient failures before the first token are retried with
+        jittered backoff; while the upstream's circuit is open, requests
+        fail fast with CircuitOpen.
+
+        Args:
+            message (str): The user's input message
+            conversation (ConversationRef, optional): Conversation to continue
+
+        Yields:
+            dict: The ``result.response`` data of each frame as it arrives
+        """
+        saved = (conversation.conversation_id, conversation.response_id) if conversation is not None else None
+        delays = self.retry.delays()
+        attempt = 1
+        while True:
+            probe = self.breaker.allow()
+            # Whether the breaker has heard how this attempt went; it counts
+            # as a success once the upstream streams a token
+            settled = False
+            frames = self._request_frames(message, conversation)
+            try:
+                async for response_data in frames:
+                    if not settled and ("token" in response_data or "modelResponse" in response_data):
+                        settled = True
+                        self.breaker.record()
+                    yield response_data
+                if not settled:
+                    settled = True
+                    self.breaker.record()
+                return
+            except GrokError as e:
+                if settled:
+                    # Tokens were already passed on; a retry would repeat them
+                    raise
+                settled = True
+                self.breaker.record(e)
+                if not self.retry.should_retry(e, attempt):
+                    raise
+                delay = next(delays)
+                logger.warning(f"Attempt {attempt} failed ({error_class(e)}), retrying in {delay:.2f}s")
+                metrics.upstream_retries.labels(self.account_name, error_class(e)).inc()
+                await asyncio.sleep(delay)
+                attempt += 1
+                if conversation is not None:
+                    # Ids seen in the failed attempt's frames must not be continued from
+                    conversation.conversation_id, conversation.response_id = saved
+            finally:
+                # Release the upstream connection as soon as we stop reading
+                await frames.aclose()
+                if probe and not settled:
+                    self.breaker.abandon()
+
+    async def _request_frames(self, message, conversation=None):
+        """
+        Make one upstream request and yield the response data of every frame
+
+        Args:
+            message (str): The user's input message
+            conversation (ConversationRef, optional): Conversation to continue
+
+        Yields:
+            dict: The ``result.response`` data of each frame as it arrives
+        """
+        timer = UpstreamTimer()
+        # Decided once per stream so disabled DEBUG logging costs nothing per frame
+        log_frames = logger.isEnabledFor(logging.DEBUG)
+        try:
+            url, payload = self._prepare_request(message, conversation)
+            logger.debug("Sending %d characters to %s", len(message), url)
+            # The client is not closed by the pool while this stream is open
+            with async_client_pool.lease(self.cookies) as http:
+                async with http.stream(
+                    "POST",
+                    url,
+                    headers=self.headers,
+                    json=payload
+                ) as response:
+                    timer.connected = time.perf_counter()
+                    metrics.upstream_connect.labels(self.account_name).observe(timer.connected - timer.started)
+                    logger.debug("Response status code: %s", response.status_code)
+                    response.raise_for_status()
+
+                    parser = FrameParser()
+                    first_byte = True
+                    async for chunk in response.aiter_bytes():
+                        if first_byte:
+                            metrics.upstream_ttfb.labels(self.account_name).observe(time.perf_counter() - timer.started)
+                            first_byte = False
+                        for response_data in parser.feed(chunk):
+                            timer.frame(response_data)
+                            self._track_conversation(conversation, response_data)
+                            if log_frames and frame_sampler():
+                                self._log_frame(response_data)
+                            yield response_data
+                    for response_data in parser.flush():
+                        timer.frame(response_data)
+                        self._track_conversation(conversation, response_data)
+                        if log_frames and frame_sampler():
+                            self._log_frame(response_data)
+                        yield response_data
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Request failed: {e}")
+            metrics.upstream_errors.labels(self.account_name, f"http_{e.response.status_code}").inc()
+            raise GrokError(f"Request failed: {str(e)}", status_code=e.response.status_code)
+        except httpx.HTTPError as e:
+            logger.error(f"Request failed: {e}")
+            if isinstance(e, httpx.TimeoutException):
+                error = UpstreamTimeout(f"Request timed out: {str(e)}")
+            else:
+                error = UpstreamUnavailable(f"Request failed: {str(e)}")
+            metrics.upstream_errors.labels(self.account_name, error_class(error)).inc()
+            raise error
+        except Exception as e:
+            logger.error(f"Failed to process response: {e}")
+            metrics.upstream_errors.labels(self.account_name, "stream" if isinstance(e, GrokError) else "protocol").inc()
+            raise GrokError(f"Failed to process response: {str(e)}")
+        finally:
+            timer.finish()
+
+    async def stream_message(self, message, conversation=None):
+        """
+        Send a message to Grok and yield the response tokens as they arrive
+
+        Args:
+            message (str): The user's input message
+            conversation (ConversationRef, optional): Conversation to continue
+
+        Yields:
+            str: Each response token exactly as streamed by Grok
+        """
+        streamed = False
+        frames = self._iter_response_data(message, conversation)
+        try:
+            async for response_data in frames:
+                token = response_data.get("token", "")
+                if token:
+                    streamed = True
+                    yield token
+                elif "modelResponse" in response_data:
+                    # The final frame repeats the whole message; only use it
+                    # when the upstream did not stream any tokens
+                    if not streamed:
+                        complete_response = response_data["modelResponse"].get("message", "")
+                        if complete_response:
+                            yield complete_response
+                    return
+        finally:
+            # Release the upstream connection as soon as we stop reading
+            await frames.aclose()
+
+    async def send_message(self, message, conversation=None):
+        """
+        Send a message to Grok and collect the streaming response
+
+        Args:
+            message (str): The user's input message
+            conversation (ConversationRef, optional): Conversation to continue
+
+        Returns:
+            str: The complete response from Grok
+        """
+        tokens = []
+
+        frames = self._iter_response_data(message, conversation)
+        try:
+            async for response_data in frames:
+                # Check for complete response
+                if "modelResponse" in response_data:
+                    complete_response = response_data["modelResponse"].get("message", "")
+                    if complete_response:
+                        return self._clean_json_response(complete_response)
+
+                # Collect streaming tokens
+                token = response_data.get("token", "")
+                if token:
+                    tokens.append(token)
+        finally:
+            await frames.aclose()
+
+        # Return the collected tokens if we have any
+        full_response = "".join(tokens).strip()
+        if full_response:
+            return self._clean_json_response(full_response)
+
+        logger.error("No valid response received from Grok API")
+        raise GrokError("No valid response received from Grok API")
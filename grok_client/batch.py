@@ -0,0 +1,262 @@
+"""
+Offline batch completions over JSONL files.
+
+Each input line is an OpenAI Batch API request::
+
+    {"custom_id": "req-1", "method": "POST", "url": "/v1/chat/completions",
+     "body": {"model": "grok-3", "messages": [...]}}
+
+(a bare chat completion body is accepted too). Results are appended to
+the output JSONL as soon as each request finishes, in the OpenAI batch
+output format. Re-running with the same output file skips every
+custom_id already recorded there, so an interrupted batch resumes where
+it stopped.
+
+Usage:
+    python -m grok_client.batch requests.jsonl results.jsonl --concurrency 16
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+import uuid
+
+from .exceptions import GrokError
+from .logs import configure_logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Upstream statuses worth another attempt
+RETRYABLE_STATUSES = (408, 409, 429, 500, 502, 503, 504)
+
+
+def completed_ids(output_path):
+    """
+    Collect the custom_ids already present in an output file
+
+    Args:
+        output_path (str): Path of the output JSONL
+
+    Returns:
+        set: custom_ids that must not be run again
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path) as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["custom_id"])
+            except (ValueError, KeyError):
+                # A torn last line from a crash; that request runs again
+                continue
+    return done
+
+
+def iter_requests(input_path):
+    """
+    Read batch requests from a JSONL file
+
+    Args:
+        input_path (str): Path of the input JSONL
+
+    Yields:
+        Tuple[str, Optional[dict], Optional[str]]: The custom_id and chat
+            completion body of each line, or its custom_id, None and why
+            the line is not a request
+    """
+    with open(input_path) as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError as e:
+                # One bad line must not stop the rest of the batch
+                yield f"line-{number}", None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(entry, dict):
+                yield f"line-{number}", None, "Expected a JSON object"
+            elif "body" in entry:
+                custom_id = entry.get("custom_id") or f"line-{number}"
+                if isinstance(entry["body"], dict):
+                    yield custom_id, entry["body"], None
+                else:
+                    yield custom_id, None, "Expected \"body\" to be a JSON object"
+            else:
+                yield f"line-{number}", entry, None
+
+
+class BatchRunner:
+    """
+    Runs chat completion requests from a JSONL file with bounded concurrency.
+
+    ``handler`` is an async callable that takes a chat completion body
+    and returns the response body as a dict; the server and CLI pass one
+    that goes straight through GrokAPI without an HTTP round trip.
+    """
+
+    def __init__(self, handler, concurrency=8, max_retries=3, retry_backoff=1.0):
+        """
+        Initialize the runner
+
+        Args:
+            handler (Callable[[dict], Awaitable[dict]]): Runs one request
+            concurrency (int): Maximum requests in flight
+            max_retries (int): Extra attempts for retryable failures
+            retry_backoff (float): Base delay in seconds between attempts
+        """
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.total = 0
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.cancelled = False
+
+    def _retryable(self, error):
+        if isinstance(error, GrokError):
+            return error.status_code is None or error.status_code in RETRYABLE_STATUSES
+        return not isinstance(error, (ValueError, TypeError))
+
+    @staticmethod
+    def _error(custom_id, code, message):
+        return {
+            "id": f"batch_req_{uuid.uuid4().hex}",
+            "custom_id": custom_id,
+            "response": None,
+            "error": {"code": code, "message": message},
+        }
+
+    async def _run_one(self, custom_id, body):
+        attempt = 0
+        while True:
+            try:
+                result = await self.handler(body)
+                return {
+                    "id": f"batch_req_{uuid.uuid4().hex}",
+                    "custom_id": custom_id,
+                    "response": {"status_code": 200, "request_id": result.get("id"), "body": result},
+                    "error": None,
+                }
+            except Exception as e:
+                if attempt >= self.max_retries or not self._retryable(e):
+                    return self._error(custom_id, type(e).__name__, str(e))
+                # Full jitter keeps retries of a failing burst from re-synchronizing
+                delay = random.uniform(0, self.retry_backoff * (2 ** attempt))
+                attempt += 1
+                logger.warning(f"Retrying {custom_id} in {delay:.1f}s (attempt {attempt}): {e}")
+                await asyncio.sleep(delay)
+
+    async def run(self, input_path, output_path):
+        """
+        Process every pending request of ``input_path`` into ``output_path``
+
+        Args:
+            input_path (str): Path of the input JSONL
+            output_path (str): Path of the output JSONL, appended to
+        """
+        done = completed_ids(output_path)
+        pending = iter_requests(input_path)
+
+        with open(output_path, "a") as output:
+            async def worker():
+                for custom_id, body, invalid in pending:
+                    if self.cancelled:
+                        return
+                    self.total += 1
+                    if custom_id in done:
+                        self.skipped += 1
+                        continue
+                    if invalid is not None:
+                        result = self._error(custom_id, "invalid_request", invalid)
+                    else:
+                        result = await self._run_one(custom_id, body)
+                    if result["error"] is None:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+                    # One write per line keeps the file resumable after a crash
+                    output.write(json.dumps(result) + "\n")
+                    output.flush()
+
+            workers = [asyncio.ensure_future(worker()) for _ in range(self.concurrency)]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                # The output stays open until no worker can write to it any more
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+    def cancel(self):
+        """Stop picking up new requests; in-flight ones still finish"""
+        self.cancelled = True
+
+    def request_counts(self):
+        return {
+            "total": self.total,
+            "completed": self.completed + self.skipped,
+            "failed": self.failed,
+        }
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Run a JSONL file of chat completions through Grok")
+    parser.add_argument("input", help="Input JSONL of chat completion requests")
+    parser.add_argument("output", help="Output JSONL, appended to and used to resume")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight (default: 8)")
+    parser.add_argument("--retries", type=int, default=3, help="Retries for retryable failures (default: 3)")
+    parser.add_argument("--retry-backoff", type=float, default=1.0, help="Base retry delay in seconds (default: 1.0)")
+    parser.add_argument("--cookie", help="Cookie header to use (default: GROK_SSO/GROK_SSO_RW or GROK_ACCOUNTS_FILE)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    configure_logging()
+    args = parse_arguments(argv)
+
+    cookie = args.cookie
+    if not cookie and os.getenv("GROK_SSO") and os.getenv("GROK_SSO_RW"):
+        cookie = f"sso={os.getenv('GROK_SSO')}; sso-rw={os.getenv('GROK_SSO_RW')}"
+
+    # Imported late so loading .env above configures the server's pools
+    from .server import run_chat_completion, account_pool
+
+    if not cookie and account_pool is None:
+        logger.error("No credentials: pass --cookie, set GROK_SSO/GROK_SSO_RW or GROK_ACCOUNTS_FILE")
+        return 1
+
+    cookies = {"Cookie": cookie} if cookie else {}
+    runner = BatchRunner(
+        lambda body: run_chat_completion(body, cookies),
+        concurrency=args.concurrency,
+        max_retries=args.retries,
+        retry_backoff=args.retry_backoff,
+    )
+
+    start = time.monotonic()
+    asyncio.run(runner.run(args.input, args.output))
+    elapsed = time.monotonic() - start
+    counts = runner.request_counts()
+    logger.info(
+        f"Processed {counts['total']} requests in {elapsed:.1f}s: "
+        f"{runner.completed} completed, {runner.skipped} already done, {runner.failed} failed"
+    )
+    return 0 if runner.failed == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Splits cached text into word-sized pieces without losing any whitespace
+_CHUNK_PATTERN = re.compile(r"\s*\S+\s*|\s+")
+
+
+def make_key(**parts):
+    """
+    Build a canonical hash of the parts that determine a completion
+
+    The parts are serialized as sorted, compact JSON so that logically
+    identical requests hash the same regardless of dict ordering.
+
+    Args:
+        **parts: JSON-serializable values identifying the request
+
+    Returns:
+        str: Hex SHA-256 digest of the canonical form
+    """
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def split_chunks(text):
+    """
+    Split a cached response into stream-sized pieces
+
+    Args:
+        text (str): The complete response text
+
+    Returns:
+        List[str]: Pieces that join back to exactly ``text``
+    """
+    return _CHUNK_PATTERN.findall(text)
+
+
+class ResponseCache:
+    """
+    Bounded in-memory LRU cache of completion texts with a TTL.
+
+    Entries expire ``ttl`` seconds after they were stored. The least
+    recently used entries are evicted once either ``max_entries`` or
+    ``max_bytes`` (measured on the UTF-8 size of the values) is exceeded.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=3600.0):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries (int): Maximum number of cached responses
+            max_bytes (int): Maximum total size of cached responses
+            ttl (float): Seconds a response stays valid
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Look up a cached response
+
+        Args:
+            key (str): The request key from make_key
+
+        Returns:
+            Optional[str]: The cached response, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """
+        Store a response
+
+        Args:
+            key (str): The request key from make_key
+            value (str): The complete response text
+            ttl (float, optional): Seconds the response stays valid,
+                defaults to the cache's ttl
+        """
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else min(ttl, self.ttl))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    async def aget(self, key):
+        """Coroutine version of ``get``; the memory cache never blocks, so it runs inline"""
+        return self.get(key)
+
+    async def aset(self, key, value):
+        """Coroutine version of ``set``; the memory cache never blocks, so it runs inline"""
+        self.set(key, value)
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        """Drop every cached response"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Report cache counters
+
+        Returns:
+            dict: Entry count, size in bytes, hits, misses, evictions and hit ratio
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TieredCache:
+    """
+    A small in-memory cache in front of a larger, slower one.
+
+    Hits on the back tier are copied to the front with the TTL they have
+    left; every response is written to both. Used with a
+    SharedResponseCache as the back tier so hot responses skip SQLite and
+    decompression while the full cache survives restarts.
+    """
+
+    def __init__(self, front, back):
+        """
+        Initialize the cache
+
+        Args:
+            front (ResponseCache): Per-process memory tier
+            back (SharedResponseCache): Persistent tier
+        """
+        self.front = front
+        self.back = back
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Look up a cached response in the front tier, then the back tier
+
+        Args:
+            key (str): The request key from make_key
+
+        Returns:
+            Optional[str]: The cached response, or None on a miss
+        """
+        value = self.front.get(key)
+        if value is None:
+            value, ttl = self.back.lookup(key)
+            if value is not None:
+                self.front.set(key, value, ttl=ttl)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def aget(self, key):
+        """
+        Look up a cached response; only a front-tier miss leaves the event loop
+
+        Args:
+            key (str): The request key from make_key
+
+        Returns:
+            Optional[str]: The cached response, or None on a miss
+        """
+        value = self.front.get(key)
+        if value is None:
+            value, ttl = await self.back.alookup(key)
+            if value is not None:
+                self.front.set(key, value, ttl=ttl)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """
+        Store a response in both tiers
+
+        Args:
+            key (str): The request key from make_key
+            value (str): The complete response text
+        """
+        self.front.set(key, value)
+        self.back.set(key, value)
+
+    async def aset(self, key, value):
+        """
+        Store a response in both tiers, compressing and writing it off the event loop
+
+        Args:
+            key (str): The request key from make_key
+            value (str): The complete response text
+        """
+        self.front.set(key, value)
+        await self.back.aset(key, value)
+
+    def clear(self):
+        """Drop every cached response from both tiers"""
+        self.front.clear()
+        self.back.clear()
+
+    def stats(self):
+        """
+        Report cache counters
+
+        Returns:
+            dict: Hits, misses and hit ratio over both tiers, and the
+                counters of each tier under ``memory`` and ``disk``
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "memory": self.front.stats(),
+            "disk": self.back.stats(),
+        }
+
+    async def astats(self):
+        """Coroutine version of ``stats``, reading the disk tier's totals off the event loop"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "memory": self.front.stats(),
+            "disk": await self.back.astats(),
+        }
+
+    def __len__(self):
+        return len(self.back)
@@ -1,15 +1,41 @@
 import requests
 import json
+import os
 import time
 import logging
 import re
+from dataclasses import dataclass
+from typing import Optional
+
+from . import metrics
+from .exceptions import GrokError, UpstreamTimeout, UpstreamUnavailable
+from .logs import frame_sampler, log_event
+from .pool import credential_key, session_pool
+from .resilience import breakers, error_class, retry_policy
+from .stream_parser import FrameParser, parse_frame
+from .tracing import UpstreamTimer
 
 # Set up logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+DEFAULT_API_URL = "https://grok.com/rest/app-chat"
+
+@dataclass
+class ConversationRef:
+    """
+    Upstream identity of a Grok conversation.
+
+    Pass one to ``stream_message``/``send_message`` to continue an
+    existing conversation; the client fills in the conversation and
+    response ids it sees in the stream, so the same object can be used
+    to continue from the new reply afterwards.
+    """
+    conversation_id: Optional[str] = None
+    response_id: Optional[str] = None
+    account_key: Optional[str] = None
+
 class GrokClient:
-    def __init__(self, cookies):
+    def __init__(self, cookies, api_url=None, account_name=None, retry=None):
         """
         Initialize the Grok client with cookie values
 
@@ -17,8 +43,15 @@ class GrokClient:
             cookies (dict): Dictionary containing cookie values
                 - sso
                 - sso-rw
+            api_url (str, optional): Root of the Grok chat API. Defaults to
+                the GROK_API_URL environment variable or grok.com.
+            account_name (str, optional): Account label of the upstream
+                metrics. Defaults to "default".
+            retry (RetryPolicy, optional): Retries of failed requests.
+                Defaults to the GROK_RETRY_* settings.
         """
-        self.base_url = "https://grok.com/rest/app-chat/conversations/new"
+        self.api_url = (api_url or os.getenv("GROK_API_URL") or DEFAULT_API_URL).rstrip("/")
+        self.base_url = f"{self.api_url}/conversations/new"
         
         # Convert cookie string to dict if needed
         if isinstance(cookies.get('Cookie'), str):
@@ -30,8 +63,11 @@ class GrokClient:
             self.cookies = cookie_dict
         else:
             self.cookies = cookies
-            
-        logger.debug(f"Using cookies: {self.cookies}")
+        self.credential_key = credential_key(self.cookies)
+        self.account_name = account_name or "default"
+        self.retry = retry or retry_policy
+        # Shared by every client of the same upstream
+        self.breaker = breakers.get(self.api_url)
         
         self.headers = {
             "accept": "*/*",
@@ -49,9 +85,9 @@ class GrokClient:
             "sec-gpc": "1",
             "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
         }
-        logger.debug(f"Initialized GrokClient with headers: {self.headers}")
+        logger.debug("Initialized GrokClient for account %s", self.account_name)
 
-    def _prepare_payload(self, message):
+    def _prepare_payload(self, message, parent_response_id=None):
         """Prepare the default payload with the user's message"""
         payload = {
             "temporary": False,
@@ -74,14 +110,17 @@ class GrokClient:
             "deepsearchPreset": "",
             "isReasoning": False
         }
-        logger.debug(f"Prepared payload: {payload}")
+        if parent_response_id:
+            payload["parentResponseId"] = parent_response_id
         return payload
 
-    def _clean_json_response(self, response):
+    @staticmethod
+    def _clean_json_response(response):
         """Clean up JSON response by removing markdown and code blocks"""
         # Remove markdown code blocks
-        response = re.sub(r'```json\s*', '', response)
-        response = re.sub(r'```\s*$', '', response)
+        if "```" in response:
+            response = re.sub(r'```json\s*', '', response)
+            response = re.sub(r'```\s*$', '', response)
         
         try:
             # Try to parse as JSON
@@ -100,98 +139,261 @@ class GrokClient:
         except json.JSONDecodeError:
             return response
 
-    def send_message(self, message):
+    def _prepare_request(self, message, conversation=None):
+        """
+        Pick the endpoint and payload for a message
+
+        Args:
+            message (str): The user's input message
+            conversation (ConversationRef, optional): Conversation to continue
+
+        Returns:
+            Tuple[str, dict]: The URL to post to and the payload
+        """
+        if conversation is not None and conversation.conversation_id:
+            url = f"{self.api_url}/conversations/{conversation.conversation_id}/responses"
+            return url, self._prepare_payload(message, parent_response_id=conversation.response_id)
+        return self.base_url, self._prepare_payload(message)
+
+    @staticmethod
+    def _track_conversation(conversation, response_data):
+        """Record the upstream conversation and response ids seen in a frame"""
+        if conversation is None:
+            return
+        if "conversation" in response_data:
+            conversation.conversation_id = response_data["conversation"].get("conversationId") or conversation.conversation_id
+        response_id = response_data.get("responseId")
+        if not response_id and "modelResponse" in response_data:
+            response_id = response_data["modelResponse"].get("responseId")
+        if response_id:
+            conversation.response_id = response_id
+
+    def _open_stream(self, message, conversation=None, session=None):
+        """
+        Post a message to Grok and return the open streaming response
+
+        Args:
+            message (str): The user's input message
+            conversation (ConversationRef, optional): Conversation to continue
+            session (requests.Session, optional): Session leased from the pool
+
+        Returns:
+            requests.Response: The streaming HTTP response
+        """
+        url, payload = self._prepare_request(message, conversation)
+        logger.debug("Sending %d characters to %s", len(message), url)
+
+        # Reuse the warm connection of this credential when we have one
+        if session is None:
+            session = session_pool.get(self.cookies)
+
+        started = time.perf_counter()
+        response = session.post(
+            url,
+            headers=self.headers,
+            json=payload,
+            stream=True,
+            timeout=session_pool.timeout
+        )
+        metrics.upstream_connect.labels(self.account_name).observe(time.perf_counter() - started)
+
+        logger.debug("Response status code: %s", response.status_code)
+        response.raise_for_status()  # Raise an exception for bad status codes
+        return response
+
+    def _parse_line(self, line):
+        """
+        Parse a single NDJSON line from the Grok response stream
+
+        Args:
+            line (Union[bytes, str]): The raw line read from the stream
+
+        Returns:
+            dict: The ``result.response`` data of the frame, or None if the
+                frame carries nothing a client needs
+
+        Raises:
+            GrokError: If the frame carries an upstream error
+        """
+        return parse_frame(line)
+
+    def _log_frame(self, response_data):
+        log_event(
+            logger, logging.DEBUG, "upstream_frame",
+            account=self.account_name,
+            keys=",".join(response_data),
+            token_chars=len(response_data.get("token") or ""),
+        )
+
+    def _iter_response_data(self, message, conversation=None):
+        """
+        Send a message to Grok and yield the response data of every frame
+
+        Transient failures before the first token are retried with
+        jittered backoff; while the upstream's circuit is open, requests
+        fail fast with CircuitOpen.
+
+        Args:
+            message (str): The user's input message
+            conversation (ConversationRef, optional): Conversation to continue
+
+        Yields:
+            dict: The ``result.response`` data of each frame as it arrives
+        """
+        saved = (conversation.conversation_id, conversation.response_id) if conversation is not None else None
+        delays = self.retry.delays()
+        attempt = 1
+        while True:
+            probe = self.breaker.allow()
+            # Whether the breaker has heard how this attempt went; it counts
+            # as a success once the upstream streams a token
+            settled = False
+            try:
+                for response_data in self._request_frames(message, conversation):
+                    if not settled and ("token" in response_data or "modelResponse" in response_data):
+                        settled = True
+                        self.breaker.record()
+                    yield response_data
+                if not settled:
+                    settled = True
+                    self.breaker.record()
+                return
+            except GrokError as e:
+                if settled:
+                    # Tokens were already passed on; a retry would repeat them
+                    raise
+                settled = True
+                self.breaker.record(e)
+                if not self.retry.should_retry(e, attempt):
+                    raise
+                delay = next(delays)
+                logger.warning(f"Attempt {attempt} failed ({error_class(e)}), retrying in {delay:.2f}s")
+                metrics.upstream_retries.labels(self.account_name, error_class(e)).inc()
+                time.sleep(delay)
+                attempt += 1
+                if conversation is not None:
+                    # Ids seen in the failed attempt's frames must not be continued from
+                    conversation.conversation_id, conversation.response_id = saved
+            finally:
+                if probe and not settled:
+                    self.breaker.abandon()
+
+    def _request_frames(self, message, conversation=None):
+        """
+        Make one upstream request and yield the response data of every frame
+
+        Args:
+            message (str): The user's input message
+            conversation (ConversationRef, optional): Conversation to continue
+
+        Yields:
+            dict: The ``result.response`` data of each frame as it arrives
+        """
+        timer = UpstreamTimer()
+        # Decided once per stream so disabled DEBUG logging costs nothing per frame
+        log_frames = logger.isEnabledFor(logging.DEBUG)
+        # The session stays out of the pool's reach until the response is read
+        with session_pool.lease(self.cookies) as session:
+            try:
+                response = self._open_stream(message, conversation, session)
+                timer.connected = time.perf_counter()
+                try:
+                    parser = FrameParser()
+                    first_byte = True
+                    for chunk in response.iter_content(chunk_size=None):
+                        if first_byte:
+                            metrics.upstream_ttfb.labels(self.account_name).observe(time.perf_counter() - timer.started)
+                            first_byte = False
+                        for response_data in parser.feed(chunk):
+                            timer.frame(response_data)
+                            self._track_conversation(conversation, response_data)
+                            if log_frames and frame_sampler():
+                                self._log_frame(response_data)
+                            yield response_data
+                    for response_data in parser.flush():
+                        timer.frame(response_data)
+                        self._track_conversation(conversation, response_data)
+                        if log_frames and frame_sampler():
+                            self._log_frame(response_data)
+                        yield response_data
+                finally:
+                    response.close()
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Request failed: {e}")
+                status_code = e.response.status_code if e.response is not None else None
+                if status_code is not None:
+                    error = GrokError(f"Request failed: {str(e)}", status_code=status_code)
+                elif isinstance(e, requests.exceptions.Timeout):
+                    error = UpstreamTimeout(f"Request timed out: {str(e)}")
+                else:
+                    error = UpstreamUnavailable(f"Request failed: {str(e)}")
+                metrics.upstream_errors.labels(self.account_name, error_class(error)).inc()
+                raise error
+            except Exception as e:
+                logger.error(f"Failed to process response: {e}")
+                metrics.upstream_errors.labels(self.account_name, "stream" if isinstance(e, GrokError) else "protocol").inc()
+                raise GrokError(f"Failed to process response: {str(e)}")
+            finally:
+                timer.finish()
+
+    def stream_message(self, message, conversation=None):
+        """
+        Send a message to Grok and yield the response tokens as they arrive
+
+        Args:
+            message (str): The user's input message
+            conversation (ConversationRef, optional): Conversation to continue
+
+        Yields:
+            str: Each response token exactly as streamed by Grok
+        """
+        streamed = False
+        for response_data in self._iter_response_data(message, conversation):
+            token = response_data.get("token", "")
+            if token:
+                streamed = True
+                yield token
+            elif "modelResponse" in response_data:
+                # The final frame repeats the whole message; only use it
+                # when the upstream did not stream any tokens
+                if not streamed:
+                    complete_response = response_data["modelResponse"].get("message", "")
+                    if complete_response:
+                        yield complete_response
+                return
+
+    def send_message(self, message, conversation=None):
         """
         Send a message to Grok and collect the streaming response
 
         Args:
             message (str): The user's input message
+            conversation (ConversationRef, optional): Conversation to continue
 
         Returns:
             str: The complete response from Grok
         """
-        try:
-            logger.debug(f"Sending message to Grok: {message}")
-            payload = self._prepare_payload(message)
-            
-            logger.debug(f"Making POST request to {self.base_url}")
-            logger.debug(f"Using cookies: {self.cookies}")
-            
-            session = requests.Session()
-            for cookie_name, cookie_value in self.cookies.items():
-                session.cookies.set(cookie_name, cookie_value)
-            
-            response = session.post(
-                self.base_url,
-                headers=self.headers,
-                json=payload,
-                stream=True
-            )
-            
-            logger.debug(f"Response status code: {response.status_code}")
-            response.raise_for_status()  # Raise an exception for bad status codes
-            
-            full_response = ""
-            last_response = None
-
-            logger.debug("Processing response stream...")
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        decoded_line = line.decode('utf-8')
-                        logger.debug(f"Received line: {decoded_line}")
-                        
-                        json_data = json.loads(decoded_line)
-                        logger.debug(f"Parsed JSON: {json_data}")
-                        
-                        # Check for error in response
-                        if "error" in json_data:
-                            error_msg = json_data["error"]
-                            logger.error(f"Error in response: {error_msg}")
-                            raise Exception(error_msg)
-                        
-                        result = json_data.get("result", {})
-                        response_data = result.get("response", {})
-                        logger.debug(f"Response data: {response_data}")
-
-                        # Check for complete response
-                        if "modelResponse" in response_data:
-                            complete_response = response_data["modelResponse"].get("message", "")
-                            if complete_response:
-                                logger.debug(f"Got complete response: {complete_response}")
-                                return self._clean_json_response(complete_response)
-                            
-                        # Collect streaming tokens
-                        token = response_data.get("token", "")
-                        if token:
-                            full_response += token
-                            last_response = full_response  # Keep track of last valid response
-                            logger.debug(f"Current response: {full_response}")
-                            
-                    except json.JSONDecodeError as e:
-                        logger.warning(f"Failed to decode JSON: {e}")
-                        continue
-                    except Exception as e:
-                        logger.error(f"Error processing response line: {e}")
-                        if str(e):  # If we have an error message
-                            raise Exception(f"Error in response: {str(e)}")
-                        continue
-
-            # Return the last valid response if we have one
-            if last_response:
-                logger.debug(f"Returning last valid response: {last_response.strip()}")
-                return self._clean_json_response(last_response.strip())
-            
-            # If we got here without a response, raise an exception
-            logger.error("No valid response received from Grok API")
-            raise Exception("No valid response received from Grok API")
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request failed: {e}")
-            raise Exception(f"Request failed: {str(e)}")
-        except Exception as e:
-            logger.error(f"Failed to process response: {e}")
-            raise Exception(f"Failed to process response: {str(e)}")
-
-        logger.warning("Returning empty response as fallback")
-        return ""  # Fallback empty response
\ No newline at end of file
+        tokens = []
+
+        for response_data in self._iter_response_data(message, conversation):
+            # Check for complete response
+            if "modelResponse" in response_data:
+                complete_response = response_data["modelResponse"].get("message", "")
+                if complete_response:
+                    logger.debug("Got complete response of %d characters", len(complete_response))
+                    return self._clean_json_response(complete_response)
+
+            # Collect streaming tokens
+            token = response_data.get("token", "")
+            if token:
+                tokens.append(token)
+
+        # Return the collected tokens if we have any
+        full_response = "".join(tokens).strip()
+        if full_response:
+            logger.debug("Returning %d streamed characters", len(full_response))
+            return self._clean_json_response(full_response)
+
+        # If we got here without a response, raise an exception
+        logger.error("No valid response received from Grok API")
+        raise GrokError("No valid response received from Grok API")
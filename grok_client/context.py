@@ -0,0 +1,211 @@
+"""
+Token-budgeted context windows for long conversations.
+
+Grok sees a conversation as one flattened prompt, so every turn of a
+long session makes the prompt longer until the upstream rejects it.
+``fit_messages`` picks the part of a history that fits a token budget:
+system messages and the newest messages are kept, the message at the
+boundary is shortened, and older ones are replaced by a short note.
+``ContextWindow`` does the same incrementally for a client that owns
+the history, remembering each message's token count so a new turn only
+costs the count of the new message.
+
+Token counts are estimates: four characters per token for ASCII text
+and three UTF-8 bytes per token otherwise (one per CJK character),
+which errs on the side of sending less.
+"""
+
+# Tokens added per message for the "role: " prefix and separator
+MESSAGE_OVERHEAD = 4
+
+# Shortened messages keep at least this many tokens, or are dropped instead
+MIN_EXCERPT_TOKENS = 32
+
+ELLIPSIS = " [...]"
+
+# Room kept for the note that replaces dropped messages
+NOTE_TOKENS = (len("[1000000 earlier messages omitted]") + 3) // 4 + MESSAGE_OVERHEAD
+
+
+def estimate_tokens(text):
+    """
+    Estimate the number of tokens of a piece of text
+
+    Constant time for ASCII text (``str.isascii`` reads a flag CPython
+    keeps on every string), one pass over the UTF-8 bytes otherwise.
+
+    Args:
+        text (str): The text
+
+    Returns:
+        int: Estimated token count
+    """
+    if not text:
+        return 0
+    if text.isascii():
+        return (len(text) + 3) // 4
+    return (len(text.encode("utf-8")) + 2) // 3
+
+
+def omitted_note(count):
+    return f"[{count} earlier messages omitted]"
+
+
+def _shorten(text, tokens, budget):
+    """Keep the start of a message, cut to about ``budget`` tokens"""
+    keep = max(0, int(len(text) * (budget - estimate_tokens(ELLIPSIS)) / tokens))
+    return text[:keep].rstrip() + ELLIPSIS
+
+
+def fit_messages(messages, max_tokens, estimator=estimate_tokens):
+    """
+    Select the part of a history that fits a token budget
+
+    System messages and the last message are always kept. The others
+    are kept newest first while they fit. The first one that does not
+    fit is shortened to the remaining budget, and all older ones are
+    replaced by a single system note saying how many were left out.
+
+    Args:
+        messages (List[Tuple[str, str]]): (role, content) pairs, oldest first
+        max_tokens (int): Budget for the messages, 0 for no limit
+        estimator (Callable[[str], int]): Token estimator
+
+    Returns:
+        List[Tuple[str, str]]: The messages to send, oldest first; the
+            input list itself when everything fits
+    """
+    if not max_tokens or not messages:
+        return messages
+    counts = [estimator(content) + MESSAGE_OVERHEAD for _, content in messages]
+    total = sum(counts)
+    if total <= max_tokens:
+        return messages
+
+    last = len(messages) - 1
+    remaining = max_tokens - counts[last] - NOTE_TOKENS
+    for index, (role, _) in enumerate(messages):
+        if role == "system" and index != last:
+            remaining -= counts[index]
+
+    kept = {last: messages[last]}
+    for index in range(last - 1, -1, -1):
+        role, content = messages[index]
+        if role == "system":
+            kept[index] = messages[index]
+            continue
+        if remaining <= 0:
+            continue
+        if counts[index] <= remaining:
+            kept[index] = messages[index]
+            remaining -= counts[index]
+            continue
+        budget = remaining - MESSAGE_OVERHEAD
+        if budget >= MIN_EXCERPT_TOKENS:
+            kept[index] = (role, _shorten(content, counts[index] - MESSAGE_OVERHEAD, budget))
+        remaining = 0
+
+    fitted = []
+    omitted = 0
+    for index in range(len(messages)):
+        if index in kept:
+            if omitted and messages[index][0] != "system":
+                fitted.append(("system", omitted_note(omitted)))
+                omitted = 0
+            fitted.append(kept[index])
+        else:
+            omitted += 1
+    return fitted
+
+
+class ContextWindow:
+    """
+    A client-side conversation history kept within a token budget.
+
+    Messages are OpenAI-style dicts. Each message's token count is
+    computed once when it is added, and the oldest non-system messages
+    are dropped as new ones push the total over the budget, so adding a
+    turn costs O(1) amortized instead of recounting the whole history.
+    The newest ``keep_recent`` messages are never dropped.
+    """
+
+    def __init__(self, max_tokens, keep_recent=2, estimator=estimate_tokens):
+        """
+        Initialize the window
+
+        Args:
+            max_tokens (int): Budget of the messages sent, 0 for no limit
+            keep_recent (int): Newest messages kept even over budget
+            estimator (Callable[[str], int]): Token estimator
+        """
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.estimator = estimator
+        self.system = []
+        self.turns = []
+        self.omitted = 0
+        self.tokens = 0
+        self._counts = []
+        self._start = 0
+
+    def _count(self, message):
+        return self.estimator(message.get("content") or "") + MESSAGE_OVERHEAD
+
+    def set_system(self, content):
+        """Replace the system messages by one with the given content"""
+        self.tokens -= sum(self._count(message) for message in self.system)
+        self.system = [{"role": "system", "content": content}] if content else []
+        self.tokens += sum(self._count(message) for message in self.system)
+        self._trim()
+
+    def append(self, message):
+        """
+        Add a message and drop the oldest ones that no longer fit
+
+        Args:
+            message (dict): An OpenAI-style message
+        """
+        if message["role"] == "system":
+            self.system.append(message)
+            self.tokens += self._count(message)
+        else:
+            self.turns.append(message)
+            self._counts.append(self._count(message))
+            self.tokens += self._counts[-1]
+        self._trim()
+
+    def _trim(self):
+        if not self.max_tokens or self.tokens <= self.max_tokens - (NOTE_TOKENS if self.omitted else 0):
+            return
+        limit = self.max_tokens - NOTE_TOKENS
+        while self.tokens > limit and len(self.turns) - self._start > self.keep_recent:
+            self.tokens -= self._counts[self._start]
+            self._start += 1
+            self.omitted += 1
+        if self._start > 64 and self._start * 2 > len(self.turns):
+            # Compact now and then instead of popping from the front every time
+            del self.turns[:self._start]
+            del self._counts[:self._start]
+            self._start = 0
+
+    def clear(self):
+        """Forget every message except the system messages"""
+        self.turns = []
+        self._counts = []
+        self._start = 0
+        self.omitted = 0
+        self.tokens = sum(self._count(message) for message in self.system)
+
+    def messages(self):
+        """
+        The messages to send
+
+        Returns:
+            List[dict]: System messages, a note on omitted messages if
+                any were dropped, and the remaining turns
+        """
+        note = [{"role": "system", "content": omitted_note(self.omitted)}] if self.omitted else []
+        return self.system + note + self.turns[self._start:]
+
+    def __len__(self):
+        return len(self.system) + len(self.turns) - self._start
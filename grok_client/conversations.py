@@ -0,0 +1,117 @@
+import threading
+from collections import OrderedDict
+from dataclasses import replace
+
+from .cache import make_key
+from .client import ConversationRef
+
+
+class Turn:
+    """
+    What to send upstream for one chat completion.
+
+    A turn starts out as a full replay of the flattened conversation. If
+    the history before the new messages maps to an upstream conversation,
+    ``continue_from`` switches it to sending only the new messages to
+    that conversation; ``replay`` switches it back.
+    """
+
+    def __init__(self, conversation):
+        self.conversation = conversation
+        self.message = conversation
+        self.ref = ConversationRef()
+
+    @property
+    def continuing(self):
+        return self.ref.conversation_id is not None
+
+    def continue_from(self, ref, message):
+        self.ref = replace(ref)
+        self.message = message
+
+    def replay(self):
+        self.ref = ConversationRef()
+        self.message = self.conversation
+
+
+class ConversationMap:
+    """
+    Bounded LRU map from OpenAI-style message histories to upstream conversations.
+
+    Histories are identified by a hash of the model, system prompt and
+    every message, so a follow-up request whose messages start with a
+    recorded history can continue the upstream conversation instead of
+    replaying it.
+    """
+
+    def __init__(self, max_entries=10000):
+        """
+        Initialize the map
+
+        Args:
+            max_entries (int): Maximum number of histories remembered
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def history_key(model, system, messages):
+        """
+        Hash a message history
+
+        Args:
+            model (str): The requested model
+            system (str): Identifies the system prompt the proxy generated
+            messages (List[Tuple[str, str]]): (role, content) pairs
+
+        Returns:
+            str: The history key
+        """
+        return make_key(model=model, system=system, messages=[list(message) for message in messages])
+
+    def get(self, key):
+        """
+        Look up the upstream conversation of a history
+
+        Args:
+            key (str): Key from history_key
+
+        Returns:
+            Optional[ConversationRef]: The conversation, or None on a miss
+        """
+        with self._lock:
+            ref = self._entries.get(key)
+            if ref is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return replace(ref)
+
+    async def aget(self, key):
+        """Coroutine version of ``get``; the map never blocks, so it runs inline"""
+        return self.get(key)
+
+    def set(self, key, ref):
+        """
+        Record the upstream conversation a history ended in
+
+        Args:
+            key (str): Key from history_key
+            ref (ConversationRef): Conversation and response to continue from
+        """
+        with self._lock:
+            self._entries[key] = replace(ref)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def aset(self, key, ref):
+        """Coroutine version of ``set``; the map never blocks, so it runs inline"""
+        self.set(key, ref)
+
+    def __len__(self):
+        return len(self._entries)
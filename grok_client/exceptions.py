@@ -0,0 +1,47 @@
+class GrokError(Exception):
+    """
+    Error raised while talking to the Grok upstream.
+
+    Subclasses Exception, so existing ``except Exception`` handlers keep
+    working, and carries the upstream HTTP status when there was one.
+    """
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class NoAccountAvailable(GrokError):
+    """Raised when every account in the pool is quarantined."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message, status_code=503)
+        self.retry_after = retry_after
+
+
+class Overloaded(GrokError):
+    """Raised when a request is shed because the server is at capacity."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message, status_code=429)
+        self.retry_after = retry_after
+
+
+class UpstreamUnavailable(GrokError):
+    """Raised when the upstream could not be reached or dropped the connection."""
+
+
+class UpstreamTimeout(UpstreamUnavailable):
+    """Raised when the upstream did not connect or send data in time."""
+
+
+class CircuitOpen(GrokError):
+    """Raised without contacting the upstream while its circuit breaker is open."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message, status_code=503)
+        self.retry_after = retry_after
+
+
+class MalformedJSON(GrokError):
+    """Raised when a JSON-mode completion stops being valid JSON."""
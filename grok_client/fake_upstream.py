@@ -0,0 +1,168 @@
+"""
+Deterministic stand-in for the Grok chat API.
+
+Serves the same NDJSON frame sequence as grok.com so the proxy can be
+exercised and benchmarked offline. Point a client at it with
+``GROK_API_URL=http://127.0.0.1:9000/rest/app-chat``.
+
+Usage:
+    python -m grok_client.fake_upstream --port 9000 --latency-ms 200 --token-rate 50
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import uuid
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "the quick brown fox jumps over a lazy dog while grok streams tokens "
+    "through the proxy and every frame carries one small piece of the answer "
+    "latency matters because users wait for the first token before reading"
+).split()
+
+
+@dataclass
+class FakeUpstreamConfig:
+    """Tunable behaviour of the fake upstream."""
+    latency_ms: float = 100.0      # Delay before the first frame
+    token_rate: float = 100.0      # Tokens per second once streaming
+    tokens: int = 64               # Tokens per response
+    error_rate: float = 0.0        # Probability of injecting an error
+    error_status: int = 500        # HTTP status used for injected errors
+    stream_error_rate: float = 0.0 # Probability of an in-stream error frame
+    stall_rate: float = 0.0        # Probability of an extra delay before the first frame
+    stall_ms: float = 5000.0       # Length of that delay
+    seed: int = 0                  # Base seed for the token generator
+
+
+def _frame(data):
+    return (json.dumps(data) + "\n").encode("utf-8")
+
+
+def create_app(config=None):
+    """
+    Build the fake upstream application
+
+    Args:
+        config (FakeUpstreamConfig, optional): Behaviour of the upstream
+
+    Returns:
+        FastAPI: The application serving ``conversations/new`` and
+            ``conversations/{id}/responses`` under ``/rest/app-chat``
+    """
+    config = config or FakeUpstreamConfig()
+    app = FastAPI()
+    app.state.config = config
+    app.state.received_bytes = 0
+    # Fault injection follows its own seeded sequence so runs are repeatable
+    faults = random.Random(config.seed)
+
+    async def respond(payload, conversation_id=None):
+        message = payload.get("message", "")
+        parent = payload.get("parentResponseId", "")
+
+        # The same message always produces the same answer
+        digest = hashlib.sha256(f"{config.seed}:{parent}:{message}".encode("utf-8")).digest()
+        rng = random.Random(digest)
+
+        if faults.random() < config.error_rate:
+            await asyncio.sleep(config.latency_ms / 1000)
+            return JSONResponse(
+                status_code=config.error_status,
+                content={"error": {"code": config.error_status, "message": "Injected upstream error"}}
+            )
+
+        tokens = [rng.choice(WORDS) + " " for _ in range(config.tokens)]
+        fail_at = rng.randrange(config.tokens) if faults.random() < config.stream_error_rate else None
+        stall = config.stall_ms / 1000 if faults.random() < config.stall_rate else 0.0
+        response_id = str(uuid.UUID(bytes=digest[16:]))
+        continuing = conversation_id is not None
+        if not continuing:
+            conversation_id = str(uuid.UUID(bytes=digest[:16]))
+        app.state.received_bytes += len(message.encode("utf-8"))
+
+        def result(data):
+            # Continuations stream bare results; new conversations wrap them in "response"
+            return _frame({"result": data if continuing else {"response": data}})
+
+        async def stream():
+            await asyncio.sleep(config.latency_ms / 1000 + stall)
+            if not continuing:
+                yield _frame({"result": {"conversation": {"conversationId": conversation_id}}})
+            yield result({"userResponse": {"message": message, "sender": "human", "parentResponseId": parent}})
+
+            interval = 1.0 / config.token_rate if config.token_rate > 0 else 0
+            for index, token in enumerate(tokens):
+                if index == fail_at:
+                    yield _frame({"error": {"code": 13, "message": "Injected stream error"}})
+                    return
+                yield result({
+                    "token": token,
+                    "isThinking": False,
+                    "isSoftStop": False,
+                    "responseId": response_id,
+                })
+                if interval:
+                    await asyncio.sleep(interval)
+
+            yield result({"modelResponse": {
+                "responseId": response_id,
+                "message": "".join(tokens),
+                "sender": "ASSISTANT",
+            }})
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    @app.post("/rest/app-chat/conversations/new")
+    async def new_conversation(raw_request: Request):
+        return await respond(await raw_request.json())
+
+    @app.post("/rest/app-chat/conversations/{conversation_id}/responses")
+    async def continue_conversation(conversation_id: str, raw_request: Request):
+        return await respond(await raw_request.json(), conversation_id)
+
+    return app
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Deterministic fake Grok upstream")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind host (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=9000, help="Bind port (default: 9000)")
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="Delay before the first frame")
+    parser.add_argument("--token-rate", type=float, default=100.0, help="Tokens per second (0 for unthrottled)")
+    parser.add_argument("--tokens", type=int, default=64, help="Tokens per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with --error-status")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected errors")
+    parser.add_argument("--stream-error-rate", type=float, default=0.0, help="Fraction of streams aborted by an error frame")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Fraction of streams stalled before the first frame")
+    parser.add_argument("--stall-ms", type=float, default=5000.0, help="Length of injected stalls")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the token generator")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    import uvicorn
+
+    args = parse_arguments(argv)
+    config = FakeUpstreamConfig(
+        latency_ms=args.latency_ms,
+        token_rate=args.token_rate,
+        tokens=args.tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        stream_error_rate=args.stream_error_rate,
+        stall_rate=args.stall_rate,
+        stall_ms=args.stall_ms,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
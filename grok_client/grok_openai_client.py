@@ -1,15 +1,89 @@
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+import asyncio
+import httpx
 import os
 import json
 import logging
-from typing import Dict, List, Optional, Union, Any
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union, Any
 from dotenv import load_dotenv
 
+from .logs import configure_logging
+
 # Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class GrokOpenAIClient:
+# Default system message of json_completion
+JSON_SYSTEM_MESSAGE = "You are a helpful assistant that always responds in valid JSON format."
+
+
+def _prompt_messages(prompt: Union[str, List[Dict[str, str]]], system_message: str = None) -> List[Dict[str, str]]:
+    """Turn a prompt, or a ready-made message list, into chat messages"""
+    if not isinstance(prompt, str):
+        return list(prompt)
+    messages = []
+    if system_message:
+        messages.append({"role": "system", "content": system_message})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+
+class _GrokOpenAIConfig:
+    """Connection settings shared by the sync and async clients."""
+
+    def __init__(self,
+                 api_host: str = None,
+                 api_port: str = None,
+                 model_name: str = None,
+                 sso_token: str = None,
+                 sso_rw_token: str = None,
+                 load_from_env: bool = True):
+        # Load environment variables if requested
+        if load_from_env:
+            load_dotenv()
+            
+        # Get configuration from parameters or environment
+        self.api_host = api_host or os.getenv('API_HOST', '127.0.0.1')
+        self.api_port = api_port or os.getenv('API_PORT', '8000')
+        self.model_name = model_name or os.getenv('MODEL_NAME', 'grok-3')
+        self.sso_token = sso_token or os.getenv('GROK_SSO')
+        self.sso_rw_token = sso_rw_token or os.getenv('GROK_SSO_RW')
+        
+        # Validate required tokens
+        if not all([self.sso_token, self.sso_rw_token]):
+            raise ValueError("Missing required authentication tokens. Provide them as parameters or in .env file.")
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.api_host}:{self.api_port}/v1"
+
+    def _client_options(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "api_key": "dummy-key",  # Not used but required by the OpenAI client
+            "default_headers": {
+                "Cookie": f"sso={self.sso_token}; sso-rw={self.sso_rw_token}"
+            },
+        }
+
+    def _completion_params(self, messages, stream, temperature, max_tokens, model, response_format) -> Dict[str, Any]:
+        # Use the provided model or default to the client's model_name
+        params = {
+            "model": model or self.model_name,
+            "messages": messages,
+            "stream": stream,
+            "temperature": temperature
+        }
+
+        # Add optional parameters if provided
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+
+        if response_format is not None:
+            params["response_format"] = response_format
+        return params
+
+
+class GrokOpenAIClient(_GrokOpenAIConfig):
     """
     A client for interacting with the Grok API using the OpenAI-compatible interface.
     This client simplifies the process of authenticating and making requests to the Grok API.
@@ -33,31 +107,12 @@ class GrokOpenAIClient:
             sso_rw_token (str, optional): The SSO-RW token for authentication. Required if not loading from env.
             load_from_env (bool, optional): Whether to load configuration from environment. Defaults to True.
         """
-        # Load environment variables if requested
-        if load_from_env:
-            load_dotenv()
-            
-        # Get configuration from parameters or environment
-        self.api_host = api_host or os.getenv('API_HOST', '127.0.0.1')
-        self.api_port = api_port or os.getenv('API_PORT', '8000')
-        self.model_name = model_name or os.getenv('MODEL_NAME', 'grok-3')
-        self.sso_token = sso_token or os.getenv('GROK_SSO')
-        self.sso_rw_token = sso_rw_token or os.getenv('GROK_SSO_RW')
-        
-        # Validate required tokens
-        if not all([self.sso_token, self.sso_rw_token]):
-            raise ValueError("Missing required authentication tokens. Provide them as parameters or in .env file.")
+        super().__init__(api_host, api_port, model_name, sso_token, sso_rw_token, load_from_env)
         
         # Initialize OpenAI client with local endpoint
-        self.client = OpenAI(
-            base_url=f"http://{self.api_host}:{self.api_port}/v1",
-            api_key="dummy-key",  # Not used but required by the OpenAI client
-            default_headers={
-                "Cookie": f"sso={self.sso_token}; sso-rw={self.sso_rw_token}"
-            }
-        )
+        self.client = OpenAI(**self._client_options())
         
-        logger.info(f"Initialized GrokOpenAIClient with endpoint: http://{self.api_host}:{self.api_port}/v1")
+        logger.info(f"Initialized GrokOpenAIClient with endpoint: {self.base_url}")
     
     def list_models(self):
         """
@@ -96,23 +151,7 @@ class GrokOpenAIClient:
             Union[str, Iterator]: The completion response or a stream of responses.
         """
         try:
-            # Use the provided model or default to the client's model_name
-            model_name = model or self.model_name
-            
-            # Create the completion request parameters
-            params = {
-                "model": model_name,
-                "messages": messages,
-                "stream": stream,
-                "temperature": temperature
-            }
-            
-            # Add optional parameters if provided
-            if max_tokens is not None:
-                params["max_tokens"] = max_tokens
-                
-            if response_format is not None:
-                params["response_format"] = response_format
+            params = self._completion_params(messages, stream, temperature, max_tokens, model, response_format)
             
             # Make the API request
             response = self.client.chat.completions.create(**params)
@@ -154,14 +193,7 @@ class GrokOpenAIClient:
         Returns:
             str: The completion response.
         """
-        messages = []
-        
-        # Add system message if provided
-        if system_message:
-            messages.append({"role": "system", "content": system_message})
-            
-        # Add user message
-        messages.append({"role": "user", "content": prompt})
+        messages = _prompt_messages(prompt, system_message)
         
         # Get completion
         response = self.chat_completion(messages=messages, stream=False)
@@ -183,12 +215,9 @@ class GrokOpenAIClient:
         """
         # Default system message for JSON responses if not provided
         if system_message is None:
-            system_message = "You are a helpful assistant that always responds in valid JSON format."
+            system_message = JSON_SYSTEM_MESSAGE
             
-        messages = [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": prompt}
-        ]
+        messages = _prompt_messages(prompt, system_message)
         
         # Get completion with JSON format
         response = self.chat_completion(
@@ -201,6 +230,256 @@ class GrokOpenAIClient:
         content = response.choices[0].message.content
         return json.loads(content)
 
+class AsyncGrokOpenAIClient(_GrokOpenAIConfig):
+    """
+    Asyncio counterpart of GrokOpenAIClient.
+
+    All requests share one pooled HTTP connection pool to the proxy, so
+    fanning many completions out with ``map_completions`` reuses
+    keep-alive connections instead of opening one per request. Close the
+    client with ``aclose`` or use it as an async context manager.
+    """
+
+    def __init__(self,
+                 api_host: str = None,
+                 api_port: str = None,
+                 model_name: str = None,
+                 sso_token: str = None,
+                 sso_rw_token: str = None,
+                 load_from_env: bool = True,
+                 max_connections: int = 100,
+                 timeout: float = 600.0):
+        """
+        Initialize the async Grok OpenAI client.
+
+        Args:
+            api_host (str, optional): The API host. Defaults to value from environment or '127.0.0.1'.
+            api_port (str, optional): The API port. Defaults to value from environment or '8000'.
+            model_name (str, optional): The model name to use. Defaults to value from environment or 'grok-3'.
+            sso_token (str, optional): The SSO token for authentication. Required if not loading from env.
+            sso_rw_token (str, optional): The SSO-RW token for authentication. Required if not loading from env.
+            load_from_env (bool, optional): Whether to load configuration from environment. Defaults to True.
+            max_connections (int, optional): Size of the connection pool to the proxy. Defaults to 100.
+            timeout (float, optional): Seconds to wait for a response. Defaults to 600.
+        """
+        super().__init__(api_host, api_port, model_name, sso_token, sso_rw_token, load_from_env)
+
+        # One pool, with every connection kept alive between requests
+        self.http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout, connect=5.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self.client = AsyncOpenAI(http_client=self.http_client, **self._client_options())
+
+        logger.info(f"Initialized AsyncGrokOpenAIClient with endpoint: {self.base_url}")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the connection pool"""
+        await self.client.close()
+
+    async def list_models(self):
+        """
+        List available models.
+
+        Returns:
+            dict: The models response from the API.
+        """
+        try:
+            return await self.client.models.list()
+        except Exception as e:
+            logger.error(f"Error listing models: {e}")
+            raise
+
+    async def chat_completion(self,
+                              messages: List[Dict[str, str]],
+                              stream: bool = False,
+                              temperature: float = 1.0,
+                              max_tokens: int = None,
+                              model: str = None,
+                              response_format: Dict[str, str] = None) -> Any:
+        """
+        Create a chat completion with the Grok API.
+
+        Args:
+            messages (List[Dict[str, str]]): The messages to send to the API.
+                Each message should have 'role' and 'content' keys.
+            stream (bool, optional): Whether to stream the response. Defaults to False.
+            temperature (float, optional): The temperature for response generation. Defaults to 1.0.
+            max_tokens (int, optional): The maximum number of tokens to generate. Defaults to None.
+            model (str, optional): The model to use. Defaults to the client's model_name.
+            response_format (Dict[str, str], optional): The format for the response.
+                Use {"type": "json_object"} for JSON responses. Defaults to None.
+
+        Returns:
+            Union[ChatCompletion, AsyncIterator]: The completion response or a stream of chunks.
+        """
+        try:
+            params = self._completion_params(messages, stream, temperature, max_tokens, model, response_format)
+            return await self.client.chat.completions.create(**params)
+        except Exception as e:
+            logger.error(f"Error creating chat completion: {e}")
+            raise
+
+    async def process_streaming_response(self, stream):
+        """
+        Process a streaming response and print it to the console.
+
+        Args:
+            stream: The streaming response from the API.
+
+        Returns:
+            str: The complete response text.
+        """
+        parts = []
+        async for chunk in stream:
+            if chunk.choices[0].delta.content:
+                content = chunk.choices[0].delta.content
+                print(content, end="", flush=True)
+                parts.append(content)
+        print()  # Add a newline after the response
+        return "".join(parts)
+
+    async def simple_completion(self, prompt: str, system_message: str = None, **kwargs) -> str:
+        """
+        A simplified method to get a completion for a single prompt.
+
+        Args:
+            prompt (str): The user's prompt, or a list of messages.
+            system_message (str, optional): An optional system message to set context.
+                Defaults to None.
+            **kwargs: Further chat_completion arguments (temperature, model, ...).
+
+        Returns:
+            str: The completion response.
+        """
+        response = await self.chat_completion(messages=_prompt_messages(prompt, system_message), **kwargs)
+        return response.choices[0].message.content
+
+    async def json_completion(self, prompt: str, system_message: str = None, **kwargs) -> dict:
+        """
+        Get a completion in JSON format.
+
+        Args:
+            prompt (str): The user's prompt.
+            system_message (str, optional): An optional system message to set context.
+                Defaults to a message requesting JSON output.
+            **kwargs: Further chat_completion arguments (temperature, model, ...).
+
+        Returns:
+            dict: The parsed JSON response.
+        """
+        content = await self.simple_completion(
+            prompt,
+            JSON_SYSTEM_MESSAGE if system_message is None else system_message,
+            response_format={"type": "json_object"},
+            **kwargs
+        )
+        return json.loads(content)
+
+    async def map_completions(self,
+                              prompts: Iterable[Union[str, List[Dict[str, str]]]],
+                              concurrency: int = 8,
+                              ordered: bool = True,
+                              system_message: str = None,
+                              return_exceptions: bool = False,
+                              **kwargs) -> AsyncIterator[Tuple[int, Union[str, Exception]]]:
+        """
+        Run many completions with bounded concurrency.
+
+        Prompts are read lazily, so ``prompts`` may be a generator of any
+        length; at most ``concurrency`` requests are in flight at once. In
+        ordered mode, results held back behind a slower earlier request
+        count against ``concurrency`` too, so memory stays bounded.
+        Breaking out of the loop cancels the requests still running.
+
+        Args:
+            prompts (Iterable[Union[str, List[Dict[str, str]]]]): User prompts,
+                or ready-made message lists.
+            concurrency (int, optional): Requests in flight at once. Defaults to 8.
+            ordered (bool, optional): Yield results in input order; otherwise
+                as they complete. Defaults to True.
+            system_message (str, optional): System message added to string prompts.
+            return_exceptions (bool, optional): Yield a failed request's exception
+                as its result instead of raising it. Defaults to False.
+            **kwargs: Further chat_completion arguments (temperature, response_format, ...).
+
+        Yields:
+            Tuple[int, Union[str, Exception]]: The index of the prompt and its completion text.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        pending = enumerate(prompts)
+        running = {}
+        finished = {}
+        next_index = 0
+        exhausted = False
+        try:
+            while True:
+                # Buffered results hold their slot until they are yielded
+                while not exhausted and len(running) + len(finished) < concurrency:
+                    item = next(pending, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    index, prompt = item
+                    request = self.simple_completion(prompt, system_message, **kwargs)
+                    running[asyncio.ensure_future(request)] = index
+                if not running:
+                    break
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = running.pop(task)
+                    if task.exception() is not None and not return_exceptions:
+                        raise task.exception()
+                    result = task.exception() or task.result()
+                    if ordered:
+                        finished[index] = result
+                    else:
+                        yield index, result
+                while next_index in finished:
+                    yield next_index, finished.pop(next_index)
+                    next_index += 1
+        finally:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+    async def gather_completions(self,
+                                 prompts: Iterable[Union[str, List[Dict[str, str]]]],
+                                 concurrency: int = 8,
+                                 system_message: str = None,
+                                 return_exceptions: bool = False,
+                                 **kwargs) -> List[Union[str, Exception]]:
+        """
+        Run many completions with bounded concurrency and collect them.
+
+        Args:
+            prompts (Iterable[Union[str, List[Dict[str, str]]]]): User prompts,
+                or ready-made message lists.
+            concurrency (int, optional): Requests in flight at once. Defaults to 8.
+            system_message (str, optional): System message added to string prompts.
+            return_exceptions (bool, optional): Put a failed request's exception in
+                its place instead of raising it. Defaults to False.
+            **kwargs: Further chat_completion arguments (temperature, response_format, ...).
+
+        Returns:
+            List[Union[str, Exception]]: The completion texts, in input order.
+        """
+        # Collected out of order, so a slow request never holds back the others
+        results = self.map_completions(
+            prompts, concurrency=concurrency, ordered=False, system_message=system_message,
+            return_exceptions=return_exceptions, **kwargs
+        )
+        collected = {index: result async for index, result in results}
+        return [collected[index] for index in range(len(collected))]
+
 # Example usage
 def example_usage():
     # Initialize client
@@ -228,4 +507,5 @@ def example_usage():
     client.process_streaming_response(stream)
 
 if __name__ == "__main__":
+    configure_logging()
     example_usage()
\ No newline at end of file
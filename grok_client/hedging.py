@@ -0,0 +1,184 @@
+"""
+Hedged upstream requests.
+
+A stream that has produced no token after the hedge delay (a high
+percentile of recent first-token latencies) gets a duplicate request,
+preferably on another account. Whichever produces a token first is
+streamed to the client and the other is cancelled. A budget keeps the
+duplicates to a small fraction of all upstream requests, so hedging
+cannot snowball into extra load when the upstream is slow for everyone.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+from . import metrics
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class HedgePolicy:
+    """When to hedge, and how often it is allowed."""
+
+    def __init__(self, percentile=95.0, budget=0.05, min_delay=0.25, max_delay=10.0,
+                 window=512, min_samples=20, max_burst=5.0):
+        """
+        Initialize the policy
+
+        Args:
+            percentile (float): First-token latency percentile used as the delay
+            budget (float): Largest fraction of requests that may be hedged
+            min_delay (float): Lower bound of the delay in seconds
+            max_delay (float): Upper bound of the delay, also used until
+                ``min_samples`` latencies have been seen
+            window (int): Recent first-token latencies the percentile is taken over
+            min_samples (int): Latencies needed before the percentile is trusted
+            max_burst (float): Hedges that may be saved up while the upstream is fast
+        """
+        self.percentile = percentile
+        self.budget = budget
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.max_burst = max_burst
+        self.requests = 0
+        self.hedged = 0
+        self.won = 0
+        self._latencies = deque(maxlen=window)
+        self._tokens = 0.0
+        self._delay = max_delay
+        self._stale = 0
+
+    def delay(self):
+        """
+        How long to wait for a first token before hedging
+
+        Returns:
+            float: Seconds, the configured percentile of recent first-token
+                latencies within [min_delay, max_delay]
+        """
+        if self._stale and len(self._latencies) >= self.min_samples:
+            ordered = sorted(self._latencies)
+            index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100.0))
+            self._delay = min(self.max_delay, max(self.min_delay, ordered[index]))
+            self._stale = 0
+            metrics.hedge_delay.set(self._delay)
+        return self._delay
+
+    def observe(self, latency):
+        """
+        Record the first-token latency of a request
+
+        Args:
+            latency (float): Seconds from sending the request to its first
+                token (from sending the original request, if it was hedged)
+        """
+        self._latencies.append(latency)
+        self._stale += 1
+
+    def _admit(self):
+        # Every request earns a fraction of a hedge; a hedge spends a whole one
+        self.requests += 1
+        self._tokens = min(self.max_burst, self._tokens + self.budget)
+
+    def _spend(self):
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+    async def stream(self, primary, hedge, on_hedge_won=None):
+        """
+        Stream tokens from the first of two upstream requests to produce one
+
+        Args:
+            primary (Callable[[], AsyncIterator[str]]): Starts the request
+            hedge (Callable[[], AsyncIterator[str]]): Starts the duplicate;
+                only called once the hedge delay has passed without a token
+            on_hedge_won (Callable[[], None], optional): Called before the
+                first token when the duplicate won
+
+        Yields:
+            str: The tokens of the winning request
+        """
+        self._admit()
+        started = time.perf_counter()
+        streams = [primary()]
+        tasks = {asyncio.ensure_future(streams[0].__anext__()): 0}
+        timeout = self.delay()
+        hedge_tried = False
+        winner = None
+        first = None
+        error = None
+        try:
+            while tasks and winner is None:
+                done, _ = await asyncio.wait(
+                    tasks, timeout=None if hedge_tried else timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedge_tried = True
+                    if not self._spend():
+                        metrics.upstream_hedges.labels("budget").inc()
+                        continue
+                    self.hedged += 1
+                    logger.debug("No token after %.3fs, hedging the upstream request", timeout)
+                    streams.append(hedge())
+                    tasks[asyncio.ensure_future(streams[1].__anext__())] = 1
+                    continue
+                # The original request wins a tie
+                for task in sorted(done, key=tasks.get):
+                    index = tasks.pop(task)
+                    try:
+                        first = task.result()
+                    except StopAsyncIteration:
+                        first = None
+                    except Exception as e:
+                        if index == 1:
+                            metrics.upstream_hedges.labels("failed").inc()
+                            logger.warning(f"Hedged request failed: {str(e)}")
+                        error = error or e
+                        continue
+                    winner = index
+                    break
+            if winner is None:
+                raise error
+
+            self.observe(time.perf_counter() - started)
+            if winner == 0 and tasks:
+                metrics.upstream_hedges.labels("lost").inc()
+            elif winner == 1:
+                metrics.upstream_hedges.labels("won").inc()
+                self.won += 1
+                if on_hedge_won is not None:
+                    on_hedge_won()
+        finally:
+            # Cancel the loser; cancelling its pending read also closes it
+            for task in tasks:
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+            for index, stream in enumerate(streams):
+                if index != winner:
+                    await stream.aclose()
+
+        winning = streams[winner]
+        try:
+            if first is not None:
+                yield first
+                async for token in winning:
+                    yield token
+        finally:
+            await winning.aclose()
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "won": self.won,
+            "delay": round(self._delay, 3),
+        }
@@ -3,6 +3,7 @@ import sys
 import logging
 import argparse
 from dotenv import load_dotenv
+from .context import ContextWindow
 from .grok_openai_client import GrokOpenAIClient
 
 # Set up logging
@@ -25,6 +26,7 @@ def parse_arguments():
     parser.add_argument('--json', action='store_true', help='Request responses in JSON format')
     parser.add_argument('--system', help='Custom system message')
     parser.add_argument('--temperature', type=float, default=1.0, help='Temperature for response generation (default: 1.0)')
+    parser.add_argument('--max-context-tokens', type=int, help='Token budget of the history sent each turn, 0 for no limit (default: from .env or 100000)')
     
     return parser.parse_args()
 
@@ -81,10 +83,12 @@ def interactive_chat():
     print("Type '/help' to see available commands.")
     print("==============================\n")
     
-    # Initialize conversation history
-    conversation = []
-    if system_message:
-        conversation.append({"role": "system", "content": system_message})
+    # Initialize conversation history; the oldest turns are dropped once it outgrows the budget
+    max_context_tokens = args.max_context_tokens
+    if max_context_tokens is None:
+        max_context_tokens = int(os.getenv("GROK_CONTEXT_MAX_TOKENS", "100000"))
+    conversation = ContextWindow(max_context_tokens)
+    conversation.set_system(system_message)
     
     try:
         while True:
@@ -98,9 +102,7 @@ def interactive_chat():
             
             # Check for clear command
             if user_input.lower() == 'clear':
-                conversation = []
-                if system_message:
-                    conversation.append({"role": "system", "content": system_message})
+                conversation.clear()
                 print("\nConversation history cleared.")
                 continue
             
@@ -138,8 +140,7 @@ def interactive_chat():
             if user_input.lower().startswith('/system '):
                 system_message = user_input.split(' ', 1)[1]
                 # Update the system message in the conversation
-                conversation = [msg for msg in conversation if msg["role"] != "system"]
-                conversation.insert(0, {"role": "system", "content": system_message})
+                conversation.set_system(system_message)
                 print(f"\nSystem message updated.")
                 continue
             
@@ -152,7 +153,7 @@ def interactive_chat():
                 
                 # Prepare request parameters
                 params = {
-                    "messages": conversation,
+                    "messages": conversation.messages(),
                     "stream": True,
                     "temperature": args.temperature
                 }
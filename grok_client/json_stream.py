@@ -0,0 +1,293 @@
+"""
+Incremental validation of JSON-mode completions.
+
+With ``response_format: {"type": "json_object"}`` Grok still tends to
+wrap its answer in a markdown code fence, open with a sentence of prose,
+or keep talking after the JSON. JSONScanner follows the JSON grammar as
+tokens arrive:
+
+- text before the value (prose, a fence opener) is held back;
+- a value that starts the reply, a line or a code fence is passed
+  through as it streams;
+- a ``{`` or ``[`` in the middle of a line may be prose (``Sure, [note]
+  {...}``), so such a value is held back until it closes. If it turns
+  out not to be JSON, the scan goes on from its next character;
+- the stream ends as soon as the top-level value closes, so closing
+  fences and trailing chatter are never read;
+- malformed JSON is reported at the first character that cannot be
+  valid, not after the whole answer has arrived.
+
+A reply without any JSON value is wrapped as ``{"response": "<text>"}``,
+as the non-streaming endpoint has always done.
+"""
+
+import json
+import re
+
+from . import metrics
+from .exceptions import MalformedJSON
+
+# One lexeme after optional whitespace; the group that matched tells which
+_LEXEME = re.compile(
+    r'[ \t\r\n]*(?:(\{)|(\[)|(\})|(\])|(,)|(:)|(")'
+    r'|(-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?)|(true|false|null))'
+)
+_OPEN_OBJECT, _OPEN_ARRAY, _CLOSE_OBJECT, _CLOSE_ARRAY, _COMMA, _COLON, _QUOTE, _NUMBER, _LITERAL = range(1, 10)
+# The characters of a string up to its closing quote, a bad character or the end of the text
+_STRING_BODY = re.compile(r'(?:[^"\\\x00-\x1f]+|\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})*')
+# What may still become a valid lexeme once more text arrives
+_PARTIAL_LEXEME = re.compile(
+    r"[ \t\r\n]*(?:-?[0-9]*\.?[0-9]*(?:[eE][+-]?[0-9]*)?|t(?:r(?:ue?)?)?|f(?:a(?:l(?:se?)?)?)?|n(?:u(?:ll?)?)?)"
+)
+_PARTIAL_ESCAPE = re.compile(r"\\(?:u[0-9a-fA-F]{0,3})?")
+_VALUE_START = re.compile(r"[{\[]")
+# Held-back text after which a value is streamed at once: nothing, a line break or a fence opener
+_STREAMED_START = re.compile(r"(?:\A|\n|```[\w-]*)[ \t\r]*\Z")
+_FENCE = re.compile(r"^```[\w-]*\s*|\s*```$")
+
+# What the scanner expects next
+_PREAMBLE, _VALUE, _VALUE_OR_CLOSE, _KEY, _KEY_OR_CLOSE, _COLON_NEXT, _COMMA_OR_CLOSE, _STRING, _DONE = range(9)
+
+
+class JSONScanner:
+    """
+    Push parser that checks one streamed JSON value.
+
+    Feed it the text of each token; it returns the part that belongs to
+    the JSON value. Work is done a lexeme at a time with compiled
+    regexes (a whole string body is one match), and a lexeme cut in two
+    by a token boundary is carried over to the next token.
+    """
+
+    def __init__(self):
+        self.state = _PREAMBLE
+        self.length = 0
+        self._stack = []
+        self._preamble = []
+        self._key = False
+        self._carry = ""
+        # Pieces of a value that started mid-line, held back until it closes
+        self._held = None
+
+    @property
+    def started(self):
+        return self.state != _PREAMBLE
+
+    @property
+    def done(self):
+        return self.state == _DONE
+
+    def feed(self, text):
+        """
+        Scan the next piece of the response
+
+        Args:
+            text (str): A streamed token
+
+        Returns:
+            str: The part of the JSON value that can be passed on: the
+                value's part of ``text``, or the whole value once one
+                that started mid-line closes
+
+        Raises:
+            MalformedJSON: At the first lexeme that cannot be valid JSON
+        """
+        while True:
+            state = self.state
+            if state == _STRING and not self._carry and self._held is None:
+                # Most tokens fall inside a string and end there
+                if _STRING_BODY.match(text).end() == len(text):
+                    self.length += len(text)
+                    return text
+            elif state == _DONE:
+                return ""
+            start = 0
+            if state == _PREAMBLE:
+                match = _VALUE_START.search(text)
+                if match is None:
+                    self._preamble.append(text)
+                    return ""
+                start = match.start()
+                self._preamble.append(text[:start])
+                self.state = _VALUE
+                if not _STREAMED_START.search("".join(self._preamble)):
+                    self._held = []
+            carried = len(self._carry)
+            try:
+                stop = self._scan(self._carry + text[start:] if carried else text[start:] if start else text)
+            except MalformedJSON:
+                if self._held is None:
+                    raise
+                # Prose after all; look for a value after its first character
+                text = self._abandon(text[start:])
+                continue
+            # Past the end of the value only when it closed in this token
+            end = start + stop - carried if self.state == _DONE else len(text)
+            self.length += end - start
+            if self._held is None:
+                return text[start:end]
+            self._held.append(text[start:end])
+            if self.state != _DONE:
+                return ""
+            value = "".join(self._held)
+            self._held = None
+            return value
+
+    def finish(self):
+        """
+        Check the end of the response
+
+        Returns:
+            str: What is left to send: nothing after a complete value, a
+                held-back value, or the whole reply wrapped as
+                ``{"response": ...}`` if it held no JSON value
+
+        Raises:
+            MalformedJSON: If the response ended inside the value
+        """
+        while self._held is not None:
+            # A value that started mid-line and never closed was prose too
+            value = self.feed(self._abandon(""))
+            if self.state == _DONE:
+                return value
+        if self.state == _DONE:
+            return ""
+        if self.state == _PREAMBLE:
+            text = _FENCE.sub("", "".join(self._preamble).strip()).strip()
+            return json.dumps({"response": text}) if text else ""
+        raise MalformedJSON(f"JSON response ended after {self.length} characters, before its value was closed")
+
+    def _abandon(self, text):
+        """Give up a held-back value; returns what to scan again, after its first character"""
+        candidate = "".join(self._held) + text
+        self._preamble.append(candidate[:1])
+        self.state = _PREAMBLE
+        self.length = 0
+        self._stack = []
+        self._key = False
+        self._carry = ""
+        self._held = None
+        return candidate[1:]
+
+    def _fail(self, text, position, expected):
+        found = text[position:position + 10].lstrip(" \t\r\n")[:10]
+        offset = self.length + position - len(self._carry)
+        raise MalformedJSON(f"Malformed JSON response at character {offset}: expected {expected}, got {found!r}")
+
+    def _scan(self, text):
+        """Advance through ``text``, returning where the value ended or ``len(text)``"""
+        state = self.state
+        stack = self._stack
+        size = len(text)
+        position = 0
+        carry = ""
+        while position < size:
+            if state == _STRING:
+                position = _STRING_BODY.match(text, position).end()
+                if position == size:
+                    break
+                char = text[position]
+                if char == '"':
+                    position += 1
+                    state = _COLON_NEXT if self._key else _COMMA_OR_CLOSE
+                elif char == "\\" and _PARTIAL_ESCAPE.fullmatch(text, position):
+                    # An escape sequence split by the token boundary
+                    carry = text[position:]
+                    break
+                else:
+                    self._fail(text, position, "a string character or escape")
+                continue
+
+            match = _LEXEME.match(text, position)
+            if match is None or match.lastindex >= _NUMBER:
+                # A number or literal running to the end of the text may go on in the next token
+                if _PARTIAL_LEXEME.fullmatch(text, position):
+                    carry = text[position:]
+                    break
+                if match is None:
+                    self._fail(text, position, "a JSON token")
+            kind = match.lastindex
+
+            if state == _VALUE or state == _VALUE_OR_CLOSE:
+                if kind == _OPEN_OBJECT:
+                    stack.append(_CLOSE_OBJECT)
+                    state = _KEY_OR_CLOSE
+                elif kind == _OPEN_ARRAY:
+                    stack.append(_CLOSE_ARRAY)
+                    state = _VALUE_OR_CLOSE
+                elif kind == _QUOTE:
+                    self._key = False
+                    state = _STRING
+                elif kind >= _NUMBER:
+                    state = _COMMA_OR_CLOSE
+                elif not (kind == _CLOSE_ARRAY and state == _VALUE_OR_CLOSE):
+                    self._fail(text, position, "a value")
+            elif state == _COMMA_OR_CLOSE:
+                if kind == _COMMA:
+                    state = _KEY if stack[-1] == _CLOSE_OBJECT else _VALUE
+                elif kind != stack[-1]:
+                    self._fail(text, position, "',' or '}'" if stack[-1] == _CLOSE_OBJECT else "',' or ']'")
+            elif state == _KEY or state == _KEY_OR_CLOSE:
+                if kind == _QUOTE:
+                    self._key = True
+                    state = _STRING
+                elif not (kind == _CLOSE_OBJECT and state == _KEY_OR_CLOSE):
+                    self._fail(text, position, "an object key")
+            elif kind == _COLON:
+                state = _VALUE
+            else:
+                self._fail(text, position, "':'")
+            position = match.end()
+
+            if kind == _CLOSE_OBJECT or kind == _CLOSE_ARRAY:
+                stack.pop()
+                if not stack:
+                    state = _DONE
+                    break
+                state = _COMMA_OR_CLOSE
+
+        self.state = state
+        self._carry = carry
+        return position
+
+
+async def scan_json(tokens):
+    """
+    Pass through the JSON value of a streamed JSON-mode completion
+
+    Args:
+        tokens (AsyncIterator[str]): The upstream tokens; closed as soon
+            as the top-level value is complete
+
+    Yields:
+        str: The JSON value, a piece per token
+
+    Raises:
+        MalformedJSON: As soon as the stream cannot be valid JSON
+    """
+    scanner = JSONScanner()
+    # Left unset when the upstream fails or the caller stops reading
+    outcome = None
+    try:
+        async for token in tokens:
+            try:
+                text = scanner.feed(token)
+            except MalformedJSON:
+                outcome = "malformed"
+                raise
+            if text:
+                yield text
+            if scanner.done:
+                break
+        try:
+            tail = scanner.finish()
+        except MalformedJSON:
+            outcome = "malformed"
+            raise
+        outcome = "valid" if scanner.done else "wrapped"
+        if tail:
+            yield tail
+    finally:
+        if outcome is not None:
+            metrics.json_responses.labels(outcome).inc()
+        await tokens.aclose()
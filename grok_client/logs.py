@@ -0,0 +1,163 @@
+"""
+Structured logging for grok_client.
+
+Importing the package configures nothing: library users keep control of
+their logging setup. The server and CLIs call ``configure_logging``,
+which attaches one handler to the ``grok_client`` logger that redacts
+credentials and writes either text or JSON lines.
+
+Hot paths only log through ``log_event`` behind a level check made once
+per stream, and per-frame events are sampled, so a disabled DEBUG level
+costs one boolean test per frame.
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+
+LOGGER_NAME = "grok_client"
+
+REDACTED = "[REDACTED]"
+
+# Field names whose values are never written out
+SENSITIVE_KEYS = frozenset(("cookie", "cookies", "sso", "sso-rw", "authorization", "set-cookie"))
+
+# Credentials inside free text: "sso=...", "'sso-rw': '...'", "Cookie: ...",
+# "Authorization: Bearer ...", in any quoting
+_CREDENTIAL_PATTERN = re.compile(
+    r"(?i)(\b(?:sso-rw|sso|cookie|authorization)\b['\"]?\s*[:=]\s*['\"]?)((?:bearer\s+)?[^'\";,\s}]+)"
+)
+
+
+def redact(text):
+    """
+    Mask credential values in a piece of text
+
+    Args:
+        text (str): A log message
+
+    Returns:
+        str: The message with cookie and authorization values replaced
+    """
+    return _CREDENTIAL_PATTERN.sub(lambda match: match.group(1) + REDACTED, text)
+
+
+def log_event(logger, level, event, **fields):
+    """
+    Log a structured event if the level is enabled
+
+    Nothing is formatted when the level is disabled. The fields end up
+    as keys of the JSON line, or as ``key=value`` pairs in text output.
+
+    Args:
+        logger (logging.Logger): The module logger
+        level (int): Logging level, e.g. logging.DEBUG
+        event (str): Short event name, e.g. "upstream_stream"
+        **fields: Attributes of the event
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields})
+
+
+class Sampler:
+    """
+    Lets through one call in every ``every``.
+
+    Used for per-token and per-frame events, which would otherwise
+    produce one log line per token.
+    """
+
+    def __init__(self, every=1):
+        self.every = max(1, int(every))
+        self._calls = 0
+
+    def __call__(self):
+        self._calls += 1
+        return (self._calls - 1) % self.every == 0
+
+
+# Per-frame DEBUG events of the upstream stream
+frame_sampler = Sampler(os.getenv("GROK_LOG_FRAME_SAMPLE", "100"))
+
+
+class RedactingFilter(logging.Filter):
+    """Handler filter masking credentials in messages and event fields."""
+
+    def filter(self, record):
+        message = record.getMessage()
+        redacted = redact(message)
+        if redacted != message:
+            record.msg = redacted
+            record.args = None
+        fields = getattr(record, "fields", None)
+        if fields:
+            record.fields = {
+                key: REDACTED if key.lower() in SENSITIVE_KEYS else value
+                for key, value in fields.items()
+            }
+        return True
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formats records and their event fields as text or as JSON lines."""
+
+    def __init__(self, json_output=False):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        self.json_output = json_output
+
+    def format(self, record):
+        fields = getattr(record, "fields", None) or {}
+        if not self.json_output:
+            text = super().format(record)
+            if fields:
+                text += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+            return text
+
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=None, json_output=None, stream=None):
+    """
+    Install the grok_client log handler
+
+    Calling it again replaces the handler it installed before.
+
+    Args:
+        level (Union[str, int], optional): Level of the grok_client loggers.
+            Defaults to GROK_LOG_LEVEL or INFO.
+        json_output (bool, optional): Write JSON lines. Defaults to
+            GROK_LOG_FORMAT=json.
+        stream (IO, optional): Where to write. Defaults to stderr.
+
+    Returns:
+        logging.Logger: The grok_client package logger
+    """
+    level = level or os.getenv("GROK_LOG_LEVEL", "INFO")
+    if json_output is None:
+        json_output = os.getenv("GROK_LOG_FORMAT", "text").lower() == "json"
+
+    package_logger = logging.getLogger(LOGGER_NAME)
+    for handler in list(package_logger.handlers):
+        if getattr(handler, "grok_handler", False):
+            package_logger.removeHandler(handler)
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.grok_handler = True
+    handler.addFilter(RedactingFilter())
+    handler.setFormatter(StructuredFormatter(json_output=json_output))
+    package_logger.addHandler(handler)
+    package_logger.setLevel(level.upper() if isinstance(level, str) else level)
+    # Our handler already writes these records; don't repeat them via root
+    package_logger.propagate = False
+    return package_logger
@@ -0,0 +1,272 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters, gauges and fixed-bucket histograms are plain dicts keyed by
+label values. They are updated without locks: the server updates them
+from the event loop thread only, and the sync client's updates from
+other threads can at worst lose an increment under the GIL. Resolve the
+labels once with ``labels(...)`` on hot paths; the child is cached, so
+an update costs a dict lookup and an addition.
+"""
+
+from bisect import bisect_left
+
+# Upper bounds in seconds, from a cache hit to a slow multi-minute stream
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+RATE_BUCKETS = (1, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+
+    def labels(self, *values):
+        """
+        Get the series for a set of label values
+
+        Args:
+            *values: One value per label name, in order
+
+        Returns:
+            The child series, created on first use
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            # setdefault hands back the stored child if another thread raced us
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def clear(self):
+        """Drop every series, e.g. before re-exporting a snapshot"""
+        self._children.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount=1.0):
+        self.value += amount
+
+    def dec(self, amount=1.0):
+        self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, e.g. requests or errors."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1.0):
+        """Increment the unlabeled series"""
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Gauge(Counter):
+    """A value that goes up and down, e.g. streams in flight."""
+
+    kind = "gauge"
+
+    def set(self, value):
+        """Set the unlabeled series"""
+        self.labels().set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("upper_bounds", "counts", "sum")
+
+    def __init__(self, upper_bounds):
+        self.upper_bounds = upper_bounds
+        # One slot per bucket plus the +Inf overflow
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    """Distribution of observations over fixed buckets, e.g. latencies."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        """
+        Initialize the histogram
+
+        Args:
+            name (str): Metric name
+            documentation (str): HELP text
+            labelnames (Tuple[str, ...]): Label names
+            buckets (Tuple[float, ...]): Sorted bucket upper bounds
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        """Record a value in the unlabeled series"""
+        self.labels().observe(value)
+
+    def _render_child(self, values, child):
+        cumulative = 0
+        counts = list(child.counts)
+        for upper_bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="' + _format_value(float(upper_bound)) + '"'
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+        labels = _format_labels(self.labelnames, values)
+        yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+        yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    """A set of metrics rendered together on one endpoint."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """
+        Render every metric
+
+        Returns:
+            str: The Prometheus text exposition format (version 0.0.4)
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
+
+# Proxy stages
+requests_total = registry.counter(
+    "grok_requests_total", "Chat completion requests by final status", ("model", "stream", "status"))
+request_duration = registry.histogram(
+    "grok_request_duration_seconds", "Time from receiving a request to its last byte", ("model", "stream"))
+request_parse = registry.histogram(
+    "grok_request_parse_seconds", "Time spent reading and validating the request body", ("model",))
+response_serialize = registry.histogram(
+    "grok_response_serialize_seconds", "Time spent shaping and serializing the response", ("model", "stream"))
+time_to_first_token = registry.histogram(
+    "grok_time_to_first_token_seconds", "Time from receiving a streaming request to its first token", ("model",))
+tokens_per_second = registry.histogram(
+    "grok_tokens_per_second", "Streaming rate after the first token", ("model",), buckets=RATE_BUCKETS)
+active_streams = registry.gauge(
+    "grok_active_streams", "Streaming responses currently open", ("model",))
+
+# Upstream
+upstream_connect = registry.histogram(
+    "grok_upstream_connect_seconds", "Time until the upstream returned its response headers", ("account",))
+upstream_ttfb = registry.histogram(
+    "grok_upstream_ttfb_seconds", "Time until the first byte of the upstream response body", ("account",))
+upstream_errors = registry.counter(
+    "grok_upstream_errors_total", "Failed upstream requests by error class", ("account", "error"))
+
+# Caches and accounts, refreshed when /metrics is scraped
+cache_lookups = registry.counter(
+    "grok_cache_lookups_total", "Cache lookups by result", ("cache", "result"))
+cache_hit_ratio = registry.gauge(
+    "grok_cache_hit_ratio", "Hits over lookups since start", ("cache",))
+account_in_flight = registry.gauge(
+    "grok_account_in_flight", "Upstream requests in flight per account", ("account",))
+account_quarantined = registry.gauge(
+    "grok_account_quarantined", "1 while the account is quarantined", ("account",))
+
+# Admission control
+admission_wait = registry.histogram(
+    "grok_admission_wait_seconds", "Time admitted requests waited for a slot", ("limit",))
+admission_rejected = registry.counter(
+    "grok_admission_rejected_total", "Requests shed with 429 by reason", ("limit", "reason"))
+admission_in_flight = registry.gauge(
+    "grok_admission_in_flight", "Requests holding a global slot", ())
+admission_queued = registry.gauge(
+    "grok_admission_queued", "Requests waiting for a global slot", ())
+
+# Hedged upstream requests
+upstream_hedges = registry.counter(
+    "grok_upstream_hedges_total", "Hedging decisions by outcome (won, lost, failed, budget)", ("outcome",))
+hedge_delay = registry.gauge(
+    "grok_upstream_hedge_delay_seconds", "Time without a first token after which a request is hedged", ())
+
+# Retries and circuit breakers
+upstream_retries = registry.counter(
+    "grok_upstream_retries_total", "Upstream requests retried by error class", ("account", "error"))
+circuit_state = registry.gauge(
+    "grok_circuit_state", "Circuit breaker state per upstream: 0 closed, 1 half-open, 2 open", ("upstream",))
+circuit_rejected = registry.counter(
+    "grok_circuit_rejected_total", "Requests failed fast while the circuit was open", ("upstream",))
+
+# Client disconnects
+cancelled_requests = registry.counter(
+    "grok_cancelled_requests_total", "Requests whose upstream call was cancelled because the caller went away",
+    ("model", "stream"))
+
+# JSON-mode completions
+json_responses = registry.counter(
+    "grok_json_responses_total", "JSON-mode completions by outcome (valid, wrapped, malformed)", ("outcome",))
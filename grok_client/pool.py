@@ -0,0 +1,290 @@
+import asyncio
+import contextlib
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+def credential_key(cookies):
+    """
+    Build a stable identity for a set of Grok cookies
+
+    Only the sso/sso-rw pair identifies an account; the other browser
+    cookies (x-anonuserid, x-challenge, ...) rotate freely. The key is
+    hashed so credentials never appear in logs or metrics labels.
+
+    Args:
+        cookies (dict): Cookie name to value mapping
+
+    Returns:
+        str: A short hex digest identifying the credential
+    """
+    if "sso" in cookies or "sso-rw" in cookies:
+        identity = f"{cookies.get('sso', '')}|{cookies.get('sso-rw', '')}"
+    else:
+        identity = "|".join(f"{name}={value}" for name, value in sorted(cookies.items()))
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:16]
+
+
+class _Entry:
+    """A pooled session, how many requests are using it and when it was last used."""
+
+    __slots__ = ("key", "session", "last_used", "users", "retired")
+
+    def __init__(self, key, session, last_used):
+        self.key = key
+        self.session = session
+        self.last_used = last_used
+        self.users = 0
+        # Evicted while in use; closed when its last user is done
+        self.retired = False
+
+
+class SessionPool:
+    """
+    Bounded LRU pool of upstream HTTP sessions keyed by credential.
+
+    Repeat callers with the same cookies get the same session back, and
+    with it the warm keep-alive connections to grok.com. Sessions idle for
+    longer than ``idle_timeout`` and the least recently used sessions
+    beyond ``max_size`` are evicted. Requests hold their session with
+    ``lease``, and a session is only closed once no request is using it:
+    an evicted session that still has streams open leaves the pool at
+    once but is closed when its last stream ends.
+    """
+
+    def __init__(self, max_size=32, idle_timeout=300.0, max_connections=100, keepalive_expiry=120.0,
+                 connect_timeout=10.0, read_timeout=60.0):
+        """
+        Initialize the pool
+
+        Args:
+            max_size (int): Maximum number of credentials kept warm
+            idle_timeout (float): Seconds after which an unused session is closed
+            max_connections (int): Connection limit of each session
+            keepalive_expiry (float): Seconds an idle connection is kept open
+            connect_timeout (float): Seconds to establish a connection, 0 for no limit
+            read_timeout (float): Longest silence between two reads of a
+                response, 0 for no limit
+        """
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        self.keepalive_expiry = keepalive_expiry
+        # (connect, read) in the form requests takes per call
+        self.timeout = (connect_timeout or None, read_timeout or None)
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _create(self, cookies):
+        raise NotImplementedError
+
+    def _close(self, session):
+        raise NotImplementedError
+
+    def _checkout(self, cookies):
+        """Find or create the entry of a credential, marked as used by one more request"""
+        key = credential_key(cookies)
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None:
+                self._sessions.move_to_end(key)
+                entry.last_used = now
+            else:
+                entry = _Entry(key, self._create(cookies), now)
+                self._sessions[key] = entry
+                logger.debug(f"Created pooled session for credential {key}")
+            entry.users += 1
+
+            # Evict idle credentials first, then the least recently used
+            for other in list(self._sessions.values()):
+                if other is not entry and other.users == 0 and now - other.last_used > self.idle_timeout:
+                    evicted.append(self._retire(other))
+            if len(self._sessions) > self.max_size:
+                for other in list(self._sessions.values()):
+                    if len(self._sessions) <= self.max_size:
+                        break
+                    if other is not entry:
+                        evicted.append(self._retire(other))
+
+        for session in evicted:
+            if session is not None:
+                self._close(session)
+        return entry
+
+    def _retire(self, entry):
+        """Drop an entry from the pool; returns its session if nothing uses it any more"""
+        del self._sessions[entry.key]
+        if entry.users:
+            entry.retired = True
+            return None
+        return entry.session
+
+    def _checkin(self, entry):
+        with self._lock:
+            entry.users -= 1
+            entry.last_used = time.monotonic()
+            closing = entry.retired and entry.users == 0
+        if closing:
+            self._close(entry.session)
+
+    @contextlib.contextmanager
+    def lease(self, cookies):
+        """
+        Hold the session of a credential for the length of a request
+
+        Args:
+            cookies (dict): Cookie name to value mapping
+
+        Yields:
+            The pooled session for these cookies, never closed while held
+        """
+        entry = self._checkout(cookies)
+        try:
+            yield entry.session
+        finally:
+            self._checkin(entry)
+
+    def get(self, cookies):
+        """
+        Return the session for a credential, creating it if needed
+
+        The session is not held; use ``lease`` around a request that must
+        not have its session closed under it.
+
+        Args:
+            cookies (dict): Cookie name to value mapping
+
+        Returns:
+            The pooled session for these cookies
+        """
+        entry = self._checkout(cookies)
+        self._checkin(entry)
+        return entry.session
+
+    def clear(self):
+        """Close every pooled session that is not in use, and the others once they are released"""
+        with self._lock:
+            sessions = [self._retire(entry) for entry in list(self._sessions.values())]
+        for session in sessions:
+            if session is not None:
+                self._close(session)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class RequestsSessionPool(SessionPool):
+    """SessionPool of ``requests.Session`` objects for GrokClient."""
+
+    def _create(self, cookies):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers["connection"] = "keep-alive"
+        for cookie_name, cookie_value in cookies.items():
+            session.cookies.set(cookie_name, cookie_value)
+        return session
+
+    def _close(self, session):
+        session.close()
+
+
+class AsyncClientPool(SessionPool):
+    """
+    SessionPool of ``httpx.AsyncClient`` objects for AsyncGrokClient.
+
+    Async connections belong to the event loop that opened them, so the
+    pool is reset whenever it is used from a different loop.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loop = None
+        self._closing = set()
+
+    def _create(self, cookies):
+        return httpx.AsyncClient(
+            cookies=cookies,
+            timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+        )
+
+    def _checkout(self, cookies):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            with self._lock:
+                stale = list(self._sessions.values())
+                self._sessions.clear()
+                previous, self._loop = self._loop, loop
+            self._drop(previous, stale)
+        return super()._checkout(cookies)
+
+    def _close(self, session):
+        # Eviction happens inside synchronous code; close in the background on
+        # the running loop, which is the client's own: clients of a previous
+        # loop are only closed here by the request still using them there
+        task = asyncio.get_running_loop().create_task(session.aclose())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    @staticmethod
+    def _drop(loop, entries):
+        """Close the idle clients of a previous event loop on that loop, if it still exists"""
+        idle = []
+        for entry in entries:
+            if entry.users:
+                entry.retired = True
+            else:
+                idle.append(entry.session)
+        if not idle:
+            return
+        if loop is None or loop.is_closed():
+            # Their connections went away with the loop
+            logger.debug(f"Dropped {len(idle)} pooled clients of a closed event loop")
+            return
+        for session in idle:
+            asyncio.run_coroutine_threadsafe(session.aclose(), loop)
+
+    async def aclose(self):
+        """Close every pooled client and wait for the connections to drain"""
+        with self._lock:
+            sessions = [self._retire(entry) for entry in list(self._sessions.values())]
+        for session in sessions:
+            if session is not None:
+                await session.aclose()
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+
+
+def _pool_settings():
+    return dict(
+        max_size=int(os.getenv("GROK_POOL_SIZE", "32")),
+        idle_timeout=float(os.getenv("GROK_POOL_IDLE_TIMEOUT", "300")),
+        max_connections=int(os.getenv("GROK_POOL_MAX_CONNECTIONS", "100")),
+        keepalive_expiry=float(os.getenv("GROK_POOL_KEEPALIVE", "120")),
+        connect_timeout=float(os.getenv("GROK_CONNECT_TIMEOUT", "10")),
+        read_timeout=float(os.getenv("GROK_READ_TIMEOUT", "60")),
+    )
+
+
+# Process-wide pools shared by every client instance
+session_pool = RequestsSessionPool(**_pool_settings())
+async_client_pool = AsyncClientPool(**_pool_settings())
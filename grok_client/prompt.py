@@ -0,0 +1,127 @@
+"""
+Assembly of the prompt sent upstream.
+
+Agents tend to send the same large function schemas with every
+request. Rendering them into the system prompt costs a pydantic dump
+and a JSON encode of the whole list, so rendered system prompts are
+kept in a bounded LRU keyed by a fingerprint of the functions and
+response format. The fingerprint is a hash of one compact encode (with
+orjson when it is installed). The flattened conversation is then built
+with a single join.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+# Fingerprint of requests with neither functions nor a response format
+DEFAULT_FINGERPRINT = "default"
+
+
+def _dumps(value):
+    # Sorted keys: schemas that only differ in key order share a fingerprint
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, sort_keys=True).encode("utf-8")
+
+
+def fingerprint(functions=None, response_format=None, tools=None, tool_choice=None, parallel_tool_calls=None):
+    """
+    Identify the parts of a request that shape its system prompt
+
+    Args:
+        functions (List[Function], optional): Function definitions with
+            name, description and parameters
+        response_format (dict, optional): The requested response format
+        tools (List[Tool], optional): Tool definitions, each with a function
+        tool_choice (Union[str, dict], optional): Which tools may be called
+        parallel_tool_calls (bool, optional): Whether several may be called at once
+
+    Returns:
+        str: A short hex digest, or DEFAULT_FINGERPRINT when none is set
+    """
+    if not functions and not response_format and not tools:
+        return DEFAULT_FINGERPRINT
+    schemas = [(f.name, f.description, f.parameters) for f in functions] if functions else None
+    parts = [schemas, response_format]
+    if tools:
+        parts.append([[(t.function.name, t.function.description, t.function.parameters) for t in tools],
+                      tool_choice, parallel_tool_calls])
+    return hashlib.blake2b(_dumps(parts), digest_size=16).hexdigest()
+
+
+def build_conversation(system, messages):
+    """
+    Flatten a conversation into the single message Grok receives
+
+    Args:
+        system (str): The system prompt
+        messages (Iterable[Tuple[str, str]]): (role, content) pairs
+
+    Returns:
+        str: ``system: ...`` followed by one ``role: content`` line per
+            message, joined once
+    """
+    parts = ["system: ", system, "\n"]
+    separator = ""
+    for role, content in messages:
+        parts.extend((separator, role, ": ", content))
+        separator = "\n"
+    return "".join(parts)
+
+
+class PromptCache:
+    """
+    Bounded LRU of rendered system prompts by fingerprint.
+
+    Thread-safe, and rendering happens outside the lock, so two callers
+    missing on the same fingerprint at once may both render it.
+    """
+
+    def __init__(self, max_entries=256):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries (int): Maximum number of prompts kept
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, render):
+        """
+        Return the prompt of a fingerprint, rendering it on a miss
+
+        Args:
+            key (str): Fingerprint from ``fingerprint``
+            render (Callable[[], str]): Builds the prompt
+
+        Returns:
+            str: The rendered system prompt
+        """
+        with self._lock:
+            prompt = self._entries.get(key)
+            if prompt is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return prompt
+            self.misses += 1
+        prompt = render()
+        with self._lock:
+            self._entries[key] = prompt
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return prompt
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,233 @@
+"""
+Retries and circuit breaking for upstream requests.
+
+The clients retry a request that failed before it produced a token
+when the failure is transient: the upstream could not be reached,
+timed out, or answered 429 or 5xx. Delays between attempts follow
+"decorrelated jitter", so clients that failed together do not retry
+in lockstep.
+
+A CircuitBreaker per upstream URL counts consecutive outage failures.
+Past a threshold it opens and requests fail fast with CircuitOpen.
+After a cool-down one probe request is let through, and its outcome
+closes or reopens the circuit.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from . import metrics
+from .exceptions import CircuitOpen, UpstreamTimeout, UpstreamUnavailable
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Upstream statuses worth another attempt
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def error_class(error):
+    """
+    Classify an upstream failure for metrics
+
+    Args:
+        error (GrokError): The failure
+
+    Returns:
+        str: ``timeout``, ``transport``, ``http_<status>`` or ``stream``
+    """
+    if isinstance(error, UpstreamTimeout):
+        return "timeout"
+    if isinstance(error, UpstreamUnavailable):
+        return "transport"
+    if error.status_code is not None:
+        return f"http_{error.status_code}"
+    return "stream"
+
+
+def is_outage(error):
+    """Whether a failure suggests the upstream itself is down, rather than the request or account"""
+    if isinstance(error, CircuitOpen):
+        return False
+    return isinstance(error, UpstreamUnavailable) or (error.status_code or 0) >= 500
+
+
+class RetryPolicy:
+    """How often and how long to wait before retrying a failed upstream request."""
+
+    def __init__(self, max_attempts=3, base_delay=0.2, max_delay=5.0):
+        """
+        Initialize the policy
+
+        Args:
+            max_attempts (int): Attempts per request including the first, 1 disables retries
+            base_delay (float): Shortest delay between attempts in seconds
+            max_delay (float): Longest delay between attempts in seconds
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, error, attempt):
+        """
+        Decide whether to try again
+
+        Args:
+            error (GrokError): Failure of the attempt, which emitted no token
+            attempt (int): Number of the failed attempt, starting at 1
+
+        Returns:
+            bool: Whether another attempt may be made
+        """
+        if attempt >= self.max_attempts or isinstance(error, CircuitOpen):
+            return False
+        return isinstance(error, UpstreamUnavailable) or error.status_code in RETRY_STATUSES
+
+    def delays(self):
+        """
+        Yield the delays between consecutive attempts of one request
+
+        Yields:
+            float: Seconds to wait, each drawn between ``base_delay`` and
+                three times the previous delay, capped at ``max_delay``
+        """
+        delay = self.base_delay
+        while True:
+            delay = min(self.max_delay, random.uniform(self.base_delay, delay * 3))
+            yield delay
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker of one upstream.
+
+    Thread-safe, so the sync client's worker threads and the event loop
+    can share it.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=10.0):
+        """
+        Initialize the breaker
+
+        Args:
+            name (str): Upstream label used in logs and metrics
+            failure_threshold (int): Consecutive outage failures that open the circuit
+            reset_timeout (float): Seconds the circuit stays open before a probe
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Admit a request, or fail fast while the circuit is open
+
+        Returns:
+            bool: Whether the request is the probe of a half-open circuit,
+                which must be passed to record or abandon
+
+        Raises:
+            CircuitOpen: If the upstream is considered down
+        """
+        if self.state == self.CLOSED:
+            return False
+        with self._lock:
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN and not self._probing:
+                # Let exactly one request find out whether the upstream is back
+                self._probing = True
+                return True
+            if self.state == self.CLOSED:
+                return False
+        metrics.circuit_rejected.labels(self.name).inc()
+        raise CircuitOpen(f"Upstream {self.name} is unavailable", retry_after=max(1, int(remaining + 1)))
+
+    def record(self, error=None):
+        """
+        Report the outcome of an admitted request
+
+        Args:
+            error (GrokError, optional): The failure, or None once the
+                upstream has answered with data
+        """
+        outage = error is not None and is_outage(error)
+        if not outage and self.state == self.CLOSED and not self.failures:
+            return
+        with self._lock:
+            self._probing = False
+            if not outage:
+                self.failures = 0
+                if self.state != self.CLOSED:
+                    logger.info(f"Upstream {self.name} recovered, closing circuit")
+                    self._set_state(self.CLOSED)
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Opening circuit of {self.name} after {self.failures} failures: {error}")
+                self.opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def abandon(self):
+        """Let another request probe after the probe was cancelled before its outcome was known"""
+        with self._lock:
+            self._probing = False
+
+    def _set_state(self, state):
+        self.state = state
+        metrics.circuit_state.labels(self.name).set(state)
+
+
+class BreakerRegistry:
+    """The circuit breakers of a process, one per upstream URL."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=10.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, api_url):
+        """
+        Return the breaker of an upstream, creating it if needed
+
+        Args:
+            api_url (str): Root URL of the upstream chat API
+
+        Returns:
+            CircuitBreaker: Shared by every client of that upstream
+        """
+        breaker = self._breakers.get(api_url)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(api_url)
+                if breaker is None:
+                    breaker = self._breakers[api_url] = CircuitBreaker(
+                        urlsplit(api_url).netloc or api_url, self.failure_threshold, self.reset_timeout
+                    )
+        return breaker
+
+
+# Process-wide defaults shared by every client instance
+retry_policy = RetryPolicy(
+    max_attempts=int(os.getenv("GROK_RETRY_ATTEMPTS", "3")),
+    base_delay=float(os.getenv("GROK_RETRY_BASE_DELAY", "0.2")),
+    max_delay=float(os.getenv("GROK_RETRY_MAX_DELAY", "5")),
+)
+breakers = BreakerRegistry(
+    failure_threshold=int(os.getenv("GROK_BREAKER_THRESHOLD", "5")),
+    reset_timeout=float(os.getenv("GROK_BREAKER_RESET", "10")),
+)
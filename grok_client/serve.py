@@ -0,0 +1,99 @@
+"""
+Production entry point of the proxy server.
+
+Runs ``grok_client.server:app`` in several worker processes, with
+uvloop and httptools when they are installed:
+
+    grok-serve --workers 4 --port 8000
+    python -m grok_client.serve --workers 4 --port 8000
+
+Workers do not share memory, so with more than one worker the response
+cache and the conversation map move to a SQLite database the workers
+share (see ``shared_cache``). Everything else stays per worker: account
+quarantine, admission limits, hedging statistics, metrics and batches.
+"""
+
+import argparse
+import importlib.util
+import logging
+import os
+import shutil
+import tempfile
+
+from .logs import configure_logging
+
+# Set up logging (named explicitly, as __name__ is "__main__" under python -m)
+logger = logging.getLogger("grok_client.serve")
+
+
+def _installed(module):
+    return importlib.util.find_spec(module) is not None
+
+
+def default_shared_cache(port):
+    """Database path used when none is configured, in a fresh directory only this user can open"""
+    return os.path.join(tempfile.mkdtemp(prefix=f"grok-serve-{port}-"), "cache.sqlite")
+
+
+def parse_arguments(argv=None):
+    """
+    Parse command line arguments
+
+    Args:
+        argv (List[str], optional): Arguments, defaults to sys.argv
+
+    Returns:
+        argparse.Namespace: The parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(description="Run the OpenAI-compatible Grok proxy with several workers")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"), help="Bind address (default: from .env or 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8000")), help="Port (default: from .env or 8000)")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("GROK_WORKERS", "0")), help="Worker processes (default: from .env or one per CPU)")
+    parser.add_argument("--shared-cache", default=os.getenv("GROK_SHARED_CACHE"), help="SQLite file shared by the workers (default: a fresh file in a private temp directory)")
+    parser.add_argument("--no-shared-cache", action="store_true", help="Keep caches per worker")
+    parser.add_argument("--log-level", default="info", help="Uvicorn log level (default: info)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    import uvicorn
+
+    configure_logging()
+    args = parse_arguments(argv)
+    workers = args.workers or os.cpu_count() or 1
+    private_directory = None
+
+    if args.no_shared_cache:
+        os.environ.pop("GROK_SHARED_CACHE", None)
+    elif args.shared_cache:
+        os.environ["GROK_SHARED_CACHE"] = args.shared_cache
+    elif workers > 1:
+        # A default database starts empty and goes away with the server; an explicit one survives restarts
+        path = default_shared_cache(args.port)
+        private_directory = os.path.dirname(path)
+        os.environ["GROK_SHARED_CACHE"] = path
+
+    loop = "uvloop" if _installed("uvloop") else "asyncio"
+    http = "httptools" if _installed("httptools") else "h11"
+    logger.info(
+        f"Serving on {args.host}:{args.port} with {workers} workers ({loop} loop, {http} parser, "
+        f"shared cache: {os.getenv('GROK_SHARED_CACHE') or 'off'})"
+    )
+    # Workers are spawned and import the app themselves, inheriting the environment set above
+    try:
+        uvicorn.run(
+            "grok_client.server:app",
+            host=args.host,
+            port=args.port,
+            workers=workers,
+            loop=loop,
+            http=http,
+            log_level=args.log_level,
+        )
+    finally:
+        if private_directory is not None:
+            shutil.rmtree(private_directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
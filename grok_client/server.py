@@ -1,19 +1,133 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, JSONResponse
-from typing import List, Optional, Dict, Any, Union
-from pydantic import BaseModel, Field
-from .client import GrokClient
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from starlette.background import BackgroundTask
+from typing import List, Optional, Dict, Any, Tuple, Union
+from pydantic import BaseModel, Field, ValidationError
+from .async_client import AsyncGrokClient, close_http_client
+from .cache import ResponseCache, TieredCache, make_key, split_chunks
+from .singleflight import SingleFlight
+from .accounts import QUARANTINE_STATUSES, AccountPool, parse_cookie_header
+from .admission import Admission
+from .context import estimate_tokens, fit_messages
+from .conversations import ConversationMap, Turn
+from .shared_cache import SharedConversationMap, SharedResponseCache
+from .prompt import PromptCache, build_conversation, fingerprint
+from .exceptions import CircuitOpen, GrokError, NoAccountAvailable, Overloaded, UpstreamTimeout
+from .hedging import HedgePolicy
+from .json_stream import scan_json
+from .tool_calls import FunctionCallParser, ToolCallParser, render_call, scan_tool_calls, tools_prompt
+from .batch import BatchRunner
+from . import metrics, tracing
+from .logs import configure_logging
+from .sse import DONE, ChunkSerializer, coalesce
+from .pool import credential_key
+import asyncio
+import functools
+import hashlib
+import hmac
 import json
+import os
 import time
+import uuid
 import logging
 
 # Set up logging
-logging.basicConfig(level=logging.DEBUG)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
+# Models served by this proxy; anything else is reported as "other" in metrics
+MODELS = ["grok-3"]
+
+# SQLite database shared by the worker processes of grok-serve, if any
+SHARED_CACHE_PATH = os.getenv("GROK_SHARED_CACHE")
+
+# Opt-in exact-match response cache
+response_cache = None
+if os.getenv("GROK_CACHE_ENABLED", "").lower() in ("1", "true", "yes"):
+    _cache_limits = dict(
+        max_entries=int(os.getenv("GROK_CACHE_MAX_ENTRIES", "1024")),
+        max_bytes=int(os.getenv("GROK_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        ttl=float(os.getenv("GROK_CACHE_TTL", "3600")),
+    )
+    # A cache file makes the memory cache the front of a persistent, shared tier
+    _cache_path = os.getenv("GROK_CACHE_PATH") or SHARED_CACHE_PATH
+    if _cache_path:
+        response_cache = TieredCache(ResponseCache(**_cache_limits), SharedResponseCache(
+            _cache_path,
+            max_entries=int(os.getenv("GROK_CACHE_DISK_MAX_ENTRIES", "100000")),
+            max_bytes=int(os.getenv("GROK_CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024))),
+            ttl=_cache_limits["ttl"],
+        ))
+    else:
+        response_cache = ResponseCache(**_cache_limits)
+
+# Coalescing of identical in-flight requests
+flights = None
+if os.getenv("GROK_SINGLEFLIGHT_ENABLED", "true").lower() in ("1", "true", "yes"):
+    flights = SingleFlight()
+
+# Server-owned Grok accounts used when a request carries no cookies
+account_pool = AccountPool.from_env()
+
+# Opt-in hedging: duplicate upstream requests that are slow to produce a first token
+hedging = None
+if os.getenv("GROK_HEDGE_ENABLED", "").lower() in ("1", "true", "yes"):
+    hedging = HedgePolicy(
+        percentile=float(os.getenv("GROK_HEDGE_PERCENTILE", "95")),
+        budget=float(os.getenv("GROK_HEDGE_BUDGET", "0.05")),
+        min_delay=float(os.getenv("GROK_HEDGE_MIN_DELAY", "0.25")),
+        max_delay=float(os.getenv("GROK_HEDGE_MAX_DELAY", "10")),
+    )
+
+# Opt-in admission control: concurrency limits with a bounded wait queue
+admission = None
+_max_concurrency = int(os.getenv("GROK_MAX_CONCURRENCY", "0"))
+_max_per_account = int(os.getenv("GROK_MAX_CONCURRENCY_PER_ACCOUNT", "0"))
+if account_pool is not None and _max_per_account and not _max_concurrency:
+    # Never admit more than the pool's accounts can run together
+    _max_concurrency = _max_per_account * len(account_pool)
+if _max_concurrency or _max_per_account:
+    admission = Admission(
+        max_concurrency=_max_concurrency,
+        per_account=_max_per_account,
+        max_queue=int(os.getenv("GROK_MAX_QUEUE", "64")),
+        max_queue_wait=float(os.getenv("GROK_MAX_QUEUE_WAIT", "30")),
+    )
+
+# Continue upstream conversations instead of replaying the whole history
+conversation_map = None
+if os.getenv("GROK_CONVERSATION_REUSE", "").lower() in ("1", "true", "yes"):
+    _map_size = int(os.getenv("GROK_CONVERSATION_MAP_SIZE", "10000"))
+    if SHARED_CACHE_PATH:
+        conversation_map = SharedConversationMap(SHARED_CACHE_PATH, max_entries=_map_size)
+    else:
+        conversation_map = ConversationMap(max_entries=_map_size)
+
+# Rendered system prompts by fingerprint of their functions, tools and response format
+prompt_cache = PromptCache(max_entries=int(os.getenv("GROK_PROMPT_CACHE_SIZE", "256")))
+
+# Token budget of the flattened history sent upstream (0 for no limit)
+CONTEXT_MAX_TOKENS = int(os.getenv("GROK_CONTEXT_MAX_TOKENS", "100000"))
+
+# Streamed tokens arriving within this window (or up to this size) share one SSE event
+SSE_FLUSH_WINDOW = float(os.getenv("GROK_SSE_FLUSH_MS", "20")) / 1000
+SSE_FLUSH_BYTES = int(os.getenv("GROK_SSE_FLUSH_BYTES", "256"))
+
+# Batches read and write JSONL files inside this directory, for callers with the batch token
+BATCH_DIR = os.path.realpath(os.getenv("GROK_BATCH_DIR")) if os.getenv("GROK_BATCH_DIR") else None
+BATCH_TOKEN = os.getenv("GROK_BATCH_TOKEN")
+# Batches remembered for GET /v1/batches; finished ones are forgotten after BATCH_TTL seconds
+BATCH_MAX_ENTRIES = int(os.getenv("GROK_BATCH_MAX_ENTRIES", "100"))
+BATCH_TTL = float(os.getenv("GROK_BATCH_TTL", "86400"))
+# Requests in flight per batch, unless the batch asks for another number
+BATCH_CONCURRENCY = int(os.getenv("GROK_BATCH_CONCURRENCY", "8"))
+
+# Opt-in per-request trace file
+tracing.configure_trace()
+
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -23,10 +137,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("shutdown")
+async def shutdown_http_client():
+    await close_http_client()
+
 class ChatMessage(BaseModel):
     role: str
-    content: str
+    content: Optional[str] = None
     function_call: Optional[Dict[str, Any]] = None
+    tool_calls: Optional[List[Dict[str, Any]]] = None
+    tool_call_id: Optional[str] = None
+    name: Optional[str] = None
 
 class FunctionCall(BaseModel):
     name: str
@@ -34,8 +155,12 @@ class FunctionCall(BaseModel):
 
 class Function(BaseModel):
     name: str
-    description: str
-    parameters: Dict[str, Any]
+    description: str = ""
+    parameters: Dict[str, Any] = {}
+
+class Tool(BaseModel):
+    type: str = "function"
+    function: Function
 
 class ChatCompletionRequest(BaseModel):
     model: str
@@ -46,6 +171,9 @@ class ChatCompletionRequest(BaseModel):
     functions: Optional[List[Function]] = None
     function_call: Optional[Union[str, Dict[str, str]]] = None
     response_format: Optional[Dict[str, str]] = None
+    tools: Optional[List[Tool]] = None
+    tool_choice: Optional[Union[str, Dict[str, Any]]] = None
+    parallel_tool_calls: Optional[bool] = None
 
 class ChatCompletionChoice(BaseModel):
     index: int = 0
@@ -63,6 +191,7 @@ class DeltaMessage(BaseModel):
     role: Optional[str] = None
     content: Optional[str] = None
     function_call: Optional[Dict[str, Any]] = None
+    tool_calls: Optional[List[Dict[str, Any]]] = None
 
 class ChatCompletionChunk(BaseModel):
     id: str
@@ -72,13 +201,45 @@ class ChatCompletionChunk(BaseModel):
     choices: List[Dict[str, Any]]
 
 class GrokAPI:
-    def __init__(self, cookies: Dict[str, str]):
-        self.client = GrokClient(cookies)
+    def __init__(self, cookies: Optional[Dict[str, str]] = None, cache: Optional[ResponseCache] = None,
+                 flights: Optional[SingleFlight] = None, accounts: Optional[AccountPool] = None,
+                 conversations: Optional[ConversationMap] = None, hedging: Optional[HedgePolicy] = None,
+                 prompts: Optional[PromptCache] = None):
+        # Caller-supplied cookies take precedence over the server's account pool
+        self.client = AsyncGrokClient(cookies) if cookies else None
+        self.accounts = None if cookies else accounts
+        self.cache = cache
+        self.flights = flights
+        self.conversations = conversations
+        self.hedging = hedging
+        self.prompts = prompts
+        # (request, fingerprint, system prompt) of the last request prepared
+        self._prompt = None
+
+    def _system_prompt(self, request: ChatCompletionRequest) -> Tuple[str, str]:
+        """Fingerprint and system prompt of a request, rendered once per distinct fingerprint"""
+        if self._prompt is None or self._prompt[0] is not request:
+            key = fingerprint(request.functions, request.response_format,
+                              request.tools, request.tool_choice, request.parallel_tool_calls)
+            if self.prompts is None:
+                prompt = self._render_system_message(request)
+            else:
+                prompt = self.prompts.get(key, lambda: self._render_system_message(request))
+            self._prompt = (request, key, prompt)
+        return self._prompt[1], self._prompt[2]
 
     def _prepare_system_message(self, request: ChatCompletionRequest) -> str:
+        return self._system_prompt(request)[1]
+
+    def _render_system_message(self, request: ChatCompletionRequest) -> str:
         # Default to simple responses unless specifically asked for structured output
         system_content = "You are a helpful assistant. Provide direct, simple answers to questions."
         
+        # Tools take precedence over the legacy functions
+        if self._tools_enabled(request):
+            return tools_prompt([tool.function for tool in request.tools], request.tool_choice,
+                                request.parallel_tool_calls is not False)
+
         # Add function calling instructions if needed
         if request.functions:
             system_content = "You are a helpful assistant that provides structured data."
@@ -91,174 +252,890 @@ class GrokAPI:
         
         return system_content
 
-    def stream_chat(self, request: ChatCompletionRequest):
+    @staticmethod
+    def _tools_enabled(request: ChatCompletionRequest) -> bool:
+        return bool(request.tools) and request.tool_choice != "none"
+
+    @staticmethod
+    def _function_mode(request: ChatCompletionRequest) -> bool:
+        """Whether the whole reply is the arguments of a legacy function call"""
+        return bool(request.functions and request.function_call) and not GrokAPI._tools_enabled(request)
+
+    @staticmethod
+    def _function_name(request: ChatCompletionRequest) -> str:
+        if isinstance(request.function_call, dict):
+            return request.function_call.get("name", request.functions[0].name)
+        return request.functions[0].name
+
+    @staticmethod
+    def _json_mode(request: ChatCompletionRequest) -> bool:
+        """Whether the reply must be a JSON value"""
+        if GrokAPI._tools_enabled(request):
+            return False
+        if GrokAPI._function_mode(request):
+            return True
+        return bool(request.response_format) and request.response_format.get("type") == "json_object"
+
+    def _tool_parser(self, request: ChatCompletionRequest) -> Optional[ToolCallParser]:
+        """A parser for the reply of a request with tools, None without"""
+        if not self._tools_enabled(request):
+            return None
+        choice = request.tool_choice
+        if isinstance(choice, dict):
+            default = choice.get("function", {}).get("name")
+        else:
+            default = request.tools[0].function.name if len(request.tools) == 1 else None
+        return ToolCallParser(default=default, parallel=request.parallel_tool_calls is not False)
+
+    def _scanner(self, request: ChatCompletionRequest, parser: Optional[ToolCallParser] = None):
+        """Check applied to the upstream stream of a request, which may cut it short"""
+        parser = parser or self._tool_parser(request)
+        if parser is not None:
+            return functools.partial(scan_tool_calls, parser=parser)
+        if self._json_mode(request):
+            return scan_json
+        return None
+
+    @staticmethod
+    def _message_pairs(messages: List[ChatMessage]) -> List[Tuple[str, str]]:
+        """(role, text) of each message, with tool calls written the way the model writes them"""
+        names = {}
+        pairs = []
+        for msg in messages:
+            text = msg.content or ""
+            calls = msg.tool_calls or ([{"function": msg.function_call}] if msg.function_call else [])
+            if calls:
+                rendered = "\n".join(render_call(call["function"]["name"], call["function"].get("arguments"))
+                                     for call in calls)
+                text = f"{text}\n{rendered}" if text else rendered
+                names.update((call.get("id"), call["function"]["name"]) for call in calls)
+            elif msg.role in ("tool", "function"):
+                # Results are matched to their calls by tool name
+                name = msg.name or names.get(msg.tool_call_id)
+                if name:
+                    text = f"{name} returned: {text}"
+            pairs.append((msg.role, text))
+        return pairs
+
+    def _prepare_conversation(self, request: ChatCompletionRequest,
+                              messages: Optional[List[Tuple[str, str]]] = None) -> str:
+        system_msg = self._prepare_system_message(request)
+        if messages is None:
+            messages = self._message_pairs(request.messages)
+        if CONTEXT_MAX_TOKENS:
+            # Long histories keep their newest turns; older ones are shortened or dropped
+            messages = fit_messages(messages, CONTEXT_MAX_TOKENS - estimate_tokens(system_msg))
+        return build_conversation(system_msg, messages)
+
+    def _history_key(self, request: ChatCompletionRequest, messages: List[Tuple[str, str]]) -> str:
+        return ConversationMap.history_key(
+            request.model,
+            # The fingerprint stands for the system prompt it renders to
+            self._system_prompt(request)[0],
+            messages
+        )
+
+    def _prepare_turn(self, request: ChatCompletionRequest,
+                      messages: Optional[List[Tuple[str, str]]] = None) -> Turn:
+        """Assemble the prompt of a request, timed as the "assemble" phase"""
+        started = time.perf_counter()
+        turn = Turn(self._prepare_conversation(request, messages))
+        tracing.record_span("assemble", started)
+        return turn
+
+    async def _match_turn(self, request: ChatCompletionRequest) -> Turn:
+        """Assemble a request's turn, continuing a known upstream conversation if it can"""
+        if self.conversations is None:
+            return self._prepare_turn(request)
+        messages = self._message_pairs(request.messages)
+        turn = self._prepare_turn(request, messages)
+
+        # Only the messages after the last assistant reply are new
+        split = len(request.messages)
+        while split > 0 and request.messages[split - 1].role != "assistant":
+            split -= 1
+        new_messages = messages[split:]
+        if split == 0 or not new_messages:
+            return turn
+
+        ref = await self.conversations.aget(self._history_key(request, messages[:split]))
+        metrics.cache_lookups.labels("conversation", "miss" if ref is None else "hit").inc()
+        if ref is not None:
+            if len(new_messages) == 1 and new_messages[0][0] == "user":
+                message = new_messages[0][1]
+            else:
+                message = "\n".join([f"{role}: {content}" for role, content in new_messages])
+            turn.continue_from(ref, message)
+        return turn
+
+    async def _remember_turn(self, request: ChatCompletionRequest, turn: Turn, message: ChatMessage):
+        """Map the history including the new reply to the upstream conversation"""
+        if self.conversations is None or not turn.ref.conversation_id or not turn.ref.response_id:
+            return
+        history = self._message_pairs(list(request.messages) + [message])
+        await self.conversations.aset(self._history_key(request, history), turn.ref)
+
+    def _request_key(self, request: ChatCompletionRequest, conversation: str) -> str:
+        return make_key(
+            # Replies to caller-supplied cookies are only served back to the same
+            # credentials; those of the server's own accounts are shared
+            credentials=self.client.credential_key if self.client is not None else None,
+            model=request.model,
+            # Hashed as bytes; JSON-escaping a long prompt costs more than hashing it
+            conversation=hashlib.sha256(conversation.encode("utf-8")).hexdigest(),
+            prompt=self._system_prompt(request)[0],
+            function_call=request.function_call,
+            response_format=request.response_format,
+        )
+
+    def _checkout(self, turn: Turn, avoid: Optional[str] = None):
+        """Pick the client for a turn, replaying in full if its conversation's account is unusable"""
+        account = None
+        if self.accounts is not None:
+            account = self.accounts.acquire(prefer=turn.ref.account_key, avoid=avoid)
+            client = account.client
+        else:
+            client = self.client
+        if turn.continuing and turn.ref.account_key != client.credential_key:
+            turn.replay()
+        turn.ref.account_key = client.credential_key
+        return client, account
+
+    async def _stream(self, turn: Turn):
+        if self.hedging is None:
+            stream = self._attempt(turn)
+        else:
+            # A hedge replays the conversation in full on another account if it can
+            hedge_turn = Turn(turn.conversation)
+
+            def adopt_hedge():
+                turn.ref, turn.message = hedge_turn.ref, hedge_turn.message
+
+            stream = self.hedging.stream(
+                lambda: self._attempt(turn),
+                lambda: self._attempt(hedge_turn, avoid=turn.ref.account_key),
+                adopt_hedge,
+            )
         try:
-            # Prepare the conversation context
-            system_msg = self._prepare_system_message(request)
-            conversation = f"system: {system_msg}\n" + "\n".join([f"{msg.role}: {msg.content}" for msg in request.messages])
-            
-            logger.debug(f"Sending conversation to Grok: {conversation}")
-            
-            # Get streaming response from Grok
-            response_stream = self.client.send_message(conversation)
-            logger.debug(f"Got response stream from Grok: {response_stream}")
-            
-            # Stream the response in OpenAI format
-            for token in response_stream.split():
-                chunk = ChatCompletionChunk(
-                    id="chatcmpl-" + str(int(time.time())),
-                    created=int(time.time()),
-                    model="grok-3",
-                    choices=[{
-                        "index": 0,
-                        "delta": {"content": token + " "},
-                        "finish_reason": None
-                    }]
-                )
-                yield f"data: {json.dumps(chunk.dict())}\n\n"
-            
-            # Send the final chunk
-            final_chunk = ChatCompletionChunk(
-                id="chatcmpl-final",
-                created=int(time.time()),
-                model="grok-3",
-                choices=[{
-                    "index": 0,
-                    "delta": {},
-                    "finish_reason": "stop"
-                }]
+            async for token in stream:
+                yield token
+        finally:
+            await stream.aclose()
+
+    async def _attempt(self, turn: Turn, avoid: Optional[str] = None):
+        """Stream one upstream request for a turn"""
+        client, account = self._checkout(turn, avoid)
+        error = None
+        streamed = False
+        stream = client.stream_message(turn.message, turn.ref)
+        try:
+            try:
+                async for token in stream:
+                    streamed = True
+                    yield token
+            except GrokError as e:
+                if streamed or not turn.continuing or e.status_code in QUARANTINE_STATUSES:
+                    raise
+                # The upstream conversation is gone; fall back to a full replay
+                logger.warning(f"Continuing conversation failed, replaying: {str(e)}")
+                await stream.aclose()
+                turn.replay()
+                # The replay starts a new conversation on the same account
+                turn.ref.account_key = client.credential_key
+                stream = client.stream_message(turn.message, turn.ref)
+                async for token in stream:
+                    yield token
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            await stream.aclose()
+            if account is not None:
+                self.accounts.release(account, error)
+
+    async def _stream_and_cache(self, turn: Turn, key: str, scan=None):
+        tokens = []
+        stream = self._stream(turn)
+        if scan is not None:
+            # Validated as it streams, and cut off once the JSON value or the tool calls are complete
+            stream = scan(stream)
+        try:
+            async for token in stream:
+                tokens.append(token)
+                yield token
+        finally:
+            await stream.aclose()
+
+        # Only completed streams are cached, exactly as streamed, so a cache
+        # hit replays the live stream; chat_completion cleans its own copy
+        response = "".join(tokens)
+        if self.cache is not None and response:
+            # Compressed and written to the disk tier off the event loop
+            await self.cache.aset(key, response)
+
+    async def _collect(self, turn: Turn, key: str, scan) -> str:
+        tokens = []
+        stream = self._stream_and_cache(turn, key, scan)
+        try:
+            async for token in stream:
+                tokens.append(token)
+        finally:
+            await stream.aclose()
+        return "".join(tokens)
+
+    def _check_credentials(self):
+        """Refuse a request with neither cookies nor an account pool, before the cache is read"""
+        if self.client is None and self.accounts is None:
+            raise HTTPException(status_code=401, detail="No authentication cookies provided")
+
+    async def complete(self, request: ChatCompletionRequest, turn: Optional[Turn] = None) -> str:
+        """Return the response of a non-streamed request, serving it from the cache when possible"""
+        self._check_credentials()
+        turn = turn or await self._match_turn(request)
+        logger.debug("Sending %d characters to Grok (continuing: %s)", len(turn.message), turn.continuing)
+        key = self._request_key(request, turn.conversation)
+
+        scan = self._scanner(request)
+        response = None
+        if self.cache is not None:
+            response = await self.cache.aget(key)
+            metrics.cache_lookups.labels("response", "miss" if response is None else "hit").inc()
+
+        if response is None:
+            send = lambda: self._collect(turn, key, scan)
+            if self.flights is None:
+                response = await send()
+            else:
+                # Identical concurrent requests share a single upstream call
+                response = await self.flights.do(key, send)
+        if scan is None:
+            # The stream and the cache hold the reply as streamed; only this response is cleaned
+            response = AsyncGrokClient._clean_json_response(response.strip())
+        elif self._function_mode(request):
+            response = self._function_arguments(response)
+        return response
+
+    @staticmethod
+    def _function_arguments(response: str) -> str:
+        """Arguments of a legacy function call reply, without a {"function_call": ...} envelope around them"""
+        parser = FunctionCallParser()
+        return parser.feed(response) + parser.finish()
+
+    async def stream_tokens(self, request: ChatCompletionRequest, parser: Optional[ToolCallParser] = None):
+        """
+        Yield response tokens from the cache or live from the upstream
+
+        Args:
+            request (ChatCompletionRequest): The request
+            parser (ToolCallParser, optional): The caller's parser for a
+                request with tools; a live stream of its own fills the
+                parser's ``events`` as it is scanned
+        """
+        self._check_credentials()
+        turn = await self._match_turn(request)
+        logger.debug("Sending %d characters to Grok (continuing: %s)", len(turn.message), turn.continuing)
+        key = self._request_key(request, turn.conversation)
+
+        if self.cache is not None:
+            cached = await self.cache.aget(key)
+            metrics.cache_lookups.labels("response", "miss" if cached is None else "hit").inc()
+            if cached is not None:
+                for piece in split_chunks(cached):
+                    yield piece
+                return
+
+        if self.flights is None:
+            stream = self._stream_and_cache(turn, key, self._scanner(request, parser))
+        else:
+            # Identical concurrent requests follow a single upstream stream
+            stream = self.flights.stream(key, lambda: self._stream_and_cache(turn, key, self._scanner(request, parser)))
+        tokens = []
+        try:
+            async for token in stream:
+                tokens.append(token)
+                yield token
+        finally:
+            await stream.aclose()
+        if self.conversations is not None:
+            response = "".join(tokens)
+            if self._function_mode(request):
+                response = self._function_arguments(response)
+            await self._remember_turn(request, turn, self._reply_message(request, response))
+
+    def _reply_message(self, request: ChatCompletionRequest, response: str) -> ChatMessage:
+        """Shape a complete reply as content, a legacy function call or tool calls"""
+        parser = self._tool_parser(request)
+        if parser is not None:
+            content = []
+            calls = []
+            for event in parser.feed(response) + parser.finish():
+                if event[0] == "content":
+                    content.append(event[1])
+                elif event[0] == "call":
+                    calls.append({"id": event[2], "type": "function", "function": {"name": event[3], "arguments": ""}})
+                else:
+                    calls[event[1]]["function"]["arguments"] += event[2]
+            return ChatMessage(role="assistant", content="".join(content) or None, tool_calls=calls or None)
+
+        if self._function_mode(request):
+            # Already validated as JSON (or wrapped) while it streamed
+            return ChatMessage(
+                role="assistant",
+                content="",
+                function_call={
+                    "name": self._function_name(request),
+                    "arguments": response
+                }
             )
-            yield f"data: {json.dumps(final_chunk.dict())}\n\n"
-            yield "data: [DONE]\n\n"
+
+        # Regular response, or JSON already validated (or wrapped) while it streamed
+        return ChatMessage(
+            role="assistant",
+            content=response
+        )
+
+    async def chat_completion(self, request: ChatCompletionRequest) -> ChatCompletionResponse:
+        """Run a non-streaming completion and shape it as an OpenAI response"""
+        turn = await self._match_turn(request)
+        response = await self.complete(request, turn)
+        logger.debug("Received %d characters from Grok", len(response))
+        
+        if not response:
+            logger.error("Empty response from Grok API")
+            raise GrokError("Empty response from Grok API")
+        
+        message = self._reply_message(request, response)
+        await self._remember_turn(request, turn, message)
+
+        # Create response object
+        return ChatCompletionResponse(
+            id=f"chatcmpl-{str(int(time.time()))}",
+            created=int(time.time()),
+            model=request.model,
+            choices=[ChatCompletionChoice(
+                message=message,
+                finish_reason="tool_calls" if message.tool_calls else "stop"
+            )]
+        )
+
+    async def stream_chat(self, request: ChatCompletionRequest, timer: Optional[tracing.RequestTimer] = None):
+        timer = timer or tracing.RequestTimer(uuid.uuid4().hex)
+        tracing.current_timer.set(timer)
+        started = timer.started
+        model = _model_label(request.model)
+        status = "499"  # Until the stream ends, the client is what cut it short
+        first_token_at = None
+        tokens = 0
+        serialize_started = None
+        serialize_time = 0.0
+        metrics.active_streams.labels(model).inc()
+        try:
+            # One id and one pre-rendered template for the whole completion
+            serializer = ChunkSerializer(f"chatcmpl-{uuid.uuid4().hex}", "grok-3")
+            parser = self._tool_parser(request)
+            function_call = FunctionCallParser() if self._function_mode(request) else None
+            function_name = self._function_name(request) if function_call is not None else None
+            # Tokens arriving faster than the flush window share an event
+            async for batch in coalesce(self.stream_tokens(request, parser), SSE_FLUSH_WINDOW, SSE_FLUSH_BYTES):
+                now = time.perf_counter()
+                if first_token_at is None:
+                    first_token_at = now
+                    metrics.time_to_first_token.labels(model).observe(now - started)
+                tokens += len(batch)
+                text = batch[0] if len(batch) == 1 else "".join(batch)
+                if parser is not None:
+                    # Tool calls are announced, and their arguments passed on, as they arrive
+                    data = self._tool_chunks(serializer, self._parsed(parser, text))
+                elif function_call is not None:
+                    data, function_name = self._function_chunk(serializer, function_name, function_call.feed(text))
+                else:
+                    data = serializer.content(text)
+                serialize_started = serialize_started or now
+                serialize_time += time.perf_counter() - now
+                if data:
+                    yield data
+
+            finish_reason = "stop"
+            if parser is not None:
+                data = self._tool_chunks(serializer, self._parsed(parser, None))
+                if data:
+                    yield data
+                if parser.count:
+                    finish_reason = "tool_calls"
+            elif function_call is not None:
+                data, function_name = self._function_chunk(serializer, function_name, function_call.finish())
+                if data:
+                    yield data
+
+            # Send the final chunk
+            status = "200"
+            yield serializer.final(finish_reason)
+            yield self._timing_comment(timer, serialize_started, serialize_time)
+            yield DONE
         except Exception as e:
             logger.error(f"Error in stream_chat: {str(e)}")
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
-            yield "data: [DONE]\n\n"
+            status = str(_error_status(e))
+            yield ChunkSerializer.error(str(e))
+            yield self._timing_comment(timer, serialize_started, serialize_time)
+            yield DONE
+        finally:
+            finished = time.perf_counter()
+            timer.finish(model=request.model, stream=True, status=int(status), tokens=tokens)
+            metrics.active_streams.labels(model).dec()
+            metrics.response_serialize.labels(model, "true").observe(serialize_time)
+            metrics.request_duration.labels(model, "true").observe(finished - started)
+            metrics.requests_total.labels(model, "true", status).inc()
+            if tokens > 1 and finished > first_token_at:
+                metrics.tokens_per_second.labels(model).observe((tokens - 1) / (finished - first_token_at))
+
+    @staticmethod
+    def _parsed(parser: ToolCallParser, text: Optional[str]) -> List[tuple]:
+        """
+        Events of the next piece of a reply with tools, or of its end when ``text`` is None
+
+        A live stream has already been parsed by its scanner; a cached
+        reply, or one shared with another request, is parsed here.
+        """
+        if parser.events is not None:
+            events, parser.events = parser.events, []
+            return events
+        return parser.feed(text) if text is not None else parser.finish()
+
+    @staticmethod
+    def _function_chunk(serializer: ChunkSerializer, name: Optional[str], arguments: str) -> Tuple[bytes, Optional[str]]:
+        """SSE event of a piece of a legacy function call's arguments, and the name still to announce"""
+        if not arguments:
+            return b"", name
+        call = {"name": name, "arguments": arguments} if name is not None else {"arguments": arguments}
+        return serializer.delta({"function_call": call}), None
+
+    @staticmethod
+    def _tool_chunks(serializer: ChunkSerializer, events: List[tuple]) -> bytes:
+        """SSE events of what a ToolCallParser read"""
+        chunks = []
+        for event in events:
+            if event[0] == "content":
+                chunks.append(serializer.content(event[1]))
+            elif event[0] == "call":
+                chunks.append(serializer.tool_call(event[1], event[2], event[3]))
+            else:
+                chunks.append(serializer.tool_arguments(event[1], event[2]))
+        return b"".join(chunks)
+
+    @staticmethod
+    def _timing_comment(timer: tracing.RequestTimer, serialize_started: Optional[float], serialize_time: float) -> bytes:
+        """SSE comment carrying the Server-Timing breakdown of a stream"""
+        if serialize_started is not None:
+            timer.span("serialize", serialize_started, serialize_started + serialize_time)
+        return ChunkSerializer.comment(f"server-timing {timer.server_timing()}")
+
+def _model_label(model: str) -> str:
+    return model if model in MODELS else "other"
+
+class EventStreamResponse(StreamingResponse):
+    """
+    StreamingResponse that stops its stream as soon as the client disconnects.
+
+    Starlette cancels a disconnected stream through a cancel scope that
+    also interrupts every cleanup step of the generator. Here the stream
+    is cancelled once, so the generators' ``finally`` blocks can close
+    the upstream request, and the generator is then closed explicitly
+    in case it was suspended at a ``yield`` when the client went away.
+    """
+
+    def __init__(self, content, model: str = "other", **kwargs):
+        super().__init__(content, media_type="text/event-stream", **kwargs)
+        self.model = model
+
+    async def __call__(self, scope, receive, send) -> None:
+        streaming = asyncio.ensure_future(self.stream_response(send))
+        disconnected = asyncio.ensure_future(self.listen_for_disconnect(receive))
+        try:
+            await asyncio.wait((streaming, disconnected), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            disconnected.cancel()
+            if not streaming.done():
+                logger.info("Client disconnected, cancelling the upstream stream")
+                metrics.cancelled_requests.labels(self.model, "true").inc()
+                streaming.cancel()
+                try:
+                    await streaming
+                except asyncio.CancelledError:
+                    pass
+            await self.body_iterator.aclose()
+        if not streaming.cancelled():
+            # Surface errors of the stream itself
+            streaming.result()
+        if self.background is not None:
+            await self.background()
+
+class _ClientGone(Exception):
+    """The caller of a non-streaming completion disconnected or its deadline passed."""
+
+async def _wait_for_disconnect(raw_request: Request):
+    while True:
+        message = await raw_request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+async def _unless_abandoned(raw_request: Request, awaitable, deadline: Optional[float] = None):
+    """
+    Await a completion, cancelling it if the caller disconnects or its deadline passes
+
+    Raises:
+        _ClientGone: If the completion was cancelled because of the caller
+    """
+    task = asyncio.ensure_future(awaitable)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(raw_request))
+    timeout = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+    try:
+        await asyncio.wait((task, disconnected), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if not task.done():
+            raise _ClientGone("disconnect" if disconnected.done() else "deadline")
+        return task.result()
+    finally:
+        disconnected.cancel()
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+def _error_status(error: Exception) -> int:
+    """HTTP status reported to the client for a failed completion"""
+    if isinstance(error, (NoAccountAvailable, Overloaded, CircuitOpen)):
+        return error.status_code
+    if isinstance(error, UpstreamTimeout):
+        return 504
+    if isinstance(error, GrokError):
+        # Upstream rate limits are passed on; anything else is a bad gateway
+        return 429 if error.status_code == 429 else 502
+    return 500
+
+def _client_deadline(raw_request: Request) -> Optional[float]:
+    """The client's deadline as a time.monotonic() value, from its timeout header"""
+    # X-Stainless-Timeout is sent by the official OpenAI SDKs
+    for header in ("x-request-timeout", "x-stainless-timeout"):
+        value = raw_request.headers.get(header)
+        if value:
+            try:
+                return time.monotonic() + float(value)
+            except ValueError:
+                logger.warning(f"Ignoring malformed {header} header: {value}")
+    return None
+
+def _with_timing(response: Response, timer: tracing.RequestTimer) -> Response:
+    response.headers["Server-Timing"] = timer.server_timing()
+    response.headers["X-Request-ID"] = timer.request_id
+    return response
+
+async def run_chat_completion(body: Dict[str, Any], cookies: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Run one non-streaming chat completion body without an HTTP round trip"""
+    request = ChatCompletionRequest(**body)
+    grok = GrokAPI(cookies, cache=response_cache, flights=flights, accounts=account_pool,
+                   conversations=conversation_map, hedging=hedging, prompts=prompt_cache)
+    chat_response = await grok.chat_completion(request)
+    return chat_response.dict()
 
 @app.get("/v1/models")
 async def list_models():
     return {
         "data": [
             {
-                "id": "grok-3",
+                "id": model,
                 "object": "model",
                 "created": int(time.time()),
                 "owned_by": "xai",
                 "permission": [],
-                "root": "grok-3",
+                "root": model,
                 "parent": None
             }
+            for model in MODELS
         ]
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """Expose proxy metrics in the Prometheus text format"""
+    # Counters only: stats() of the shared cache would query SQLite on the event loop
+    if response_cache is not None:
+        lookups = response_cache.hits + response_cache.misses
+        metrics.cache_hit_ratio.labels("response").set(response_cache.hits / lookups if lookups else 0.0)
+    if conversation_map is not None:
+        lookups = conversation_map.hits + conversation_map.misses
+        metrics.cache_hit_ratio.labels("conversation").set(conversation_map.hits / lookups if lookups else 0.0)
+    if admission is not None and admission.controller is not None:
+        metrics.admission_in_flight.set(admission.controller.in_flight)
+        metrics.admission_queued.set(admission.controller.queued)
+    if account_pool is not None:
+        for account in account_pool.stats():
+            metrics.account_in_flight.labels(account["name"]).set(account["in_flight"])
+            metrics.account_quarantined.labels(account["name"]).set(1 if account["quarantined_for"] > 0 else 0)
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.post("/v1/chat/completions")
 async def create_chat_completion(raw_request: Request):
+    started = time.perf_counter()
+    timer = tracing.RequestTimer(raw_request.headers.get("x-request-id") or uuid.uuid4().hex, started)
+    tracing.current_timer.set(timer)
+    model = "other"
+    status = "500"
+    handed_off = False
+    ticket = None
+    deadline = _client_deadline(raw_request)
     try:
         # Get request body
-        body = await raw_request.json()
-        logger.debug(f"Received request body: {body}")
+        try:
+            body = await raw_request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+        logger.debug("Received request body: %s", body)
+        if not isinstance(body, dict):
+            raise HTTPException(status_code=400, detail="Request body must be a JSON object")
         
         # Parse request into ChatCompletionRequest
-        request = ChatCompletionRequest(**body)
+        try:
+            request = ChatCompletionRequest(**body)
+        except ValidationError as e:
+            raise HTTPException(status_code=400, detail=json.loads(e.json()))
+        model = _model_label(request.model)
+        timer.span("decode", started)
+        metrics.request_parse.labels(model).observe(time.perf_counter() - started)
         
         # Get cookies from request headers
-        headers = dict(raw_request.headers)
-        logger.debug(f"Received headers: {headers}")
+        cookie = raw_request.headers.get('cookie')
+        cookies = {'Cookie': cookie} if cookie else {}
         
-        cookies = {'Cookie': headers.get('cookie', '')} if headers.get('cookie') else {}
-        logger.debug(f"Extracted cookies: {cookies}")
-        
-        if not cookies:
+        if not cookies and account_pool is None:
             raise HTTPException(status_code=401, detail="No authentication cookies provided")
         
-        # Initialize Grok API with cookies
-        grok = GrokAPI(cookies)
+        if admission is not None:
+            # Wait for a slot, or shed the request with a 429 right away
+            queued = time.perf_counter()
+            account_key = credential_key(parse_cookie_header(cookie)) if cookie else None
+            ticket = await admission.admit(account_key, deadline)
+            timer.span("queue", queued)
+        
+        # Initialize Grok API with the caller's cookies or the account pool
+        grok = GrokAPI(cookies, cache=response_cache, flights=flights, accounts=account_pool,
+                   conversations=conversation_map, hedging=hedging, prompts=prompt_cache)
         
         if request.stream:
-            return StreamingResponse(
-                grok.stream_chat(request),
-                media_type="text/event-stream"
+            # The stream records its own status and duration once it ends
+            handed_off = True
+            return EventStreamResponse(
+                grok.stream_chat(request, timer),
+                model=model,
+                headers={"X-Request-ID": timer.request_id},
+                # Runs once the stream is over, including on client disconnect
+                background=BackgroundTask(ticket.release) if ticket is not None else None
             )
         
-        # For non-streaming response
-        system_msg = grok._prepare_system_message(request)
-        conversation = f"system: {system_msg}\n" + "\n".join([f"{msg.role}: {msg.content}" for msg in request.messages])
-        logger.debug(f"Sending conversation to Grok: {conversation}")
+        # For non-streaming response; stop the upstream call if the caller gives up
+        chat_response = await _unless_abandoned(raw_request, grok.chat_completion(request), deadline)
         
-        response = grok.client.send_message(conversation)
-        logger.debug(f"Received response from Grok: {response}")
-        
-        if not response:
-            logger.error("Empty response from Grok API")
-            raise HTTPException(status_code=500, detail="Empty response from Grok API")
-        
-        # Handle function calling
-        if request.functions and request.function_call:
-            try:
-                # Try to parse the response as JSON
-                parsed_response = json.loads(response)
-                
-                # Get the function name from the request
-                function_name = request.function_call.get("name", request.functions[0].name) if isinstance(request.function_call, dict) else request.functions[0].name
-                
-                message = ChatMessage(
-                    role="assistant",
-                    content="",
-                    function_call={
-                        "name": function_name,
-                        "arguments": json.dumps(parsed_response)
-                    }
-                )
-            except json.JSONDecodeError:
-                # If response is not valid JSON, wrap it in a basic structure
-                function_name = request.function_call.get("name", request.functions[0].name) if isinstance(request.function_call, dict) else request.functions[0].name
-                message = ChatMessage(
-                    role="assistant",
-                    content="",
-                    function_call={
-                        "name": function_name,
-                        "arguments": json.dumps({"result": response})
-                    }
-                )
-        else:
-            # Regular response or JSON format
-            if request.response_format and request.response_format.get("type") == "json_object":
-                try:
-                    # Ensure the response is valid JSON
-                    json.loads(response)
-                    message = ChatMessage(
-                        role="assistant",
-                        content=response
-                    )
-                except json.JSONDecodeError:
-                    # If not valid JSON, wrap it in a JSON structure
-                    message = ChatMessage(
-                        role="assistant",
-                        content=json.dumps({"response": response})
-                    )
-            else:
-                message = ChatMessage(
-                    role="assistant",
-                    content=response
-                )
-        
-        # Create response object
-        chat_response = ChatCompletionResponse(
-            id=f"chatcmpl-{str(int(time.time()))}",
-            created=int(time.time()),
-            model=request.model,
-            choices=[ChatCompletionChoice(
-                message=message,
-                finish_reason="stop"
-            )]
-        )
-        
-        logger.debug(f"Sending response: {chat_response.dict()}")
-        return chat_response
+        serialize_started = time.perf_counter()
+        content = chat_response.dict()
+        logger.debug("Sending response: %s", content)
+        response = JSONResponse(content=content)
+        timer.span("serialize", serialize_started)
+        metrics.response_serialize.labels(model, "false").observe(time.perf_counter() - serialize_started)
+        status = "200"
+        return _with_timing(response, timer)
     
+    except HTTPException as e:
+        status = str(e.status_code)
+        raise
+    except _ClientGone as e:
+        logger.info(f"Cancelled the upstream request, caller gone ({e})")
+        metrics.cancelled_requests.labels(model, "false").inc()
+        if str(e) == "disconnect":
+            # Nobody is listening any more; this only ends the request cleanly
+            status = "499"
+            return Response(status_code=499)
+        status = "504"
+        return _with_timing(JSONResponse(
+            status_code=504,
+            content={"error": "Request deadline exceeded", "detail": "The client's timeout passed before Grok answered"}
+        ), timer)
+    except NoAccountAvailable as e:
+        logger.error(f"Error in create_chat_completion: {str(e)}")
+        status = "503"
+        return _with_timing(JSONResponse(
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)},
+            content={"error": str(e), "detail": "No upstream account available"}
+        ), timer)
+    except Overloaded as e:
+        status = "429"
+        return _with_timing(JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(e.retry_after)},
+            content={"error": str(e), "detail": "Too many requests, retry later"}
+        ), timer)
+    except GrokError as e:
+        logger.error(f"Error in create_chat_completion: {str(e)}")
+        status = str(_error_status(e))
+        retry_after = getattr(e, "retry_after", None)
+        return _with_timing(JSONResponse(
+            status_code=int(status),
+            headers={"Retry-After": str(retry_after)} if retry_after else None,
+            content={"error": str(e), "detail": "Upstream request failed"}
+        ), timer)
     except Exception as e:
         logger.error(f"Error in create_chat_completion: {str(e)}")
-        return JSONResponse(
+        return _with_timing(JSONResponse(
             status_code=500,
             content={"error": str(e), "detail": "Failed to process request"}
-        )
\ No newline at end of file
+        ), timer)
+    finally:
+        if not handed_off:
+            if ticket is not None:
+                ticket.release()
+            timer.finish(model=model, stream=False, status=int(status))
+            metrics.request_duration.labels(model, "false").observe(time.perf_counter() - started)
+            metrics.requests_total.labels(model, "false", status).inc()
+
+# Batches submitted to this process, by id
+batches: Dict[str, Dict[str, Any]] = {}
+
+def _check_batch_access(raw_request: Request):
+    """Refuse batch requests unless batches are configured and the caller has the batch token"""
+    if BATCH_DIR is None or not BATCH_TOKEN:
+        raise HTTPException(status_code=404, detail="Batches are disabled; set GROK_BATCH_DIR and GROK_BATCH_TOKEN")
+    authorization = raw_request.headers.get("authorization", "")
+    if not hmac.compare_digest(authorization.encode("utf-8"), f"Bearer {BATCH_TOKEN}".encode("utf-8")):
+        raise HTTPException(status_code=401, detail="Invalid or missing batch token")
+
+def _batch_path(file_id: Any, field: str) -> str:
+    """Path of a batch file id, a file name relative to BATCH_DIR"""
+    if not isinstance(file_id, str) or not file_id or os.path.isabs(file_id) \
+            or ".." in file_id.replace("\\", "/").split("/"):
+        raise HTTPException(status_code=400, detail=f"{field} must be a relative file name inside the batch directory")
+    path = os.path.realpath(os.path.join(BATCH_DIR, file_id))
+    # Symlinks may not lead out of the directory either
+    if os.path.commonpath([path, BATCH_DIR]) != BATCH_DIR:
+        raise HTTPException(status_code=400, detail=f"{field} must be a relative file name inside the batch directory")
+    return path
+
+def _batch_count(body: Dict[str, Any], field: str, default: int, minimum: int) -> int:
+    """An integer option of a batch request, at least ``minimum``"""
+    value = body.get(field, default)
+    if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+        raise HTTPException(status_code=400, detail=f"{field} must be an integer of at least {minimum}")
+    return value
+
+def _prune_batches():
+    """Forget finished batches past BATCH_TTL, then the oldest finished ones until a new batch fits"""
+    now = time.time()
+    finished = sorted((b for b in batches.values() if b["completed_at"] is not None), key=lambda b: b["completed_at"])
+    excess = len(batches) + 1 - BATCH_MAX_ENTRIES
+    for batch in finished:
+        if excess > 0 or now - batch["completed_at"] > BATCH_TTL:
+            del batches[batch["id"]]
+            excess -= 1
+
+def _batch_object(batch: Dict[str, Any]) -> Dict[str, Any]:
+    info = {k: v for k, v in batch.items() if not k.startswith("_")}
+    info["request_counts"] = batch["_runner"].request_counts()
+    return info
+
+async def _run_batch(batch: Dict[str, Any]):
+    try:
+        await batch["_runner"].run(batch["_input"], batch["_output"])
+        batch["status"] = "cancelled" if batch["_runner"].cancelled else "completed"
+    except Exception as e:
+        logger.error(f"Batch {batch['id']} failed: {str(e)}")
+        batch["status"] = "failed"
+        batch["errors"] = {"data": [{"message": str(e)}]}
+    batch["completed_at"] = int(time.time())
+
+@app.post("/v1/batches")
+async def create_batch(raw_request: Request):
+    """
+    Start a batch over a JSONL file in the batch directory.
+
+    ``input_file_id`` is a file name relative to ``GROK_BATCH_DIR``;
+    results are appended to ``output_file_id`` there (default:
+    ``<input>.output.jsonl``), which also makes a re-submitted batch resume
+    where it stopped. Requires ``Authorization: Bearer $GROK_BATCH_TOKEN``.
+    """
+    _check_batch_access(raw_request)
+    try:
+        body = await raw_request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail="Request body must be a JSON object")
+    input_file_id = body.get("input_file_id") or body.get("input_file")
+    input_file = _batch_path(input_file_id, "input_file_id")
+    if not os.path.isfile(input_file):
+        raise HTTPException(status_code=400, detail="input_file_id must be a file in the batch directory")
+    output_file_id = body.get("output_file_id") or f"{os.path.splitext(input_file_id)[0]}.output.jsonl"
+    output_file = _batch_path(output_file_id, "output_file_id")
+    if output_file == input_file:
+        raise HTTPException(status_code=400, detail="output_file_id must differ from input_file_id")
+    if body.get("endpoint", "/v1/chat/completions") != "/v1/chat/completions":
+        raise HTTPException(status_code=400, detail="Only /v1/chat/completions is supported")
+    concurrency = _batch_count(body, "concurrency", BATCH_CONCURRENCY, 1)
+    max_retries = _batch_count(body, "max_retries", 3, 0)
+
+    cookie = raw_request.headers.get("cookie")
+    if not cookie and account_pool is None:
+        raise HTTPException(status_code=401, detail="No authentication cookies provided")
+    cookies = {"Cookie": cookie} if cookie else {}
+
+    _prune_batches()
+    running = [b for b in batches.values() if b["completed_at"] is None]
+    if any(b["_output"] == output_file for b in running):
+        raise HTTPException(status_code=409, detail="Another batch is writing to this output_file_id")
+    if len(batches) >= BATCH_MAX_ENTRIES:
+        raise HTTPException(status_code=429, detail="Too many batches in progress")
+
+    runner = BatchRunner(
+        lambda request_body: run_chat_completion(request_body, cookies),
+        concurrency=concurrency,
+        max_retries=max_retries,
+    )
+    batch = {
+        "id": f"batch_{uuid.uuid4().hex}",
+        "object": "batch",
+        "endpoint": "/v1/chat/completions",
+        "input_file_id": input_file_id,
+        "output_file_id": output_file_id,
+        "status": "in_progress",
+        "created_at": int(time.time()),
+        "completed_at": None,
+        "metadata": body.get("metadata"),
+        "_input": input_file,
+        "_output": output_file,
+        "_runner": runner,
+    }
+    batches[batch["id"]] = batch
+    batch["_task"] = asyncio.ensure_future(_run_batch(batch))
+    return _batch_object(batch)
+
+@app.get("/v1/batches")
+async def list_batches(raw_request: Request):
+    _check_batch_access(raw_request)
+    _prune_batches()
+    return {"object": "list", "data": [_batch_object(batch) for batch in batches.values()]}
+
+@app.get("/v1/batches/{batch_id}")
+async def retrieve_batch(batch_id: str, raw_request: Request):
+    _check_batch_access(raw_request)
+    if batch_id not in batches:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return _batch_object(batches[batch_id])
+
+@app.post("/v1/batches/{batch_id}/cancel")
+async def cancel_batch(batch_id: str, raw_request: Request):
+    _check_batch_access(raw_request)
+    if batch_id not in batches:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    batch = batches[batch_id]
+    if batch["status"] == "in_progress":
+        batch["_runner"].cancel()
+        batch["status"] = "cancelling"
+    return _batch_object(batch)
@@ -0,0 +1,391 @@
+"""
+Response cache and conversation map kept in a SQLite file.
+
+Each worker of ``grok-serve`` would otherwise keep its own in-memory
+cache, so adding workers splits the same traffic over more, colder
+caches, and every restart empties them. These classes keep the same
+interface as ResponseCache and ConversationMap but store the entries
+in one SQLite database in WAL mode: readers in any process never block
+each other or the writer, and the entries outlive the process.
+
+The primary key is the index: a process opening an existing file reads
+no more than the B-tree pages on the path to a key, through a memory
+map, so its first lookup is as cheap as any other. Responses are
+stored zlib-compressed.
+
+LRU order is kept with a last-used timestamp, refreshed at most once a
+second per entry so that hits rarely take the write lock. Size limits
+are enforced every few writes rather than on each one, so a table may
+briefly exceed them by a few entries. Triggers keep the entry count and
+total size in a one-row table, so neither trimming nor ``stats`` scans
+the entries.
+
+A query may wait up to the busy timeout for another worker's write, so
+the server uses the ``a``-prefixed coroutines (``aget``, ``aset``...),
+which run the queries on a small thread pool off the event loop.
+"""
+
+import asyncio
+import functools
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from .client import ConversationRef
+from .conversations import ConversationMap
+
+# Seconds between refreshes of an entry's last-used time
+TOUCH_INTERVAL = 1.0
+
+# Responses shorter than this are stored uncompressed
+COMPRESS_MIN_BYTES = 256
+
+# Bytes of the database file mapped into memory for reads
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Threads per store running queries for the event loop
+EXECUTOR_THREADS = 4
+
+
+class _SQLiteStore:
+    """One table of a shared SQLite database, with a connection per thread."""
+
+    table = None
+    schema = None
+    # Columns of the LRU index; a size column there keeps eviction off the table pages
+    index = "used_at"
+    # Column counted into the running byte total, if any
+    size_column = None
+
+    def __init__(self, path, busy_timeout=5.0):
+        """
+        Open the database, creating it and the table if needed
+
+        Args:
+            path (str): Database file, shared by every worker
+            busy_timeout (float): Seconds to wait for another process's write lock
+        """
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._writes = 0
+        self._executor = None
+        self._executor_pid = None
+        self._executor_lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        table = self.table
+        size = f"NEW.{self.size_column}" if self.size_column else "0"
+        old_size = f"OLD.{self.size_column}" if self.size_column else "0"
+        # Created, and the totals of an older database counted, in one transaction
+        self._connection().executescript(f"""
+            BEGIN IMMEDIATE;
+            {self.schema};
+            CREATE INDEX IF NOT EXISTS {table}_lru ON {table} ({self.index});
+            CREATE TABLE IF NOT EXISTS {table}_totals (
+                id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER NOT NULL, bytes INTEGER NOT NULL);
+            INSERT OR IGNORE INTO {table}_totals
+                SELECT 0, COUNT(*), COALESCE(SUM({self.size_column or 0}), 0) FROM {table};
+            CREATE TRIGGER IF NOT EXISTS {table}_added AFTER INSERT ON {table} BEGIN
+                UPDATE {table}_totals SET entries = entries + 1, bytes = bytes + {size} WHERE id = 0; END;
+            CREATE TRIGGER IF NOT EXISTS {table}_removed AFTER DELETE ON {table} BEGIN
+                UPDATE {table}_totals SET entries = entries - 1, bytes = bytes - {old_size} WHERE id = 0; END;
+            COMMIT;
+        """)
+
+    def _connection(self):
+        # Connections are neither shared between threads nor inherited across fork
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # Durable enough for a cache: a power loss may only lose the latest writes
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            # Rows replaced by INSERT OR REPLACE fire the delete trigger, keeping the totals right
+            connection.execute("PRAGMA recursive_triggers=ON")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    async def run(self, function, *args):
+        """
+        Run a blocking method on the store's threads
+
+        Args:
+            function (Callable): The method to run
+            *args: Its arguments
+
+        Returns:
+            Any: What it returned
+        """
+        with self._executor_lock:
+            # Pools are not inherited across fork either
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(EXECUTOR_THREADS, thread_name_prefix=f"grok-{self.table}")
+                self._executor_pid = os.getpid()
+            executor = self._executor
+        return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(function, *args))
+
+    def _totals(self, connection):
+        """Entry count and total size, from the running totals"""
+        return connection.execute(f"SELECT entries, bytes FROM {self.table}_totals WHERE id = 0").fetchone()
+
+    def _wrote(self, connection, limit):
+        # Trim every few writes, or every write for tiny tables
+        self._writes += 1
+        if self._writes >= max(1, min(64, limit // 16)):
+            self._writes = 0
+            self._trim(connection)
+
+    def _trim(self, connection):
+        raise NotImplementedError
+
+    def _evict(self, connection, count, limit, total=0, max_bytes=None):
+        """Delete least recently used rows until both limits hold; returns how many were deleted"""
+        if count <= limit and (max_bytes is None or total <= max_bytes):
+            return 0
+        doomed = []
+        columns = "key, size" if max_bytes is not None else "key, 0"
+        # Walk the LRU index only as far as needed
+        cursor = connection.execute(f"SELECT {columns} FROM {self.table} ORDER BY used_at")
+        try:
+            for key, size in cursor:
+                if count <= limit and (max_bytes is None or total <= max_bytes):
+                    break
+                doomed.append((key,))
+                count -= 1
+                total -= size
+        finally:
+            cursor.close()
+        connection.executemany(f"DELETE FROM {self.table} WHERE key = ?", doomed)
+        return len(doomed)
+
+    def clear(self):
+        """Drop every entry, for every worker"""
+        self._connection().execute(f"DELETE FROM {self.table}")
+
+    def __len__(self):
+        return self._totals(self._connection())[0]
+
+
+class SharedResponseCache(_SQLiteStore):
+    """
+    Cross-process, persistent LRU cache of completion texts with a TTL.
+
+    Drop-in replacement for ResponseCache. Sizes and ``max_bytes`` count
+    the stored, compressed bytes. Hit and miss counters are kept per
+    process; entry and byte counts cover the shared table.
+    """
+
+    table = "responses"
+    schema = (
+        "CREATE TABLE IF NOT EXISTS responses ("
+        "key TEXT PRIMARY KEY, value BLOB NOT NULL, compressed INTEGER NOT NULL, size INTEGER NOT NULL, "
+        "expires_at REAL NOT NULL, used_at REAL NOT NULL) WITHOUT ROWID"
+    )
+    index = "used_at, size, expires_at"
+    size_column = "size"
+
+    def __init__(self, path, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=3600.0):
+        """
+        Initialize the cache
+
+        Args:
+            path (str): Database file, shared by every worker
+            max_entries (int): Maximum number of cached responses
+            max_bytes (int): Maximum total size of cached responses
+            ttl (float): Seconds a response stays valid
+        """
+        super().__init__(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Look up a cached response
+
+        Args:
+            key (str): The request key from make_key
+
+        Returns:
+            Optional[str]: The cached response, or None on a miss
+        """
+        return self.lookup(key)[0]
+
+    def lookup(self, key):
+        """
+        Look up a cached response and how long it stays valid
+
+        Args:
+            key (str): The request key from make_key
+
+        Returns:
+            Tuple[Optional[str], float]: The cached response, or None on a
+                miss, and its remaining TTL in seconds
+        """
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT value, compressed, expires_at, used_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or row[2] <= now:
+            if row is not None:
+                connection.execute("DELETE FROM responses WHERE key = ? AND expires_at <= ?", (key, now))
+            self.misses += 1
+            return None, 0.0
+        if now - row[3] > TOUCH_INTERVAL:
+            connection.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        data = zlib.decompress(row[0]) if row[1] else row[0]
+        return data.decode("utf-8"), row[2] - now
+
+    async def aget(self, key):
+        """Coroutine version of ``get``, run off the event loop"""
+        return await self.run(self.get, key)
+
+    async def alookup(self, key):
+        """Coroutine version of ``lookup``, run off the event loop"""
+        return await self.run(self.lookup, key)
+
+    def set(self, key, value):
+        """
+        Store a response
+
+        Args:
+            key (str): The request key from make_key
+            value (str): The complete response text
+        """
+        data = value.encode("utf-8")
+        compressed = len(data) >= COMPRESS_MIN_BYTES
+        if compressed:
+            data = zlib.compress(data)
+        if len(data) > self.max_bytes:
+            return
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO responses (key, value, compressed, size, expires_at, used_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, data, int(compressed), len(data), now + self.ttl, now),
+        )
+        self._wrote(connection, self.max_entries)
+
+    async def aset(self, key, value):
+        """Coroutine version of ``set``, run off the event loop"""
+        await self.run(self.set, key, value)
+
+    def _trim(self, connection):
+        connection.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+        count, total = self._totals(connection)
+        self.evictions += self._evict(connection, count, self.max_entries, total, self.max_bytes)
+
+    def stats(self):
+        """
+        Report cache counters
+
+        Returns:
+            dict: Entry count, size in bytes, hits, misses, evictions and hit ratio
+        """
+        count, total = self._totals(self._connection())
+        lookups = self.hits + self.misses
+        return {
+            "entries": count,
+            "bytes": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    async def astats(self):
+        """Coroutine version of ``stats``, run off the event loop"""
+        return await self.run(self.stats)
+
+
+class SharedConversationMap(_SQLiteStore):
+    """
+    Cross-process LRU map from message histories to upstream conversations.
+
+    Drop-in replacement for ConversationMap, so a follow-up request can
+    continue the conversation whichever worker served the previous turn.
+    """
+
+    table = "conversations"
+    schema = (
+        "CREATE TABLE IF NOT EXISTS conversations ("
+        "key TEXT PRIMARY KEY, conversation_id TEXT NOT NULL, response_id TEXT NOT NULL, "
+        "account_key TEXT, used_at REAL NOT NULL) WITHOUT ROWID"
+    )
+
+    history_key = staticmethod(ConversationMap.history_key)
+
+    def __init__(self, path, max_entries=10000):
+        """
+        Initialize the map
+
+        Args:
+            path (str): Database file, shared by every worker
+            max_entries (int): Maximum number of histories remembered
+        """
+        super().__init__(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Look up the upstream conversation of a history
+
+        Args:
+            key (str): Key from history_key
+
+        Returns:
+            Optional[ConversationRef]: The conversation, or None on a miss
+        """
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT conversation_id, response_id, account_key, used_at FROM conversations WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        now = time.time()
+        if now - row[3] > TOUCH_INTERVAL:
+            connection.execute("UPDATE conversations SET used_at = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return ConversationRef(conversation_id=row[0], response_id=row[1], account_key=row[2])
+
+    async def aget(self, key):
+        """Coroutine version of ``get``, run off the event loop"""
+        return await self.run(self.get, key)
+
+    def set(self, key, ref):
+        """
+        Record the upstream conversation a history ended in
+
+        Args:
+            key (str): Key from history_key
+            ref (ConversationRef): Conversation and response to continue from
+        """
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO conversations (key, conversation_id, response_id, account_key, used_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, ref.conversation_id, ref.response_id, ref.account_key, time.time()),
+        )
+        self._wrote(connection, self.max_entries)
+
+    async def aset(self, key, ref):
+        """Coroutine version of ``set``, run off the event loop"""
+        await self.run(self.set, key, ref)
+
+    def _trim(self, connection):
+        self._evict(connection, self._totals(connection)[0], self.max_entries)
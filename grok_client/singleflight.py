@@ -0,0 +1,148 @@
+import asyncio
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class _Broadcast:
+    """
+    Fans the tokens of one upstream stream out to any number of readers.
+
+    The source is drained by a background task so that a reader going
+    away never interrupts the others. Late readers first replay the
+    tokens emitted so far, then follow the live stream. The source is
+    cancelled once the last reader leaves.
+    """
+
+    def __init__(self, source, on_finish):
+        self.tokens = []
+        self.finished = False
+        self.error = None
+        self.readers = 0
+        self._changed = asyncio.Event()
+        self._on_finish = on_finish
+        self._task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source):
+        try:
+            async for token in source:
+                self.tokens.append(token)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            await source.aclose()
+            self.finished = True
+            self._on_finish(self)
+            self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self):
+        self.readers += 1
+        index = 0
+        try:
+            while True:
+                changed = self._changed
+                while index < len(self.tokens):
+                    yield self.tokens[index]
+                    index += 1
+                if self.finished:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await changed.wait()
+        finally:
+            self.readers -= 1
+            if self.readers == 0 and not self.finished:
+                self._task.cancel()
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight upstream calls.
+
+    Callers passing the same key while a call is running share its result
+    (or its live token stream) instead of starting their own. Failures
+    are propagated to every waiter. Keys are forgotten as soon as the
+    call finishes, so this never serves stale results; pair it with
+    ResponseCache for that. A call is cancelled once every caller
+    waiting for it has been cancelled.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._streams = {}
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        """
+        Run ``fn`` once for all concurrent callers with the same key
+
+        Args:
+            key (str): Canonical request key
+            fn (Callable[[], Awaitable]): Starts the upstream call
+
+        Returns:
+            The result of the shared call
+        """
+        call = self._calls.get(key)
+        if call is None:
+            # [shared task, callers waiting for it]
+            call = [asyncio.ensure_future(fn()), 0]
+            self._calls[key] = call
+            call[0].add_done_callback(lambda _: self._forget_call(key, call))
+        else:
+            self.coalesced += 1
+            logger.debug(f"Joining in-flight request {key[:12]}")
+        task = call[0]
+        call[1] += 1
+        try:
+            # Shield the shared task so one caller being cancelled does not
+            # cancel it for everybody else
+            return await asyncio.shield(task)
+        finally:
+            call[1] -= 1
+            if call[1] == 0 and not task.done():
+                # Every caller gave up, so nobody needs the upstream call any more
+                self._forget_call(key, call)
+                task.cancel()
+
+    async def stream(self, key, fn):
+        """
+        Share one token stream between all concurrent callers with the same key
+
+        Args:
+            key (str): Canonical request key
+            fn (Callable[[], AsyncIterator[str]]): Starts the upstream stream
+
+        Yields:
+            str: The tokens of the shared stream, from the beginning
+        """
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast(fn(), lambda finished: self._forget(key, finished))
+            self._streams[key] = broadcast
+        else:
+            self.coalesced += 1
+            logger.debug(f"Joining in-flight stream {key[:12]}")
+        reader = broadcast.subscribe()
+        try:
+            async for token in reader:
+                yield token
+        finally:
+            await reader.aclose()
+
+    def _forget_call(self, key, call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def _forget(self, key, broadcast):
+        if self._streams.get(key) is broadcast:
+            del self._streams[key]
@@ -0,0 +1,178 @@
+"""
+Server-sent events for streamed chat completions.
+
+ChunkSerializer renders ``chat.completion.chunk`` events from a byte
+template built once per completion, so a token costs one JSON string
+escape and two concatenations. ``coalesce`` groups tokens that arrive
+in quick succession so fast streams need fewer events and writes.
+"""
+
+import asyncio
+import json
+import time
+
+DONE = b"data: [DONE]\n\n"
+
+
+class ChunkSerializer:
+    """Renders the SSE events of one completion, all with the same id."""
+
+    def __init__(self, completion_id, model, created=None):
+        """
+        Initialize the serializer
+
+        Args:
+            completion_id (str): The id shared by every chunk
+            model (str): Model reported in every chunk
+            created (int, optional): Creation time. Defaults to now.
+        """
+        self.completion_id = completion_id
+        template = json.dumps({
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created or int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": None}, "finish_reason": None}],
+        })
+        head, tail = template.split('"content": null', 1)
+        self._head = ("data: " + head + '"content": ').encode("utf-8")
+        self._tail = (tail + "\n\n").encode("utf-8")
+        self._delta_head = ("data: " + head.rsplit('"delta": ', 1)[0] + '"delta": ').encode("utf-8")
+        self._final_head = self._delta_head + b'{}, "finish_reason": '
+
+    def content(self, text):
+        """
+        Render a content delta
+
+        Args:
+            text (str): One or more tokens
+
+        Returns:
+            bytes: The complete ``data:`` event
+        """
+        return self._head + json.dumps(text).encode("utf-8") + self._tail
+
+    def delta(self, delta):
+        """
+        Render a chunk with any other delta, such as a function call
+
+        Args:
+            delta (dict): The ``delta`` object of the chunk
+
+        Returns:
+            bytes: The complete ``data:`` event
+        """
+        return self._delta_head + json.dumps(delta).encode("utf-8") + b', "finish_reason": null}]}\n\n'
+
+    def tool_call(self, index, call_id, name):
+        """Render the first chunk of a tool call, with its id and name"""
+        return self.delta({"tool_calls": [
+            {"index": index, "id": call_id, "type": "function", "function": {"name": name, "arguments": ""}}
+        ]})
+
+    def tool_arguments(self, index, text):
+        """Render a piece of the arguments of a tool call"""
+        return self.delta({"tool_calls": [{"index": index, "function": {"arguments": text}}]})
+
+    def final(self, finish_reason="stop"):
+        """
+        Render the last chunk, with an empty delta and the finish reason
+
+        Returns:
+            bytes: The complete ``data:`` event
+        """
+        return self._final_head + json.dumps(finish_reason).encode("utf-8") + b"}]}\n\n"
+
+    @staticmethod
+    def error(message):
+        return ("data: " + json.dumps({"error": message}) + "\n\n").encode("utf-8")
+
+    @staticmethod
+    def comment(text):
+        return (": " + text + "\n\n").encode("utf-8")
+
+
+async def coalesce(tokens, window=0.02, max_bytes=256):
+    """
+    Group tokens of a stream into batches
+
+    A token arriving at least ``window`` seconds after the last flush
+    (including the first token) is passed on at once, so slow streams
+    and time to first token are unaffected. Tokens arriving faster are
+    batched: a batch is flushed once it holds ``max_bytes`` of UTF-8
+    text or once its first token has waited ``window`` seconds, whether
+    or not another token arrives.
+
+    Args:
+        tokens (AsyncIterator[str]): The token stream
+        window (float): Longest time a token is held back, 0 to disable
+        max_bytes (int): Batch size that triggers a flush
+
+    Yields:
+        List[str]: Consecutive tokens, at least one per batch
+    """
+    if window <= 0:
+        async for token in tokens:
+            yield [token]
+        return
+
+    loop = asyncio.get_running_loop()
+    source = tokens.__aiter__()
+    batch = []
+    size = 0
+    deadline = 0.0
+    pending = None
+    last_flush = float("-inf")
+    try:
+        while True:
+            if not batch:
+                # Nothing held back, so there is no deadline to wait for
+                try:
+                    token = await (pending if pending is not None else source.__anext__())
+                except StopAsyncIteration:
+                    return
+                pending = None
+            else:
+                if pending is None:
+                    pending = asyncio.ensure_future(source.__anext__())
+                timeout = deadline - loop.time()
+                if timeout > 0:
+                    await asyncio.wait((pending,), timeout=timeout)
+                if not pending.done():
+                    last_flush = loop.time()
+                    yield batch
+                    batch, size = [], 0
+                    continue
+                task, pending = pending, None
+                try:
+                    token = task.result()
+                except StopAsyncIteration:
+                    yield batch
+                    return
+                except Exception:
+                    # Deliver what arrived before the failure, then report it
+                    yield batch
+                    raise
+
+            now = loop.time()
+            if not batch:
+                if now - last_flush >= window:
+                    last_flush = now
+                    yield [token]
+                    continue
+                deadline = now + window
+            batch.append(token)
+            size += len(token.encode("utf-8"))
+            if size >= max_bytes:
+                last_flush = now
+                yield batch
+                batch, size = [], 0
+    finally:
+        if pending is not None:
+            pending.cancel()
+            try:
+                await pending
+            except (asyncio.CancelledError, Exception):
+                pass
+        if hasattr(source, "aclose"):
+            await source.aclose()
@@ -0,0 +1,125 @@
+"""
+Incremental parser for the NDJSON frames of the Grok response stream.
+
+Works on the raw bytes read from the connection: chunks are split into
+lines without decoding them, and only lines that can matter to a client
+(tokens, the final model response, conversation ids and errors) are
+handed to the JSON decoder. orjson is used when it is installed.
+"""
+
+import json
+import logging
+
+from .exceptions import GrokError
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+if orjson is not None:
+    loads = orjson.loads
+    JSON_BACKEND = "orjson"
+else:
+    loads = json.loads
+    JSON_BACKEND = "json"
+
+# Byte markers of the frames worth decoding. Anything else (echoes of the
+# user message, search results, final metadata) is dropped undecoded. A
+# marker appearing inside a string value only costs a wasted decode:
+# quotes in JSON strings are escaped, so it cannot hide a real frame.
+_TOKEN = b'"token"'
+_MODEL_RESPONSE = b'"modelResponse"'
+_ERROR = b'"error"'
+_CONVERSATION = b'"conversationId"'
+
+
+def parse_frame(line):
+    """
+    Parse a single NDJSON line from the Grok response stream
+
+    Args:
+        line (Union[bytes, str]): One line of the stream, with or without
+            its trailing newline
+
+    Returns:
+        dict: The ``result.response`` data of the frame (or ``result``
+            itself for frames without one), or None if the frame carries
+            nothing a client needs or could not be decoded
+
+    Raises:
+        GrokError: If the frame carries an upstream error
+    """
+    if isinstance(line, str):
+        line = line.encode("utf-8")
+    if (_TOKEN not in line and _MODEL_RESPONSE not in line
+            and _ERROR not in line and _CONVERSATION not in line):
+        return None
+
+    try:
+        json_data = loads(line)
+    except ValueError as e:
+        logger.warning(f"Failed to decode JSON: {e}")
+        return None
+    if not isinstance(json_data, dict):
+        return None
+
+    if "error" in json_data:
+        error_msg = json_data["error"]
+        logger.error(f"Error in response: {error_msg}")
+        raise GrokError(f"Error in response: {error_msg}")
+
+    result = json_data.get("result") or {}
+    # New conversations wrap frames in "response"; continuations do not
+    return result.get("response", result)
+
+
+class FrameParser:
+    """
+    Turns arbitrarily split chunks of the response body into frames.
+
+    Feed it every chunk read from the connection and call ``flush`` once
+    the body ends. Partial lines are kept until the rest arrives.
+    """
+
+    def __init__(self):
+        self._pending = b""
+
+    def feed(self, chunk):
+        """
+        Parse the complete lines of a chunk
+
+        Args:
+            chunk (bytes): The next piece of the response body
+
+        Returns:
+            List[dict]: The frames completed by this chunk, in order
+
+        Raises:
+            GrokError: If a frame carries an upstream error
+        """
+        if self._pending:
+            chunk = self._pending + chunk
+        lines = chunk.split(b"\n")
+        self._pending = lines.pop()
+
+        frames = []
+        for line in lines:
+            frame = parse_frame(line)
+            if frame is not None:
+                frames.append(frame)
+        return frames
+
+    def flush(self):
+        """
+        Parse whatever is left once the body has ended
+
+        Returns:
+            List[dict]: The frame of an unterminated last line, if any
+        """
+        line, self._pending = self._pending, b""
+        frame = parse_frame(line) if line.strip() else None
+        return [frame] if frame is not None else []
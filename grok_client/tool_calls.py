@@ -0,0 +1,374 @@
+"""
+Tool calls for the OpenAI ``tools`` format.
+
+Grok has no native tool calling, so the system prompt asks it to call
+tools by replying with one ``{"name": ..., "arguments": {...}}`` object
+per line, or to answer in plain text. ToolCallParser reads that reply
+as it streams:
+
+- a reply that starts with anything but ``{`` or ``[`` (after an
+  optional code fence) is passed through as content;
+- otherwise each object becomes a tool call. Once ``"name"`` and the
+  start of ``"arguments"`` have arrived, the call is announced and its
+  arguments are passed on as they stream, so a caller can start on a
+  call before the reply is over;
+- the reply ends after the last call: a closing fence or chatter after
+  it is never read.
+
+Objects in another order, an array of calls or ``{"tool_calls": [...]}``
+are understood too, but their calls are only known once each closes.
+
+The reply to a legacy ``function_call`` is the call's arguments alone;
+FunctionCallParser strips the ``{"function_call": ...}`` envelope the
+model sometimes wraps them in, as they stream.
+"""
+
+import json
+import re
+import uuid
+
+from .exceptions import MalformedJSON
+from .json_stream import JSONScanner
+
+# A call whose name is known and whose arguments object has started
+_CALL_HEAD = re.compile(r'\s*\{\s*"name"\s*:\s*("(?:[^"\\]|\\.)*")\s*,\s*"arguments"\s*:\s*(?=\{)')
+# The head of a reply made of calls, up to the first call
+_CALLS_START = re.compile(r"\s*(?:```(?:json)?\s*)?[{\[]")
+# What may still turn out to be the head of a reply made of calls
+_CALLS_OPENING = re.compile(r"\s*(?:`{0,3}|```(?:j|js|jso|json)?\s*)")
+_SEPARATOR = re.compile(r"[\s,]*")
+# A legacy function call envelope, up to the start of its arguments object
+_ENVELOPE_HEAD = re.compile(
+    r'\s*\{\s*"function_call"\s*:\s*\{\s*"name"\s*:\s*"(?:[^"\\]|\\.)*"\s*,\s*"arguments"\s*:\s*(?=\{)'
+)
+# The first key of an object, and what may still turn out to be one
+_FIRST_KEY = re.compile(r'\s*\{\s*("(?:[^"\\]|\\.)*")\s*:')
+_KEY_OPENING = re.compile(r'\s*(?:\{\s*(?:"(?:[^"\\]|\\.)*(?:"\s*)?)?)?')
+
+# Longest start of a call searched for its name before waiting for the whole call
+_HEAD_LIMIT = 1024
+
+# What the parser is reading
+_UNDECIDED, _CONTENT, _CALL, _BETWEEN, _DONE = range(5)
+
+
+def tools_prompt(functions, tool_choice=None, parallel=True):
+    """
+    Render the system prompt of a request with tools
+
+    Args:
+        functions (List[Function]): The functions of the request's tools
+        tool_choice (Union[str, dict], optional): "auto", "required" or
+            ``{"type": "function", "function": {"name": ...}}``
+        parallel (bool): Whether several tools may be called at once
+
+    Returns:
+        str: The system prompt
+    """
+    prompt = (
+        "You are a helpful assistant with access to tools. To call a tool, reply with only a JSON object "
+        '{"name": "<tool name>", "arguments": {<arguments>}} with "name" first.'
+    )
+    if parallel:
+        prompt += " To call several tools at once, write one such object per line."
+    else:
+        prompt += " Call at most one tool per reply."
+    if isinstance(tool_choice, dict):
+        prompt += f" You must call the tool {json.dumps(tool_choice.get('function', {}).get('name'))}."
+    elif tool_choice == "required":
+        prompt += " You must call at least one tool."
+    else:
+        prompt += " If no tool is needed, answer in plain text instead."
+    prompt += f" Available tools: {json.dumps([f.dict() for f in functions])}"
+    return prompt
+
+
+def render_call(name, arguments):
+    """
+    Render a tool call the way the model is asked to write it
+
+    Args:
+        name (str): The tool's name
+        arguments (str): The call's arguments, a JSON object
+
+    Returns:
+        str: One ``{"name": ..., "arguments": ...}`` line
+    """
+    return '{"name": ' + json.dumps(name) + ', "arguments": ' + (arguments or "{}") + "}"
+
+
+def _calls_from_value(value, default=None):
+    """(name, arguments) pairs of a complete JSON value read as tool calls"""
+    if isinstance(value, list):
+        return [call for item in value for call in _calls_from_value(item, default)]
+    if isinstance(value, dict):
+        if isinstance(value.get("tool_calls"), list):
+            return _calls_from_value(value["tool_calls"], default)
+        for envelope in ("function", "function_call"):
+            if isinstance(value.get(envelope), dict):
+                # A call in the OpenAI response shape, or the legacy function_call one
+                value = value[envelope]
+                break
+        if isinstance(value.get("name"), str):
+            arguments = value.get("arguments", {})
+            return [(value["name"], arguments if isinstance(arguments, str) else json.dumps(arguments))]
+        if default is not None:
+            # The arguments of the only tool, without the envelope
+            return [(default, json.dumps(value))]
+    raise MalformedJSON(f"Expected a tool call, got {json.dumps(value)[:40]}")
+
+
+class ToolCallParser:
+    """
+    Push parser that turns a streamed reply into content or tool calls.
+
+    ``feed`` returns events: ``("content", text)``, ``("call", index,
+    call_id, name)`` when a call starts, and ``("arguments", index,
+    text)`` for each piece of its arguments.
+    """
+
+    def __init__(self, default=None, parallel=True):
+        """
+        Initialize the parser
+
+        Args:
+            default (str, optional): Tool a call without a name goes to,
+                when only one tool can be called
+            parallel (bool): Whether to read past the first call
+        """
+        self.default = default
+        self.parallel = parallel
+        self.state = _UNDECIDED
+        self.count = 0
+        # Unread text of the last token once the reply is over
+        self.rest = ""
+        self._head = ""
+        self._scanner = None
+        self._call = []
+        # Follows the arguments of the call being streamed, to stop passing them on where they close
+        self._arguments = None
+        # What scan_tool_calls read, kept for the caller streaming the reply; None until it reads
+        self.events = None
+
+    @property
+    def done(self):
+        return self.state == _DONE
+
+    def feed(self, text):
+        """
+        Read the next piece of the reply
+
+        Args:
+            text (str): A streamed token
+
+        Returns:
+            List[tuple]: The events it completes
+
+        Raises:
+            MalformedJSON: If a call cannot be valid JSON or is not a call
+        """
+        state = self.state
+        if state == _CONTENT:
+            return [("content", text)] if text else []
+        if state == _CALL:
+            return self._feed_call(text)
+        if state == _BETWEEN:
+            return self._next_call(text)
+        if state == _UNDECIDED:
+            head = self._head + text
+            match = _CALLS_START.match(head)
+            if match is not None:
+                self._head = ""
+                self.state = _CALL
+                self._scanner = JSONScanner()
+                return self._feed_call(head[match.end() - 1:])
+            if _CALLS_OPENING.fullmatch(head):
+                self._head = head
+                return []
+            self._head = ""
+            self.state = _CONTENT
+            return [("content", head)]
+        return []
+
+    def finish(self):
+        """
+        Check the end of the reply
+
+        Returns:
+            List[tuple]: The events left, content held back while the
+                reply could still have been a call
+
+        Raises:
+            MalformedJSON: If the reply ended inside a call
+        """
+        if self.state == _UNDECIDED:
+            self.state = _DONE
+            return [("content", self._head)] if self._head.strip() else []
+        if self.state == _CALL:
+            self._scanner.finish()
+        self.state = _DONE
+        return []
+
+    def _next_call(self, text):
+        """Between calls: skip separators, then start the next call or stop"""
+        position = _SEPARATOR.match(text).end()
+        if position == len(text):
+            return []
+        if text[position] == "{" and self.parallel:
+            self.state = _CALL
+            self._scanner = JSONScanner()
+            return self._feed_call(text[position:])
+        # A closing fence or chatter: the calls are over
+        self.state = _DONE
+        self.rest = text[position:]
+        return []
+
+    def _feed_call(self, text):
+        piece = self._scanner.feed(text)
+        self._call.append(piece)
+        events = []
+        if self._arguments is not None:
+            arguments = self._arguments.feed(piece)
+        else:
+            arguments = ""
+            call = "".join(self._call) if len(self._call) > 1 else piece
+            match = _CALL_HEAD.match(call) if len(call) <= _HEAD_LIMIT else None
+            if match is not None:
+                self._arguments = JSONScanner()
+                events.append(("call", self.count, f"call_{uuid.uuid4().hex[:24]}", json.loads(match.group(1))))
+                arguments = self._arguments.feed(call[match.end():])
+        if arguments:
+            events.append(("arguments", self.count, arguments))
+        if not self._scanner.done:
+            return events
+
+        call = "".join(self._call)
+        value = json.loads(call)
+        if self._arguments is not None:
+            # Nothing after the arguments was passed on, so extra fields fail the call cleanly
+            if set(value) != {"name", "arguments"}:
+                raise MalformedJSON(f"Tool call with unexpected fields: {sorted(value)}")
+            self.count += 1
+        else:
+            for name, arguments in _calls_from_value(value, self.default):
+                events.append(("call", self.count, f"call_{uuid.uuid4().hex[:24]}", name))
+                events.append(("arguments", self.count, arguments))
+                self.count += 1
+        self._call = []
+        self._arguments = None
+        self._scanner = None
+        self.state = _BETWEEN
+        rest = text[len(piece):]
+        if not self.parallel:
+            self.state = _DONE
+            self.rest = rest
+            return events
+        return events + (self._next_call(rest) if rest else [])
+
+
+def _unwrap_function_call(reply):
+    """Arguments of a complete legacy function call reply, without a {"function_call": ...} envelope"""
+    try:
+        value = json.loads(reply)
+    except ValueError:
+        return reply
+    call = value.get("function_call") if isinstance(value, dict) else None
+    if not isinstance(call, dict) or "arguments" not in call:
+        return reply
+    arguments = call["arguments"]
+    return arguments if isinstance(arguments, str) else json.dumps(arguments)
+
+
+class FunctionCallParser:
+    """
+    Push parser for the reply to a legacy function call.
+
+    ``feed`` returns the call's arguments as they stream. A reply in the
+    ``{"function_call": {"name": ..., "arguments": {...}}}`` shape is
+    held back until its arguments start and stops where they close; one
+    that only becomes a call in that shape once it is complete (string
+    arguments, fields in another order) is unwrapped by ``finish``.
+    """
+
+    def __init__(self):
+        self._head = ""
+        self._passing = False
+        # Follows the arguments inside an envelope, once they have started
+        self._arguments = None
+
+    def feed(self, text):
+        """
+        Read the next piece of the reply
+
+        Args:
+            text (str): A streamed piece of the JSON reply
+
+        Returns:
+            str: The arguments' part of it, possibly held-back text too
+        """
+        if self._passing:
+            return text
+        if self._arguments is not None:
+            return self._arguments.feed(text)
+        head = self._head + text
+        match = _ENVELOPE_HEAD.match(head) if len(head) <= _HEAD_LIMIT else None
+        if match is not None:
+            self._head = ""
+            self._arguments = JSONScanner()
+            return self._arguments.feed(head[match.end():])
+        key = _FIRST_KEY.match(head)
+        if key is None and _KEY_OPENING.fullmatch(head) or key is not None and key.group(1) == '"function_call"':
+            self._head = head
+            return ""
+        # Not an envelope: the reply is the arguments
+        self._head = ""
+        self._passing = True
+        return head
+
+    def finish(self):
+        """
+        Check the end of the reply
+
+        Returns:
+            str: The arguments held back, unwrapped if they were a call
+
+        Raises:
+            MalformedJSON: If the reply ended inside the envelope's arguments
+        """
+        if self._arguments is not None:
+            self._arguments.finish()
+            return ""
+        held, self._head = self._head, ""
+        return _unwrap_function_call(held) if held else ""
+
+
+async def scan_tool_calls(tokens, parser):
+    """
+    Pass through a streamed reply up to the end of its last tool call
+
+    Args:
+        tokens (AsyncIterator[str]): The upstream tokens; closed as soon
+            as the calls are over
+        parser (ToolCallParser): Parser configured for the request; the
+            events it reads are collected in its ``events`` list, so the
+            reply does not have to be parsed again
+
+    Yields:
+        str: The reply, a piece per token
+
+    Raises:
+        MalformedJSON: As soon as a call cannot be valid
+    """
+    parser.events = []
+    try:
+        async for token in tokens:
+            parser.events.extend(parser.feed(token))
+            if parser.done:
+                kept = token[:len(token) - len(parser.rest)]
+                if kept:
+                    yield kept
+                break
+            yield token
+        parser.events.extend(parser.finish())
+    finally:
+        await tokens.aclose()
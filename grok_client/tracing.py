@@ -0,0 +1,159 @@
+"""
+Per-request timing breakdown.
+
+The server starts a RequestTimer for every chat completion and makes it
+current for the request; GrokAPI and the clients add spans to whichever
+timer is current, so no timing state has to be passed through their
+signatures. The spans are reported in the ``Server-Timing`` header (or a
+final SSE comment for streams) and, with ``GROK_TRACE_FILE`` set, written
+as one JSON line per request to a rotating trace file.
+"""
+
+import json
+import logging
+import os
+import time
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Trace records go to their own logger so they never end up in the app log
+trace_logger = logging.getLogger("grok_client.trace")
+trace_logger.propagate = False
+
+current_timer = ContextVar("grok_request_timer", default=None)
+
+
+class RequestTimer:
+    """Spans of one request, as offsets from when it was received."""
+
+    def __init__(self, request_id, started=None):
+        """
+        Initialize the timer
+
+        Args:
+            request_id (str): Identifier echoed to the client and in the trace
+            started (float, optional): time.perf_counter() at arrival
+        """
+        self.request_id = request_id
+        self.started = started or time.perf_counter()
+        self.spans = []
+
+    def span(self, name, start, end=None):
+        """
+        Record a phase
+
+        Args:
+            name (str): Phase name, e.g. "decode" or "upstream_connect"
+            start (float): time.perf_counter() when the phase began
+            end (float, optional): When it ended. Defaults to now.
+        """
+        end = end if end is not None else time.perf_counter()
+        self.spans.append((name, start - self.started, end - start))
+
+    def server_timing(self):
+        """
+        Format the spans for the Server-Timing header
+
+        Returns:
+            str: e.g. ``decode;dur=0.4, upstream_connect;dur=81.2``
+        """
+        entries = [f"{name};dur={duration * 1000:.1f}" for name, _, duration in self.spans]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+    def finish(self, **fields):
+        """
+        Write the trace record of the request if tracing is enabled
+
+        Args:
+            **fields: Extra attributes of the request, e.g. model and status
+        """
+        if not trace_logger.handlers:
+            return
+        record = {
+            "ts": time.time(),
+            "request_id": self.request_id,
+            **fields,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "spans": [
+                {"name": name, "start_ms": round(offset * 1000, 3), "dur_ms": round(duration * 1000, 3)}
+                for name, offset, duration in self.spans
+            ],
+        }
+        trace_logger.info(json.dumps(record))
+
+
+def record_span(name, start, end=None):
+    """Add a span to the current request's timer, if there is one"""
+    timer = current_timer.get()
+    if timer is not None:
+        timer.span(name, start, end)
+
+
+class UpstreamTimer:
+    """
+    Phases of one upstream call, added to the current request's timer.
+
+    The clients note when the response headers arrive and pass every
+    frame to ``frame``; ``finish`` records the connect, first token and
+    last token phases, each measured from when the request was sent.
+    """
+
+    __slots__ = ("started", "connected", "first_token", "last_token")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.connected = None
+        self.first_token = None
+        self.last_token = None
+
+    def frame(self, response_data):
+        if "token" in response_data or "modelResponse" in response_data:
+            self.last_token = time.perf_counter()
+            if self.first_token is None:
+                self.first_token = self.last_token
+
+    def finish(self):
+        timer = current_timer.get()
+        if timer is None:
+            return
+        for name, end in (("upstream_connect", self.connected), ("upstream_first_token", self.first_token),
+                          ("upstream_last_token", self.last_token)):
+            if end is not None:
+                timer.span(name, self.started, end)
+
+
+def configure_trace(path=None, max_bytes=None, backups=None):
+    """
+    Send trace records to a rotating file
+
+    Args:
+        path (str, optional): Trace file. Defaults to GROK_TRACE_FILE;
+            tracing stays off when neither is set.
+        max_bytes (int, optional): Size at which the file is rotated.
+            Defaults to GROK_TRACE_MAX_BYTES or 10 MiB.
+        backups (int, optional): Rotated files kept. Defaults to
+            GROK_TRACE_BACKUPS or 5.
+
+    Returns:
+        bool: Whether tracing is enabled
+    """
+    path = path or os.getenv("GROK_TRACE_FILE")
+    if not path:
+        return False
+    handler = RotatingFileHandler(
+        path,
+        maxBytes=max_bytes or int(os.getenv("GROK_TRACE_MAX_BYTES", str(10 * 1024 * 1024))),
+        backupCount=backups if backups is not None else int(os.getenv("GROK_TRACE_BACKUPS", "5")),
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    for existing in list(trace_logger.handlers):
+        trace_logger.removeHandler(existing)
+        existing.close()
+    trace_logger.addHandler(handler)
+    trace_logger.setLevel(logging.INFO)
+    logger.info(f"Writing request traces to {path}")
+    return True
@@ -0,0 +1,52 @@
+"""
+Shared fixtures: the bundled fake upstream, served on a free local port.
+"""
+
+import dataclasses
+import socket
+import threading
+import time
+
+import pytest
+
+from grok_client.fake_upstream import FakeUpstreamConfig, create_app
+
+
+class FakeUpstream:
+    """A running fake upstream and the settings it answers with."""
+
+    def __init__(self, config, port):
+        self.config = config
+        self.url = f"http://127.0.0.1:{port}/rest/app-chat"
+        self._defaults = dataclasses.replace(config)
+
+    def reset(self):
+        for field in dataclasses.fields(self.config):
+            setattr(self.config, field.name, getattr(self._defaults, field.name))
+
+
+@pytest.fixture(scope="session")
+def _fake_upstream_server():
+    uvicorn = pytest.importorskip("uvicorn")
+    config = FakeUpstreamConfig(latency_ms=0, token_rate=0, tokens=16)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("fake upstream did not start")
+        time.sleep(0.01)
+    yield FakeUpstream(config, port)
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+@pytest.fixture
+def fake_upstream(_fake_upstream_server):
+    """The fake upstream, with its default settings restored after each test"""
+    yield _fake_upstream_server
+    _fake_upstream_server.reset()
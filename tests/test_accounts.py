@@ -0,0 +1,87 @@
+import pytest
+
+from grok_client import accounts
+from grok_client.accounts import Account, AccountPool
+from grok_client.exceptions import GrokError, NoAccountAvailable
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(accounts.time, "monotonic", clock)
+    return clock
+
+
+def pool(size=2, **options):
+    return AccountPool([Account({"sso": f"s{i}", "sso-rw": f"r{i}"}, name=f"a{i}") for i in range(size)], **options)
+
+
+def test_requests_rotate_to_the_least_loaded_account():
+    accounts_pool = pool(3)
+    first = [accounts_pool.acquire() for _ in range(3)]
+    assert sorted(account.name for account in first) == ["a0", "a1", "a2"]
+
+    accounts_pool.release(first[1])
+    assert accounts_pool.acquire() is first[1]
+
+
+def test_failing_account_is_used_less():
+    accounts_pool = pool(2)
+    failing, healthy = accounts_pool.acquire(), accounts_pool.acquire()
+    accounts_pool.release(healthy)
+    accounts_pool.release(failing, GrokError("Upstream error", status_code=500))
+    assert accounts_pool.acquire() is healthy
+    assert failing.error_rate > 0 and not failing.strikes
+
+
+def test_rate_limited_account_is_quarantined_and_readmitted(clock):
+    accounts_pool = pool(2, quarantine_seconds=60)
+    limited = accounts_pool.acquire()
+    accounts_pool.release(limited, GrokError("Too many requests", status_code=429))
+    assert all(accounts_pool.acquire() is not limited for _ in range(5))
+
+    clock.now += 61
+    assert accounts_pool.acquire() is limited
+
+
+def test_quarantine_backs_off_until_a_request_succeeds(clock):
+    accounts_pool = pool(1, quarantine_seconds=60, max_quarantine_seconds=150)
+    periods = []
+    for _ in range(3):
+        account = accounts_pool.acquire()
+        accounts_pool.release(account, GrokError("Forbidden", status_code=403))
+        periods.append(account.quarantined_until - clock.now)
+        clock.now = account.quarantined_until
+    assert periods == [60, 120, 150]
+
+    accounts_pool.release(accounts_pool.acquire())
+    account = accounts_pool.acquire()
+    accounts_pool.release(account, GrokError("Forbidden", status_code=403))
+    assert account.quarantined_until - clock.now == 60
+
+
+def test_every_account_quarantined_reports_when_to_retry(clock):
+    accounts_pool = pool(2, quarantine_seconds=30)
+    for account in [accounts_pool.acquire(), accounts_pool.acquire()]:
+        accounts_pool.release(account, GrokError("Unauthorized", status_code=401))
+    with pytest.raises(NoAccountAvailable) as unavailable:
+        accounts_pool.acquire()
+    assert unavailable.value.retry_after == 31
+
+
+def test_accounts_file_pairs_suffixed_cookies(tmp_path):
+    path = tmp_path / "accounts.env"
+    path.write_text("GROK_SSO=a\nGROK_SSO_RW=b\nGROK_SSO_second=c\nGROK_SSO_RW_second=d\nGROK_SSO_lonely=e\n")
+    loaded = AccountPool.from_file(str(path))
+    assert [(account.name, account.cookies) for account in loaded.accounts] == [
+        ("account-" + loaded.accounts[0].key[:8], {"sso": "a", "sso-rw": "b"}),
+        ("second", {"sso": "c", "sso-rw": "d"}),
+    ]
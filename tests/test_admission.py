@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+import pytest
+
+from grok_client.admission import Admission, AdmissionController
+from grok_client.exceptions import Overloaded
+
+
+def test_requests_beyond_the_limit_wait_in_line():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, max_queue=2)
+        order = []
+
+        async def request(name):
+            granted = await controller.acquire()
+            order.append(name)
+            await asyncio.sleep(0.01)
+            controller.release(granted)
+
+        await asyncio.gather(request("a"), request("b"), request("c"))
+        return order, controller.in_flight, controller.admitted
+
+    order, in_flight, admitted = asyncio.run(run())
+    assert order == ["a", "b", "c"]
+    assert in_flight == 0
+    assert admitted == 3
+
+
+def test_full_queue_sheds_with_retry_after():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, max_queue=1)
+        granted = await controller.acquire()
+        waiting = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as shed:
+            await controller.acquire()
+        controller.release(granted)
+        controller.release(await waiting)
+        return shed.value, controller.rejected
+
+    error, rejected = asyncio.run(run())
+    assert error.status_code == 429
+    assert error.retry_after >= 1
+    assert rejected == 1
+
+
+def test_request_that_cannot_make_its_deadline_is_shed_at_once():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, max_queue=10)
+        controller.mean_hold = 5.0
+        granted = await controller.acquire()
+        started = time.monotonic()
+        with pytest.raises(Overloaded):
+            await controller.acquire(deadline=time.monotonic() + 1.0)
+        controller.release(granted)
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) < 0.5
+
+
+def test_queue_timeout_sheds_and_leaves_the_line():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, max_queue=5, max_queue_wait=0.01)
+        granted = await controller.acquire()
+        with pytest.raises(Overloaded):
+            await controller.acquire()
+        queued = controller.queued
+        controller.release(granted)
+        return queued, controller.in_flight
+
+    assert asyncio.run(run()) == (0, 0)
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, max_queue=5)
+        granted = await controller.acquire()
+        waiter = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        controller.release(granted)
+        return controller.in_flight, controller.queued
+
+    assert asyncio.run(run()) == (0, 0)
+
+
+def test_per_account_limits_are_forgotten_when_idle():
+    async def run():
+        admission = Admission(max_concurrency=4, per_account=1, max_queue=0)
+        ticket = await admission.admit("account-a")
+        with pytest.raises(Overloaded):
+            await admission.admit("account-a")
+        other = await admission.admit("account-b")
+        accounts = admission.stats()["accounts"]
+        ticket.release()
+        other.release()
+        ticket.release()
+        return accounts, admission.stats()
+
+    accounts, stats = asyncio.run(run())
+    assert accounts == 2
+    assert stats["accounts"] == 0
+    assert stats["global"]["in_flight"] == 0
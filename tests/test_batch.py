@@ -0,0 +1,196 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from grok_client import server
+from grok_client.batch import BatchRunner, iter_requests
+from grok_client.exceptions import GrokError
+
+
+def write_lines(path, lines):
+    path.write_text("".join(line + "\n" for line in lines))
+
+
+def read_results(path):
+    return {record["custom_id"]: record for record in map(json.loads, path.read_text().splitlines())}
+
+
+def request_line(custom_id, content="hi"):
+    return json.dumps({"custom_id": custom_id, "body": {"model": "grok-3", "messages": [{"role": "user", "content": content}]}})
+
+
+async def echo(body):
+    await asyncio.sleep(0.001)
+    return {"id": "chatcmpl-1", "echo": body["messages"][0]["content"]}
+
+
+def test_bad_lines_become_error_records(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_lines(source, [
+        request_line("a"),
+        '{"custom_id": "torn", "body": ',
+        "[1, 2]",
+        json.dumps({"custom_id": "b", "body": "not an object"}),
+        request_line("c"),
+    ])
+    runner = BatchRunner(echo, concurrency=3)
+    asyncio.run(runner.run(str(source), str(output)))
+
+    results = read_results(output)
+    assert set(results) == {"a", "line-2", "line-3", "b", "c"}
+    assert results["a"]["response"]["body"]["echo"] == "hi"
+    assert results["c"]["error"] is None
+    for custom_id in ("line-2", "line-3", "b"):
+        assert results[custom_id]["error"]["code"] == "invalid_request"
+    assert runner.request_counts() == {"total": 5, "completed": 2, "failed": 3}
+
+
+def test_rerun_skips_recorded_requests(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_lines(source, [request_line(str(i)) for i in range(10)])
+    asyncio.run(BatchRunner(echo, concurrency=4).run(str(source), str(output)))
+
+    runner = BatchRunner(echo, concurrency=4)
+    asyncio.run(runner.run(str(source), str(output)))
+    assert runner.skipped == 10
+    assert len(output.read_text().splitlines()) == 10
+
+
+def test_retryable_failures_are_retried(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_lines(source, [request_line("a"), request_line("b", "bad")])
+    attempts = []
+
+    async def flaky(body):
+        attempts.append(body["messages"][0]["content"])
+        if body["messages"][0]["content"] == "bad":
+            raise GrokError("bad request", status_code=400)
+        if attempts.count("hi") < 2:
+            raise GrokError("busy", status_code=503)
+        return {"id": "chatcmpl-1"}
+
+    asyncio.run(BatchRunner(flaky, concurrency=1, retry_backoff=0).run(str(source), str(output)))
+    results = read_results(output)
+    assert results["a"]["error"] is None
+    assert results["b"]["error"]["code"] == "GrokError"
+    assert attempts.count("hi") == 2 and attempts.count("bad") == 1
+
+
+def test_output_stays_open_until_every_worker_stops(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_lines(source, [request_line("fail"), request_line("slow")])
+    slow_cancelled = []
+
+    class Boom(BaseException):
+        pass
+
+    async def handler(body):
+        if body is not None and body["messages"][0]["content"] == "hi" and not slow_cancelled:
+            slow_cancelled.append(False)
+            await asyncio.sleep(0)
+            raise Boom()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            slow_cancelled.append(True)
+            raise
+        return {"id": "late"}
+
+    with pytest.raises(Boom):
+        asyncio.run(BatchRunner(handler, concurrency=2).run(str(source), str(output)))
+    assert slow_cancelled == [False, True]
+
+
+def test_iter_requests_accepts_bare_bodies(tmp_path):
+    source = tmp_path / "in.jsonl"
+    write_lines(source, ['{"model": "grok-3", "messages": []}', "", request_line("x")])
+    entries = list(iter_requests(str(source)))
+    assert entries[0] == ("line-1", {"model": "grok-3", "messages": []}, None)
+    assert entries[1][0] == "x" and entries[1][2] is None
+
+
+@pytest.fixture
+def batch_api(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "BATCH_DIR", str(tmp_path.resolve()))
+    monkeypatch.setattr(server, "BATCH_TOKEN", "secret")
+    monkeypatch.setattr(server, "batches", {})
+    monkeypatch.setattr(server, "run_chat_completion", lambda body, cookies=None: echo(body))
+    write_lines(tmp_path / "in.jsonl", [request_line("a")])
+    # One event loop for the whole test, so started batches keep running
+    with TestClient(server.app) as client:
+        yield client
+
+
+AUTH = {"Authorization": "Bearer secret", "Cookie": "sso=a"}
+
+
+def test_batches_are_disabled_without_a_directory(monkeypatch):
+    monkeypatch.setattr(server, "BATCH_DIR", None)
+    response = TestClient(server.app).post("/v1/batches", json={"input_file_id": "in.jsonl"}, headers=AUTH)
+    assert response.status_code == 404
+
+
+def test_batches_require_the_token(batch_api):
+    for headers in ({"Cookie": "sso=a"}, {"Authorization": "Bearer wrong", "Cookie": "sso=a"}):
+        assert batch_api.post("/v1/batches", json={"input_file_id": "in.jsonl"}, headers=headers).status_code == 401
+    assert batch_api.get("/v1/batches").status_code == 401
+
+
+@pytest.mark.parametrize("field, value", [
+    ("input_file_id", "/etc/passwd"),
+    ("input_file_id", "../in.jsonl"),
+    ("input_file_id", "sub/../../in.jsonl"),
+    ("output_file_id", "/tmp/out.jsonl"),
+    ("output_file_id", "../out.jsonl"),
+    ("output_file_id", "in.jsonl"),
+])
+def test_batch_files_must_stay_in_the_directory(batch_api, field, value):
+    body = {"input_file_id": "in.jsonl", field: value}
+    assert batch_api.post("/v1/batches", json=body, headers=AUTH).status_code == 400
+
+
+@pytest.mark.parametrize("body", [
+    {"input_file_id": "in.jsonl", "concurrency": 0},
+    {"input_file_id": "in.jsonl", "concurrency": "many"},
+    {"input_file_id": "in.jsonl", "concurrency": 2.5},
+    {"input_file_id": "in.jsonl", "max_retries": -1},
+    {"input_file_id": "in.jsonl", "max_retries": None},
+    ["in.jsonl"],
+])
+def test_invalid_batch_options_are_rejected(batch_api, body):
+    assert batch_api.post("/v1/batches", json=body, headers=AUTH).status_code == 400
+
+
+def test_undecodable_batch_body_is_rejected(batch_api):
+    assert batch_api.post("/v1/batches", content=b"{", headers=AUTH).status_code == 400
+
+
+def test_batch_escaping_through_a_symlink_is_rejected(batch_api, tmp_path):
+    (tmp_path / "link.jsonl").symlink_to("/etc/hostname")
+    assert batch_api.post("/v1/batches", json={"input_file_id": "link.jsonl"}, headers=AUTH).status_code == 400
+
+
+def test_batch_runs_inside_the_directory(batch_api, tmp_path):
+    created = batch_api.post("/v1/batches", json={"input_file_id": "in.jsonl"}, headers=AUTH)
+    assert created.status_code == 200
+    assert created.json()["output_file_id"] == "in.output.jsonl"
+    deadline = time.monotonic() + 5
+    while batch_api.get(f"/v1/batches/{created.json()['id']}", headers=AUTH).json()["status"] == "in_progress":
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert "a" in read_results(tmp_path / "in.output.jsonl")
+
+
+def test_finished_batches_are_forgotten(batch_api, monkeypatch):
+    monkeypatch.setattr(server, "BATCH_MAX_ENTRIES", 2)
+    monkeypatch.setattr(server, "BATCH_TTL", 60)
+    server.batches.update({
+        "old": {"id": "old", "completed_at": int(time.time()) - 120},
+        "done": {"id": "done", "completed_at": int(time.time())},
+        "running": {"id": "running", "completed_at": None},
+    })
+    server._prune_batches()
+    assert set(server.batches) == {"running"}
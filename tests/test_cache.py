@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+from grok_client.cache import ResponseCache, TieredCache
+from grok_client.shared_cache import SharedResponseCache
+
+
+def tiers(tmp_path):
+    back = SharedResponseCache(str(tmp_path / "cache.sqlite"))
+    calls = []
+    for name in ("lookup", "set"):
+        method = getattr(back, name)
+
+        def record(*args, _method=method, _name=name):
+            calls.append((_name, threading.current_thread() is threading.main_thread()))
+            return _method(*args)
+
+        setattr(back, name, record)
+    return TieredCache(ResponseCache(), back), calls
+
+
+def test_disk_tier_is_used_off_the_event_loop(tmp_path):
+    cache, calls = tiers(tmp_path)
+
+    async def run():
+        await cache.aset("key", "value " * 100)
+        # A front-tier hit never reaches the disk tier
+        front_hit = await cache.aget("key")
+        cache.front.clear()
+        disk_hit = await cache.aget("key")
+        miss = await cache.aget("other")
+        return front_hit, disk_hit, miss, await cache.astats()
+
+    front_hit, disk_hit, miss, stats = asyncio.run(run())
+    assert front_hit == disk_hit == "value " * 100
+    assert miss is None
+    assert calls == [("set", False), ("lookup", False), ("lookup", False)]
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert stats["disk"]["entries"] == 1
+    # The disk hit was copied to the front tier
+    assert cache.front.get("key") == "value " * 100
+
+
+def test_memory_cache_coroutines(tmp_path):
+    cache = ResponseCache()
+
+    async def run():
+        await cache.aset("key", "value")
+        return await cache.aget("key")
+
+    assert asyncio.run(run()) == "value"
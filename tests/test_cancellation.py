@@ -0,0 +1,99 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from grok_client import metrics
+from grok_client.server import app
+
+
+@pytest.fixture
+def upstream(fake_upstream, monkeypatch):
+    monkeypatch.setenv("GROK_API_URL", fake_upstream.url)
+    return fake_upstream
+
+
+async def post(body, disconnect):
+    """
+    POST a completion over raw ASGI, disconnecting the client as ``disconnect`` says
+
+    Args:
+        body (dict): The request body
+        disconnect (Callable[[List[dict]], Awaitable]): Returns once the
+            client should go away, given the messages sent so far
+
+    Returns:
+        List[dict]: The ASGI messages the app sent
+    """
+    sent = []
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": json.dumps(body).encode("utf-8"), "more_body": False}
+        await disconnect(sent)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/v1/chat/completions", "raw_path": b"/v1/chat/completions",
+        "query_string": b"", "root_path": "", "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 8000),
+        "headers": [(b"content-type", b"application/json"), (b"cookie", b"sso=cancelled")],
+    }
+    await app(scope, receive, send)
+    return sent
+
+
+def cancelled(stream):
+    return metrics.cancelled_requests.labels("grok-3", stream).value
+
+
+def body(content, **fields):
+    return {"model": "grok-3", "messages": [{"role": "user", "content": content}], **fields}
+
+
+def test_disconnect_cancels_a_stream(upstream):
+    # 16 tokens at 10 per second
+    upstream.config.token_rate = 10
+    before = cancelled("true")
+
+    async def after_first_chunk(sent):
+        while not any(m["type"] == "http.response.body" and m.get("body") for m in sent):
+            await asyncio.sleep(0.01)
+
+    started = time.perf_counter()
+    sent = asyncio.run(post(body("stream then leave", stream=True), after_first_chunk))
+    assert time.perf_counter() - started < 1.0
+    assert b"[DONE]" not in b"".join(m.get("body", b"") for m in sent)
+    assert cancelled("true") == before + 1
+
+
+def test_disconnect_cancels_a_completion(upstream):
+    upstream.config.latency_ms = 2000
+    before = cancelled("false")
+
+    async def soon(sent):
+        await asyncio.sleep(0.1)
+
+    started = time.perf_counter()
+    sent = asyncio.run(post(body("wait then leave"), soon))
+    assert time.perf_counter() - started < 1.0
+    assert sent[0]["status"] == 499
+    assert cancelled("false") == before + 1
+
+
+def test_passed_deadline_answers_504(upstream):
+    upstream.config.latency_ms = 2000
+    client = TestClient(app)
+    started = time.perf_counter()
+    response = client.post("/v1/chat/completions", json=body("too slow"),
+                           headers={"Cookie": "sso=cancelled", "X-Request-Timeout": "0.2"})
+    assert time.perf_counter() - started < 1.0
+    assert response.status_code == 504
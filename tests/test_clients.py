@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from grok_client import AsyncGrokClient, ConversationRef, GrokClient
+from grok_client.exceptions import GrokError
+from grok_client.resilience import RetryPolicy
+
+COOKIES = {"sso": "test", "sso-rw": "test"}
+
+
+def test_stream_matches_the_final_message(fake_upstream):
+    client = GrokClient(COOKIES, api_url=fake_upstream.url)
+    tokens = list(client.stream_message("hello"))
+    assert len(tokens) == 16
+    assert client.send_message("hello") == "".join(tokens)
+
+
+def test_async_stream_and_continuation(fake_upstream):
+    async def run():
+        client = AsyncGrokClient(COOKIES, api_url=fake_upstream.url)
+        conversation = ConversationRef()
+        first = [token async for token in client.stream_message("hello", conversation)]
+        conversation_id = conversation.conversation_id
+        second = await client.send_message("and then?", conversation)
+        return first, second, conversation_id, conversation
+
+    first, second, conversation_id, conversation = asyncio.run(run())
+    assert len(first) == 16
+    assert second
+    assert conversation_id
+    assert conversation.conversation_id == conversation_id
+
+
+def test_upstream_errors_are_raised(fake_upstream):
+    fake_upstream.config.error_rate = 1.0
+    fake_upstream.config.error_status = 400
+    client = GrokClient(COOKIES, api_url=fake_upstream.url, retry=RetryPolicy(max_attempts=1))
+    with pytest.raises(GrokError) as failed:
+        client.send_message("hello")
+    assert failed.value.status_code == 400
+
+
+def test_stream_errors_are_raised(fake_upstream):
+    fake_upstream.config.stream_error_rate = 1.0
+
+    async def run():
+        client = AsyncGrokClient(COOKIES, api_url=fake_upstream.url, retry=RetryPolicy(max_attempts=1))
+        return [token async for token in client.stream_message("hello")]
+
+    with pytest.raises(GrokError):
+        asyncio.run(run())
@@ -0,0 +1,39 @@
+from grok_client.context import ContextWindow, estimate_tokens, fit_messages
+
+
+def test_everything_fits():
+    messages = [("user", "hi"), ("assistant", "hello")]
+    assert fit_messages(messages, 1000) is messages
+    assert fit_messages(messages, 0) is messages
+
+
+def test_system_and_newest_messages_are_kept():
+    messages = [("system", "be brief")] + [("user", f"message {i} " + "x" * 400) for i in range(20)]
+    fitted = fit_messages(messages, 600)
+    assert fitted[0] == ("system", "be brief")
+    assert fitted[-1] == messages[-1]
+    assert "earlier messages omitted" in fitted[1][1]
+    assert sum(estimate_tokens(content) + 4 for _, content in fitted) <= 600
+
+
+def test_boundary_message_is_shortened():
+    messages = [("user", "old " * 2000), ("user", "new")]
+    fitted = fit_messages(messages, 400)
+    assert fitted[-1] == ("user", "new")
+    shortened = [content for _, content in fitted if content.startswith("old")]
+    assert shortened and shortened[0].endswith("[...]")
+    assert len(shortened[0]) < len(messages[0][1])
+
+
+def test_estimates():
+    assert estimate_tokens("abcd" * 10) == 10
+    assert estimate_tokens("你好") >= 2
+
+
+def test_context_window_stays_within_budget():
+    window = ContextWindow(max_tokens=300)
+    for index in range(50):
+        window.append({"role": "user", "content": f"turn {index} " + "y" * 200})
+    messages = window.messages()
+    assert messages[-1]["content"].startswith("turn 49")
+    assert sum(estimate_tokens(m["content"]) + 4 for m in messages) <= 300
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from grok_client.conversations import ConversationMap
+from grok_client.exceptions import GrokError
+from grok_client.server import ChatCompletionRequest, GrokAPI
+
+
+@pytest.fixture
+def upstream(fake_upstream, monkeypatch):
+    monkeypatch.setenv("GROK_API_URL", fake_upstream.url)
+    return fake_upstream
+
+
+def request(messages):
+    return ChatCompletionRequest(model="grok-3", messages=messages)
+
+
+def record(grok, lost=(), refs=None):
+    """Record (message, conversation continued) of every upstream request, failing those continuing ``lost``"""
+    stream_message = grok.client.stream_message
+    refs = [] if refs is None else refs
+    sent = []
+
+    async def gone():
+        raise GrokError("Conversation not found", status_code=404)
+        yield
+
+    def send(message, ref):
+        sent.append((message, ref.conversation_id))
+        # The ref is filled in as the reply streams
+        refs.append(ref)
+        if ref.conversation_id is not None and ref.conversation_id in lost:
+            return gone()
+        return stream_message(message, ref)
+
+    grok.client.stream_message = send
+    return sent
+
+
+async def converse(grok, *questions):
+    messages = []
+    for question in questions:
+        messages.append({"role": "user", "content": question})
+        response = await grok.chat_completion(request(messages))
+        messages.append(response.choices[0].message.model_dump())
+
+
+def test_follow_up_sends_only_the_new_message(upstream):
+    grok = GrokAPI({"Cookie": "sso=a"}, conversations=ConversationMap())
+    sent = record(grok)
+
+    asyncio.run(converse(grok, "hello", "and then?", "why?"))
+    assert sent[0][0].endswith("user: hello")
+    assert sent[0][1] is None
+    conversation = sent[1][1]
+    assert conversation is not None
+    assert sent[1:] == [("and then?", conversation), ("why?", conversation)]
+
+
+def test_lost_conversation_is_replayed_and_continued_afterwards(upstream):
+    grok = GrokAPI({"Cookie": "sso=a"}, conversations=ConversationMap())
+    lost = set()
+    refs = []
+    sent = record(grok, lost, refs)
+
+    async def run():
+        messages = [{"role": "user", "content": "hello"}]
+        for question in ("and then?", "why?"):
+            response = await grok.chat_completion(request(messages))
+            messages.append(response.choices[0].message.model_dump())
+            messages.append({"role": "user", "content": question})
+            if not lost:
+                # The upstream forgets the first conversation
+                lost.add(refs[0].conversation_id)
+        await grok.chat_completion(request(messages))
+
+    asyncio.run(run())
+    forgotten = sent[1][1]
+    assert sent[1] == ("and then?", forgotten)
+    # The failed continuation falls back to a full replay in a new conversation...
+    assert sent[2][1] is None
+    assert sent[2][0].endswith("and then?")
+    # ...which later turns continue rather than replaying everything again
+    assert sent[3][0] == "why?"
+    assert sent[3][1] not in (None, forgotten)
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from grok_client.grok_openai_client import AsyncGrokOpenAIClient
+
+
+class FakeCompletions(AsyncGrokOpenAIClient):
+    """Answers each prompt after the delay it names, tracking what is held at once"""
+
+    def __init__(self, delays):
+        super().__init__(sso_token="test", sso_rw_token="test", load_from_env=False)
+        self.delays = delays
+        self.started = 0
+        self.peak_outstanding = 0
+        self.yielded = 0
+
+    async def simple_completion(self, prompt, system_message=None, **kwargs):
+        self.started += 1
+        self.peak_outstanding = max(self.peak_outstanding, self.started - self.yielded)
+        await asyncio.sleep(self.delays[prompt])
+        if self.delays[prompt] < 0:
+            raise ValueError(prompt)
+        return prompt.upper()
+
+
+def run(coroutine_function):
+    return asyncio.run(coroutine_function())
+
+
+def test_ordered_results_behind_a_slow_request_stay_bounded():
+    prompts = ["slow"] + [f"fast-{i}" for i in range(20)]
+    client = FakeCompletions({"slow": 0.05, **{f"fast-{i}": 0 for i in range(20)}})
+
+    async def collect():
+        results = []
+        async for index, result in client.map_completions(prompts, concurrency=4):
+            results.append((index, result))
+            client.yielded += 1
+        await client.aclose()
+        return results
+
+    results = run(collect)
+    assert results == [(index, prompt.upper()) for index, prompt in enumerate(prompts)]
+    assert client.peak_outstanding <= 4
+
+
+def test_unordered_results_come_as_they_finish():
+    client = FakeCompletions({"slow": 0.05, "fast": 0})
+
+    async def collect():
+        results = [index async for index, _ in client.map_completions(["slow", "fast"], ordered=False)]
+        await client.aclose()
+        return results
+
+    assert run(collect) == [1, 0]
+
+
+def test_gather_keeps_input_order_and_exceptions():
+    client = FakeCompletions({"a": 0.02, "b": 0, "bad": -1})
+
+    async def collect():
+        results = await client.gather_completions(["a", "bad", "b"], return_exceptions=True)
+        await client.aclose()
+        return results
+
+    first, failed, last = run(collect)
+    assert (first, last) == ("A", "B")
+    assert isinstance(failed, ValueError)
+
+
+def test_concurrency_must_be_positive():
+    client = FakeCompletions({})
+
+    async def collect():
+        try:
+            return [result async for result in client.map_completions(["a"], concurrency=0)]
+        finally:
+            await client.aclose()
+
+    with pytest.raises(ValueError):
+        run(collect)
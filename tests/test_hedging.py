@@ -0,0 +1,91 @@
+import asyncio
+
+from grok_client.hedging import HedgePolicy
+
+
+class Upstream:
+    """A fake upstream stream that records whether it was started and closed early"""
+
+    def __init__(self, name, delay, tokens=("a", "b"), error=None):
+        self.name = name
+        self.delay = delay
+        self.tokens = tokens
+        self.error = error
+        self.started = False
+        self.finished = False
+        self.closed = False
+
+    async def stream(self):
+        self.started = True
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error is not None:
+                raise self.error
+            for token in self.tokens:
+                yield f"{self.name}:{token}"
+            self.finished = True
+        finally:
+            self.closed = True
+
+
+def run(policy, primary, hedge, on_hedge_won=None):
+    async def read():
+        return [token async for token in policy.stream(primary.stream, hedge.stream, on_hedge_won)]
+    return asyncio.run(read())
+
+
+def test_delay_follows_the_latency_percentile_within_bounds():
+    policy = HedgePolicy(percentile=90, min_delay=0.1, max_delay=5.0, min_samples=10)
+    for latency in range(1, 10):
+        policy.observe(latency / 10)
+    assert policy.delay() == 5.0
+
+    policy.observe(1.0)
+    assert policy.delay() == 1.0
+    for _ in range(100):
+        policy.observe(0.01)
+    assert policy.delay() == 0.1
+
+
+def test_fast_request_is_never_hedged():
+    policy = HedgePolicy(budget=1.0, max_delay=0.2)
+    primary, hedge = Upstream("primary", 0), Upstream("hedge", 0)
+    assert run(policy, primary, hedge) == ["primary:a", "primary:b"]
+    assert not hedge.started
+    assert policy.hedged == 0
+
+
+def test_slow_request_is_hedged_and_the_loser_cancelled():
+    policy = HedgePolicy(budget=1.0, max_delay=0.05)
+    primary, hedge = Upstream("primary", 10), Upstream("hedge", 0)
+    won = []
+    assert run(policy, primary, hedge, lambda: won.append(True)) == ["hedge:a", "hedge:b"]
+    assert won == [True]
+    assert primary.closed and not primary.finished
+    assert (policy.hedged, policy.won) == (1, 1)
+
+
+def test_original_request_wins_if_it_answers_first():
+    policy = HedgePolicy(budget=1.0, max_delay=0.05)
+    primary, hedge = Upstream("primary", 0.1), Upstream("hedge", 10)
+    assert run(policy, primary, hedge) == ["primary:a", "primary:b"]
+    assert hedge.started and hedge.closed and not hedge.finished
+    assert (policy.hedged, policy.won) == (1, 0)
+
+
+def test_budget_limits_how_many_requests_are_hedged():
+    policy = HedgePolicy(budget=0.5, max_delay=0.02, max_burst=1.0)
+    hedged = []
+    for _ in range(4):
+        primary, hedge = Upstream("primary", 0.05), Upstream("hedge", 10)
+        run(policy, primary, hedge)
+        hedged.append(hedge.started)
+    # Half a hedge is earned per request
+    assert hedged == [False, True, False, True]
+
+
+def test_failed_hedge_leaves_the_original_request_running():
+    policy = HedgePolicy(budget=1.0, max_delay=0.02)
+    primary, hedge = Upstream("primary", 0.1), Upstream("hedge", 0, error=RuntimeError("refused"))
+    assert run(policy, primary, hedge) == ["primary:a", "primary:b"]
+    assert hedge.closed
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import random
+
+import pytest
+
+from grok_client.exceptions import MalformedJSON
+from grok_client.json_stream import JSONScanner, scan_json
+
+VALUE = '{"name": "Paris", "population": -2.1e6, "tags": ["a\\"b", "\\u00e9"], "ok": true, "none": null}'
+
+
+def scan(tokens):
+    scanner = JSONScanner()
+    return "".join(scanner.feed(token) for token in tokens) + scanner.finish()
+
+
+def splits(text, seed):
+    rng = random.Random(seed)
+    cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, rng.randint(1, 12))))
+    return [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+
+@pytest.mark.parametrize("reply, expected", [
+    (VALUE, VALUE),
+    ("```json\n" + VALUE + "\n```", VALUE),
+    ("```" + VALUE + "```", VALUE),
+    ("Here it is:\n" + VALUE + "\nHope that helps!", VALUE),
+    ("  [1, 2, 3] and more", "[1, 2, 3]"),
+    # A bracket in the middle of a sentence is prose until proven otherwise
+    ('Sure, [note] {"a":1}', '{"a":1}'),
+    ('Sure, {"a":1} and {"b":2}', '{"a":1}'),
+    ("The set {x | x > 0} is open", json.dumps({"response": "The set {x | x > 0} is open"})),
+    ("a [b", json.dumps({"response": "a [b"})),
+    ("Just text.", json.dumps({"response": "Just text."})),
+    ("```\nJust text.\n```", json.dumps({"response": "Just text."})),
+    ("", ""),
+])
+def test_replies(reply, expected):
+    assert scan([reply]) == expected
+
+
+@pytest.mark.parametrize("reply", [
+    VALUE,
+    "```json\n" + VALUE + "\n```",
+    'Sure, [note] {"a": [1, 2.5e-3, "x"]} done',
+    "Text with [brackets] and no value",
+])
+def test_token_boundaries_do_not_matter(reply):
+    whole = scan([reply])
+    for seed in range(200):
+        assert scan(splits(reply, seed)) == whole
+    assert scan(list(reply)) == whole
+
+
+def test_streamed_value_is_passed_on_as_it_arrives():
+    scanner = JSONScanner()
+    assert scanner.feed("```json\n{\"a\": ") == '{"a": '
+    assert scanner.feed('"long str') == '"long str'
+    assert scanner.feed('ing"} trailing') == 'ing"}'
+    assert scanner.done
+
+
+def test_mid_line_value_is_held_until_it_closes():
+    scanner = JSONScanner()
+    assert scanner.feed('Sure: {"a": ') == ""
+    assert scanner.feed('[1]}') == '{"a": [1]}'
+    assert scanner.done
+
+
+@pytest.mark.parametrize("reply", [
+    '{"a": 1,}',
+    '{"a" 1}',
+    "[1, 2",
+    '{"a": tru}',
+    '\n{"a": "\x01"}',
+])
+def test_malformed_values_are_reported(reply):
+    with pytest.raises(MalformedJSON):
+        scan(splits(reply, 1) if len(reply) > 2 else [reply])
+
+
+def test_scan_json_stops_reading_after_the_value():
+    read = []
+
+    async def tokens():
+        for token in ["```json\n{", '"a": 1', "}\n```", " and then some"]:
+            read.append(token)
+            yield token
+
+    async def run():
+        return [piece async for piece in scan_json(tokens())]
+
+    assert "".join(asyncio.run(run())) == '{"a": 1}'
+    assert read[-1] == "}\n```"
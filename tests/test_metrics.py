@@ -0,0 +1,59 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from grok_client import metrics
+from grok_client.server import app
+
+
+@pytest.fixture
+def upstream(fake_upstream, monkeypatch):
+    monkeypatch.setenv("GROK_API_URL", fake_upstream.url)
+    return fake_upstream
+
+
+def sample(text, series):
+    """Value of one series in a /metrics page, 0 if it is absent"""
+    for line in text.splitlines():
+        if line.startswith(series + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.Registry()
+    histogram = registry.histogram("test_seconds", "Test latency", ("model",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5):
+        histogram.labels('a"b').observe(value)
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP test_seconds Test latency", "# TYPE test_seconds histogram"]
+    assert lines[2:] == [
+        'test_seconds_bucket{model="a\\"b",le="0.1"} 1',
+        'test_seconds_bucket{model="a\\"b",le="1"} 2',
+        'test_seconds_bucket{model="a\\"b",le="+Inf"} 3',
+        'test_seconds_sum{model="a\\"b"} 5.55',
+        'test_seconds_count{model="a\\"b"} 3',
+    ]
+
+
+def test_metrics_cover_each_request(upstream):
+    client = TestClient(app)
+    cookie = {"Cookie": "sso=metrics"}
+    messages = [{"role": "user", "content": "count me"}]
+
+    before = client.get("/metrics").text
+    client.post("/v1/chat/completions", json={"model": "grok-3", "messages": messages}, headers=cookie)
+    client.post("/v1/chat/completions", json={"model": "made-up", "messages": messages, "stream": True}, headers=cookie)
+    response = client.get("/metrics")
+    assert response.headers["content-type"] == metrics.CONTENT_TYPE
+
+    def added(series):
+        return sample(response.text, series) - sample(before, series)
+
+    assert added('grok_requests_total{model="grok-3",stream="false",status="200"}') == 1
+    # Unknown models are folded into one label value
+    assert added('grok_requests_total{model="other",stream="true",status="200"}') == 1
+    assert added('grok_request_duration_seconds_count{model="grok-3",stream="false"}') == 1
+    assert added('grok_time_to_first_token_seconds_count{model="other"}') == 1
+    assert added('grok_upstream_connect_seconds_count{account="default"}') == 2
+    assert sample(response.text, 'grok_active_streams{model="other"}') == 0
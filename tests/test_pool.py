@@ -0,0 +1,99 @@
+import asyncio
+
+import httpx
+
+from grok_client.pool import AsyncClientPool, SessionPool
+
+
+class Session:
+    def __init__(self, cookies):
+        self.cookies = cookies
+        self.closed = False
+
+
+class RecordingPool(SessionPool):
+    def _create(self, cookies):
+        return Session(cookies)
+
+    def _close(self, session):
+        session.closed = True
+
+
+def test_same_credential_gets_same_session():
+    pool = RecordingPool(max_size=2)
+    assert pool.get({"sso": "a"}) is pool.get({"sso": "a", "x-anonuserid": "rotated"})
+    assert pool.get({"sso": "b"}) is not pool.get({"sso": "a"})
+
+
+def test_lru_eviction_closes_idle_sessions():
+    pool = RecordingPool(max_size=1)
+    first = pool.get({"sso": "a"})
+    pool.get({"sso": "b"})
+    assert first.closed
+    assert len(pool) == 1
+
+
+def test_eviction_waits_for_sessions_in_use():
+    pool = RecordingPool(max_size=1)
+    with pool.lease({"sso": "a"}) as first:
+        with pool.lease({"sso": "b"}) as second:
+            assert len(pool) == 1
+            assert not first.closed
+        assert not second.closed
+        assert not first.closed
+    assert first.closed
+    # The evicted session is not handed out again
+    assert pool.get({"sso": "a"}) is not first
+
+
+def test_idle_timeout_skips_sessions_in_use():
+    pool = RecordingPool(max_size=4, idle_timeout=0.0)
+    with pool.lease({"sso": "a"}) as first:
+        pool.get({"sso": "b"})
+        assert not first.closed
+    idle = pool.get({"sso": "a"})
+    pool.get({"sso": "c"})
+    assert idle.closed
+
+
+def test_clear_defers_sessions_in_use():
+    pool = RecordingPool()
+    with pool.lease({"sso": "a"}) as first:
+        pool.clear()
+        assert not first.closed
+    assert first.closed
+
+
+def test_async_eviction_keeps_open_stream_alive(fake_upstream):
+    fake_upstream.config.token_rate = 100
+
+    async def run():
+        pool = AsyncClientPool(max_size=1)
+        try:
+            with pool.lease({"sso": "a"}) as client:
+                async with client.stream("POST", f"{fake_upstream.url}/conversations/new", json={"message": "hi"}) as response:
+                    chunks = response.aiter_bytes()
+                    first = await chunks.__anext__()
+                    # Another credential pushes this client out of the pool mid-stream
+                    with pool.lease({"sso": "b"}):
+                        pass
+                    rest = [chunk async for chunk in chunks]
+            return first + b"".join(rest)
+        finally:
+            await pool.aclose()
+
+    body = asyncio.run(run())
+    assert b"modelResponse" in body
+
+
+def test_async_pool_drops_clients_of_a_previous_loop():
+    pool = AsyncClientPool()
+
+    async def checkout():
+        return pool.get({"sso": "a"})
+
+    first = asyncio.run(checkout())
+    second = asyncio.run(checkout())
+    assert first is not second
+    assert len(pool) == 1
+    assert isinstance(second, httpx.AsyncClient)
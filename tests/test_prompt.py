@@ -0,0 +1,37 @@
+import pytest
+
+from grok_client import prompt
+from grok_client.prompt import DEFAULT_FINGERPRINT, fingerprint
+from grok_client.server import Function, Tool
+
+
+def schema(order):
+    properties = {"city": {"type": "string"}, "unit": {"type": "string", "enum": ["c", "f"]}}
+    parameters = {"type": "object", "properties": properties, "required": ["city"]}
+    if order == "reversed":
+        properties = dict(reversed(properties.items()))
+        parameters = dict(reversed({**parameters, "properties": properties}.items()))
+    return Function(name="get_weather", description="Weather of a city", parameters=parameters)
+
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(prompt, "orjson", None)
+    elif prompt.orjson is None:
+        pytest.skip("orjson is not installed")
+
+
+def test_key_order_does_not_change_the_fingerprint(encoder):
+    assert fingerprint([schema("sorted")]) == fingerprint([schema("reversed")])
+    tools = lambda order: [Tool(type="function", function=schema(order))]
+    assert fingerprint(tools=tools("sorted")) == fingerprint(tools=tools("reversed"))
+    assert fingerprint(response_format={"type": "json_object", "a": 1}) == \
+        fingerprint(response_format={"a": 1, "type": "json_object"})
+
+
+def test_fingerprints_tell_requests_apart(encoder):
+    assert fingerprint() == DEFAULT_FINGERPRINT
+    other = Function(name="get_time", description="Weather of a city", parameters=schema("sorted").parameters)
+    assert fingerprint([schema("sorted")]) != fingerprint([other])
+    assert fingerprint([schema("sorted")]) != fingerprint([schema("sorted")], {"type": "json_object"})
@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from grok_client.exceptions import CircuitOpen, GrokError, UpstreamUnavailable
+from grok_client.resilience import CircuitBreaker, RetryPolicy, error_class
+
+
+def test_circuit_opens_after_consecutive_outages():
+    breaker = CircuitBreaker("upstream", failure_threshold=3, reset_timeout=60)
+    for _ in range(3):
+        assert breaker.allow() is False
+        breaker.record(UpstreamUnavailable("down"))
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpen) as rejected:
+        breaker.allow()
+    assert rejected.value.retry_after >= 1
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker("upstream", failure_threshold=2)
+    breaker.record(UpstreamUnavailable("down"))
+    breaker.record()
+    breaker.record(UpstreamUnavailable("down"))
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_request_errors_are_not_outages():
+    breaker = CircuitBreaker("upstream", failure_threshold=1)
+    breaker.record(GrokError("bad request", status_code=400))
+    breaker.record(GrokError("rate limited", status_code=429))
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker("upstream", failure_threshold=1, reset_timeout=0.01)
+    breaker.record(GrokError("unavailable", status_code=503))
+    time.sleep(0.02)
+    assert breaker.allow() is True
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+    breaker.record()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() is False
+
+
+def test_failed_probe_reopens_and_abandoned_probe_frees_the_slot():
+    breaker = CircuitBreaker("upstream", failure_threshold=1, reset_timeout=0.01)
+    breaker.record(UpstreamUnavailable("down"))
+    time.sleep(0.02)
+    assert breaker.allow() is True
+    breaker.abandon()
+    assert breaker.allow() is True
+    breaker.record(UpstreamUnavailable("still down"))
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_retry_policy():
+    policy = RetryPolicy(max_attempts=3, base_delay=0.1, max_delay=0.5)
+    assert policy.should_retry(UpstreamUnavailable("down"), 1)
+    assert policy.should_retry(GrokError("busy", status_code=503), 2)
+    assert not policy.should_retry(GrokError("busy", status_code=503), 3)
+    assert not policy.should_retry(GrokError("bad", status_code=400), 1)
+    assert not policy.should_retry(CircuitOpen("open"), 1)
+    delays = policy.delays()
+    assert all(0.1 <= next(delays) <= 0.5 for _ in range(50))
+
+
+def test_error_class():
+    assert error_class(UpstreamUnavailable("down")) == "transport"
+    assert error_class(GrokError("x", status_code=502)) == "http_502"
+    assert error_class(GrokError("x")) == "stream"
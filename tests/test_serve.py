@@ -0,0 +1,87 @@
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+from grok_client import serve
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def uvicorn_run(monkeypatch):
+    """Record what grok-serve would start, and the shared cache the workers would see"""
+    uvicorn = pytest.importorskip("uvicorn")
+    calls = []
+
+    def run(app, **options):
+        path = os.environ.get("GROK_SHARED_CACHE")
+        calls.append(dict(options, app=app, shared_cache=path,
+                          private=path is not None and os.stat(os.path.dirname(path)).st_mode & 0o777))
+
+    monkeypatch.setattr(uvicorn, "run", run)
+    monkeypatch.delenv("GROK_SHARED_CACHE", raising=False)
+    return calls
+
+
+def test_workers_get_a_private_shared_cache_removed_on_exit(uvicorn_run):
+    serve.main(["--workers", "3", "--port", "8123"])
+    call = uvicorn_run[0]
+    assert (call["app"], call["workers"], call["port"]) == ("grok_client.server:app", 3, 8123)
+    assert call["private"] == 0o700
+    assert not os.path.exists(os.path.dirname(call["shared_cache"]))
+
+
+def test_single_worker_and_opt_out_keep_caches_per_worker(uvicorn_run, monkeypatch):
+    serve.main(["--workers", "1"])
+    monkeypatch.setenv("GROK_SHARED_CACHE", "/tmp/ignored.sqlite")
+    serve.main(["--workers", "2", "--no-shared-cache"])
+    assert [call["shared_cache"] for call in uvicorn_run] == [None, None]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_multi_worker_server_answers_from_a_shared_cache(fake_upstream, tmp_path):
+    pytest.importorskip("uvicorn")
+    port = free_port()
+    path = tmp_path / "shared.sqlite"
+    env = dict(os.environ, GROK_API_URL=fake_upstream.url, GROK_CACHE_ENABLED="true")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "grok_client.serve", "--workers", "2", "--port", str(port),
+         "--shared-cache", str(path), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        body = {"model": "grok-3", "messages": [{"role": "user", "content": "shared"}]}
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                response = httpx.post(f"http://127.0.0.1:{port}/v1/chat/completions", json=body,
+                                      headers={"Cookie": "sso=serve"}, timeout=10)
+                break
+            except httpx.TransportError:
+                assert time.monotonic() < deadline, "grok-serve did not start"
+                time.sleep(0.1)
+        assert response.status_code == 200
+        # From now on only the cache can answer; each request opens a new
+        # connection, so either worker may be the one to
+        fake_upstream.config.error_rate = 1.0
+        for _ in range(4):
+            again = httpx.post(f"http://127.0.0.1:{port}/v1/chat/completions", json=body,
+                               headers={"Cookie": "sso=serve"}, timeout=10)
+            assert again.json()["choices"][0]["message"] == response.json()["choices"][0]["message"]
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    with sqlite3.connect(path) as db:
+        assert db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 1
@@ -0,0 +1,135 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from grok_client import server
+from grok_client.cache import ResponseCache
+from grok_client.server import ChatCompletionRequest, GrokAPI, app
+
+
+@pytest.fixture
+def upstream(fake_upstream, monkeypatch):
+    monkeypatch.setenv("GROK_API_URL", fake_upstream.url)
+    return fake_upstream
+
+
+def request(**fields):
+    return ChatCompletionRequest(model="grok-3", messages=[{"role": "user", "content": "hello"}], **fields)
+
+
+async def read(stream):
+    return "".join([token async for token in stream])
+
+
+def test_stream_cache_hit_replays_the_live_stream(upstream):
+    cache = ResponseCache()
+
+    async def run():
+        grok = GrokAPI({"Cookie": "sso=a"}, cache=cache)
+        live = await read(grok.stream_tokens(request()))
+        cached = await read(grok.stream_tokens(request()))
+        completion = await grok.chat_completion(request())
+        return live, cached, completion
+
+    live, cached, completion = asyncio.run(run())
+    assert cached == live
+    assert live.endswith(" ")
+    assert cache.stats()["hits"] == 2
+    # Only the non-stream response is cleaned
+    assert completion.choices[0].message.content == live.strip()
+
+
+def test_cache_entries_follow_the_callers_cookies(upstream):
+    cache = ResponseCache()
+
+    async def run():
+        await GrokAPI({"Cookie": "sso=a"}, cache=cache).chat_completion(request())
+        await GrokAPI({"Cookie": "sso=b"}, cache=cache).chat_completion(request())
+        return cache.stats()
+
+    stats = asyncio.run(run())
+    assert stats["hits"] == 0
+    assert stats["entries"] == 2
+
+
+def test_no_credentials_is_refused_before_the_cache(upstream):
+    cache = ResponseCache()
+    asyncio.run(GrokAPI({"Cookie": "sso=a"}, cache=cache).chat_completion(request()))
+
+    with pytest.raises(HTTPException) as refused:
+        asyncio.run(GrokAPI(None, cache=cache).chat_completion(request()))
+    assert refused.value.status_code == 401
+    assert cache.stats()["hits"] == 0
+
+
+@pytest.mark.parametrize("body", [
+    {"messages": [{"role": "user", "content": "hello"}]},
+    {"model": "grok-3", "messages": "hello"},
+    ["not", "an", "object"],
+])
+def test_invalid_bodies_are_rejected_with_400(body):
+    response = TestClient(app).post("/v1/chat/completions", json=body, headers={"Cookie": "sso=a"})
+    assert response.status_code == 400
+    assert response.json()["detail"]
+
+
+def test_undecodable_body_is_rejected_with_400():
+    response = TestClient(app).post("/v1/chat/completions", content=b"{", headers={"Cookie": "sso=a"})
+    assert response.status_code == 400
+
+
+ENVELOPES = [
+    '{"function_call": {"name": "f", "arguments": {"a": 1}}}',
+    '```json\n{"function_call": {"name": "f", "arguments": "{\\"a\\": 1}"}}\n```',
+    '{"a": 1}',
+]
+FUNCTIONS = [{"name": "f", "parameters": {"type": "object"}}]
+
+
+async def _cache_reply(cache, chat_request, reply):
+    """Put a reply, scanned as it would have streamed, in the cache; the upstream only answers with words"""
+    grok = GrokAPI({"Cookie": "sso=a"}, cache=cache)
+    turn = await grok._match_turn(chat_request)
+    scanned = "".join([piece async for piece in grok._scanner(chat_request)(_tokens(reply))])
+    await cache.aset(grok._request_key(chat_request, turn.conversation), scanned)
+
+
+@pytest.mark.parametrize("reply", ENVELOPES)
+def test_legacy_function_call_envelope_is_unwrapped(upstream, reply):
+    cache = ResponseCache()
+    function_request = request(functions=FUNCTIONS, function_call={"name": "f"})
+
+    async def run():
+        await _cache_reply(cache, function_request, reply)
+        return await GrokAPI({"Cookie": "sso=a"}, cache=cache).chat_completion(function_request)
+
+    message = asyncio.run(run()).choices[0].message
+    assert json.loads(message.function_call["arguments"]) == {"a": 1}
+
+
+@pytest.mark.parametrize("reply", ENVELOPES)
+def test_streamed_function_call_envelope_is_unwrapped(upstream, monkeypatch, reply):
+    cache = ResponseCache()
+    body = {"model": "grok-3", "messages": [{"role": "user", "content": "hello"}],
+            "functions": FUNCTIONS, "function_call": {"name": "f"}, "stream": True}
+    asyncio.run(_cache_reply(cache, ChatCompletionRequest(**body), reply))
+    monkeypatch.setattr(server, "response_cache", cache)
+
+    response = TestClient(app).post("/v1/chat/completions", json=body, headers={"Cookie": "sso=a"})
+    calls = [chunk["choices"][0]["delta"].get("function_call") for chunk in _chunks(response.text)]
+    calls = [call for call in calls if call]
+    assert calls[0]["name"] == "f"
+    assert json.loads("".join(call["arguments"] for call in calls)) == {"a": 1}
+
+
+def _chunks(text):
+    return [json.loads(line[len("data: "):]) for line in text.splitlines()
+            if line.startswith("data: {")]
+
+
+async def _tokens(reply):
+    for index in range(0, len(reply), 5):
+        yield reply[index:index + 5]
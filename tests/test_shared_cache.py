@@ -0,0 +1,81 @@
+import asyncio
+import os
+import sqlite3
+import stat
+import threading
+
+from grok_client.client import ConversationRef
+from grok_client.serve import default_shared_cache
+from grok_client.shared_cache import SharedConversationMap, SharedResponseCache
+
+
+def counted(cache):
+    """Entry count and size from the table itself, to check the running totals against"""
+    return tuple(sqlite3.connect(cache.path).execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone())
+
+
+def test_running_totals_follow_the_table(tmp_path):
+    cache = SharedResponseCache(str(tmp_path / "cache.sqlite"), max_entries=1000)
+    for index in range(20):
+        cache.set(f"key-{index}", "x" * (index * 50))
+    # Replacing an entry must not count it twice
+    cache.set("key-3", "short")
+    cache.clear()
+    cache.set("key-0", "y" * 1000)
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"]) == counted(cache) == (1, stats["bytes"])
+    assert len(cache) == 1
+
+
+def test_limits_are_enforced_from_the_totals(tmp_path):
+    cache = SharedResponseCache(str(tmp_path / "cache.sqlite"), max_entries=8, max_bytes=10 ** 6)
+    for index in range(100):
+        cache.set(f"key-{index}", f"value {index}")
+    stats = cache.stats()
+    assert stats["entries"] <= 8 + 8
+    assert (stats["entries"], stats["bytes"]) == counted(cache)
+    assert cache.get("key-99") == "value 99"
+
+
+def test_totals_are_counted_for_an_existing_database(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    connection = sqlite3.connect(path)
+    connection.execute(SharedResponseCache.schema)
+    connection.execute("INSERT INTO responses VALUES ('a', x'00', 0, 7, 1e12, 0)")
+    connection.commit()
+    connection.close()
+    cache = SharedResponseCache(path)
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] == 7
+
+
+def test_coroutines_run_off_the_event_loop(tmp_path):
+    cache = SharedResponseCache(str(tmp_path / "cache.sqlite"))
+    conversations = SharedConversationMap(str(tmp_path / "cache.sqlite"))
+    threads = []
+    lookup = cache.lookup
+
+    def recording_lookup(key):
+        threads.append(threading.current_thread())
+        return lookup(key)
+
+    cache.lookup = recording_lookup
+
+    async def run():
+        await cache.aset("key", "value")
+        await conversations.aset("history", ConversationRef("c1", "r1", "account"))
+        return (await cache.aget("key"), (await cache.alookup("key"))[0],
+                await conversations.aget("history"), await cache.astats())
+
+    value, looked_up, ref, stats = asyncio.run(run())
+    assert value == looked_up == "value"
+    assert ref.conversation_id == "c1" and ref.account_key == "account"
+    assert stats["entries"] == 1 and stats["hits"] == 2
+    assert threads and all(thread is not threading.main_thread() for thread in threads)
+
+
+def test_default_database_is_private(tmp_path, monkeypatch):
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    first, second = default_shared_cache(8000), default_shared_cache(8000)
+    assert first != second
+    assert stat.S_IMODE(os.stat(os.path.dirname(first)).st_mode) == 0o700
@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+
+from grok_client.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_result():
+    async def run():
+        flights = SingleFlight()
+        calls = 0
+
+        async def call():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        results = await asyncio.gather(*(flights.do("key", call) for _ in range(5)))
+        return results, calls, flights.coalesced
+
+    results, calls, coalesced = asyncio.run(run())
+    assert results == ["answer"] * 5
+    assert calls == 1
+    assert coalesced == 4
+
+
+def test_failures_reach_every_caller_and_are_not_remembered():
+    async def run():
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failed")
+
+        results = await asyncio.gather(*(flights.do("key", fail) for _ in range(3)), return_exceptions=True)
+        retried = await flights.do("key", lambda: asyncio.sleep(0, result="ok"))
+        return results, retried
+
+    results, retried = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert retried == "ok"
+
+
+def test_call_is_cancelled_when_every_caller_gives_up():
+    async def run():
+        flights = SingleFlight()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def slow():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        caller = asyncio.ensure_future(flights.do("key", slow))
+        await started.wait()
+        caller.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        return True
+
+    assert asyncio.run(run())
+
+
+def test_streams_are_shared_and_replayed_to_late_readers():
+    async def run():
+        flights = SingleFlight()
+        upstreams = 0
+
+        async def tokens():
+            nonlocal upstreams
+            upstreams += 1
+            for token in ["a", "b", "c"]:
+                await asyncio.sleep(0.005)
+                yield token
+
+        async def read(delay):
+            await asyncio.sleep(delay)
+            return [token async for token in flights.stream("key", tokens)]
+
+        results = await asyncio.gather(read(0), read(0.007))
+        return results, upstreams
+
+    results, upstreams = asyncio.run(run())
+    assert results == [["a", "b", "c"], ["a", "b", "c"]]
+    assert upstreams == 1
+
+
+def test_stream_errors_reach_every_reader():
+    async def run():
+        flights = SingleFlight()
+
+        async def tokens():
+            yield "a"
+            await asyncio.sleep(0.005)
+            raise ValueError("stream failed")
+
+        async def read():
+            return [token async for token in flights.stream("key", tokens)]
+
+        return await asyncio.gather(read(), read(), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_reader_leaving_does_not_stop_the_others():
+    async def run():
+        flights = SingleFlight()
+
+        async def tokens():
+            for token in ["a", "b", "c"]:
+                await asyncio.sleep(0.005)
+                yield token
+
+        async def leave_early():
+            stream = flights.stream("key", tokens)
+            first = await stream.__anext__()
+            await stream.aclose()
+            return [first]
+
+        async def read_all():
+            return [token async for token in flights.stream("key", tokens)]
+
+        return await asyncio.gather(leave_early(), read_all())
+
+    assert asyncio.run(run()) == [["a"], ["a", "b", "c"]]
+
+
+@pytest.mark.parametrize("method", ["do", "stream"])
+def test_keys_are_forgotten_once_finished(method):
+    async def run():
+        flights = SingleFlight()
+        if method == "do":
+            await flights.do("key", lambda: asyncio.sleep(0, result=1))
+        else:
+            async def tokens():
+                yield "a"
+            [token async for token in flights.stream("key", tokens)]
+            await asyncio.sleep(0)
+        return flights._calls, flights._streams
+
+    calls, streams = asyncio.run(run())
+    assert not calls and not streams
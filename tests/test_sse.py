@@ -0,0 +1,92 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from grok_client.sse import DONE, ChunkSerializer, coalesce
+
+
+def event(data):
+    assert data.startswith(b"data: ") and data.endswith(b"\n\n")
+    return json.loads(data[len(b"data: "):])
+
+
+def test_chunks_share_one_id_and_escape_their_text():
+    serializer = ChunkSerializer("chatcmpl-1", "grok-3", created=123)
+    text = 'He said "hi"\nthen left é\U0001f600'
+    first, second = event(serializer.content(text)), event(serializer.content("more"))
+    assert first == {
+        "id": "chatcmpl-1", "object": "chat.completion.chunk", "created": 123, "model": "grok-3",
+        "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}],
+    }
+    assert second["id"] == first["id"]
+    assert second["choices"][0]["delta"] == {"content": "more"}
+
+
+def test_other_deltas_and_the_final_chunk():
+    serializer = ChunkSerializer("chatcmpl-1", "grok-3", created=123)
+    call = event(serializer.delta({"function_call": {"name": "f", "arguments": "{}"}}))
+    assert call["choices"] == [{"index": 0, "delta": {"function_call": {"name": "f", "arguments": "{}"}},
+                                "finish_reason": None}]
+    final = event(serializer.final("stop"))
+    assert final["choices"] == [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+    assert event(ChunkSerializer.error("boom")) == {"error": "boom"}
+    assert DONE == b"data: [DONE]\n\n"
+
+
+async def timed(tokens):
+    """Yield (token, delay before it) pairs"""
+    for token, delay in tokens:
+        await asyncio.sleep(delay)
+        yield token
+
+
+def batches(tokens, **options):
+    async def run():
+        return [batch async for batch in coalesce(timed(tokens), **options)]
+    return asyncio.run(run())
+
+
+def test_no_window_sends_every_token_on_its_own():
+    assert batches([("a", 0), ("b", 0), ("c", 0)], window=0) == [["a"], ["b"], ["c"]]
+
+
+def test_fast_tokens_share_a_batch_and_the_first_is_not_held():
+    assert batches([("a", 0), ("b", 0), ("c", 0), ("d", 0)], window=0.05) == [["a"], ["b", "c", "d"]]
+
+
+def test_batch_is_flushed_at_max_bytes():
+    tokens = [("a", 0)] + [("xx", 0)] * 4
+    assert batches(tokens, window=0.5, max_bytes=4) == [["a"], ["xx", "xx"], ["xx", "xx"]]
+
+
+def test_held_tokens_are_flushed_when_the_window_ends():
+    started = time.perf_counter()
+    seen = []
+
+    async def run():
+        async for batch in coalesce(timed([("a", 0), ("b", 0), ("c", 0.3)]), window=0.05):
+            seen.append((batch, time.perf_counter() - started))
+
+    asyncio.run(run())
+    assert [batch for batch, _ in seen] == [["a"], ["b"], ["c"]]
+    # "b" did not wait for "c" to arrive
+    assert seen[1][1] < 0.2
+
+
+def test_tokens_before_a_failure_are_delivered():
+    async def failing():
+        yield "a"
+        yield "b"
+        raise RuntimeError("upstream failed")
+
+    received = []
+
+    async def run():
+        async for batch in coalesce(failing(), window=0.05):
+            received.append(batch)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
+    assert received == [["a"], ["b"]]
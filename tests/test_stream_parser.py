@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from grok_client.exceptions import GrokError
+from grok_client.stream_parser import FrameParser, parse_frame
+
+
+def frame(data):
+    return (json.dumps(data) + "\n").encode("utf-8")
+
+
+BODY = b"".join([
+    frame({"result": {"conversation": {"conversationId": "c1"}}}),
+    frame({"result": {"response": {"userResponse": {"message": "hi"}}}}),
+    frame({"result": {"response": {"token": "Hel", "responseId": "r1"}}}),
+    frame({"result": {"response": {"token": "lo é", "responseId": "r1"}}}),
+    frame({"result": {"response": {"modelResponse": {"message": "Hello é"}}}}),
+])
+
+
+def parse(chunks):
+    parser = FrameParser()
+    frames = []
+    for chunk in chunks:
+        frames.extend(parser.feed(chunk))
+    return frames + parser.flush()
+
+
+def test_frames_of_interest_are_decoded():
+    frames = parse([BODY])
+    assert frames[0] == {"conversation": {"conversationId": "c1"}}
+    assert [f.get("token") for f in frames[1:3]] == ["Hel", "lo é"]
+    assert frames[3]["modelResponse"]["message"] == "Hello é"
+    # The echo of the user message is dropped without being decoded
+    assert len(frames) == 4
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+def test_chunk_boundaries_do_not_matter(size):
+    chunks = [BODY[i:i + size] for i in range(0, len(BODY), size)]
+    assert parse(chunks) == parse([BODY])
+
+
+def test_unterminated_last_line_is_flushed():
+    assert parse([BODY.rstrip(b"\n")]) == parse([BODY])
+
+
+def test_error_frame_raises():
+    with pytest.raises(GrokError):
+        parse([frame({"error": {"code": 13, "message": "boom"}})])
+
+
+def test_undecodable_line_is_skipped():
+    assert parse_frame(b'{"token": ') is None
+    assert parse_frame("") is None
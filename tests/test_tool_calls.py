@@ -0,0 +1,164 @@
+import asyncio
+import json
+import random
+
+import pytest
+
+from grok_client.exceptions import MalformedJSON
+from grok_client.tool_calls import FunctionCallParser, ToolCallParser, render_call, scan_tool_calls
+
+
+def parse(tokens, **options):
+    """Content and (name, arguments) calls read from a streamed reply"""
+    parser = ToolCallParser(**options)
+    events = [event for token in tokens for event in parser.feed(token)] + parser.finish()
+    content = "".join(event[1] for event in events if event[0] == "content")
+    calls = {}
+    for event in events:
+        if event[0] == "call":
+            assert event[1] not in calls
+            calls[event[1]] = [event[3], ""]
+        elif event[0] == "arguments":
+            calls[event[1]][1] += event[2]
+    return content, [tuple(calls[index]) for index in sorted(calls)], parser
+
+
+def splits(text, seed):
+    rng = random.Random(seed)
+    cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, rng.randint(1, 15))))
+    return [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+
+WEATHER = render_call("get_weather", '{"city": "Paris", "days": [1, 2]}')
+TIME = render_call("get_time", '{"zone": "CET"}')
+
+
+def test_plain_text_is_content():
+    content, calls, _ = parse(["Paris is ", "the capital."])
+    assert (content, calls) == ("Paris is the capital.", [])
+
+
+def test_reply_that_could_have_been_a_fence_is_content():
+    content, calls, _ = parse(["``", "`python\nprint(1)\n```"])
+    assert content == "```python\nprint(1)\n```" and calls == []
+
+
+@pytest.mark.parametrize("reply", [
+    WEATHER + "\n" + TIME,
+    "```json\n" + WEATHER + "\n" + TIME + "\n```\nDone.",
+    WEATHER + ", " + TIME + "\n",
+])
+def test_parallel_calls_survive_any_token_split(reply):
+    expected = [("get_weather", '{"city": "Paris", "days": [1, 2]}'), ("get_time", '{"zone": "CET"}')]
+    for seed in range(100):
+        content, calls, parser = parse(splits(reply, seed))
+        assert (content, calls) == ("", expected), seed
+    assert parse(list(reply))[1] == expected
+
+
+def test_arguments_stream_before_the_call_ends():
+    parser = ToolCallParser()
+    assert parser.feed('{"name": "get_weather", ') == []
+    events = parser.feed('"arguments": {"city": "Pa')
+    assert [event[0] for event in events] == ["call", "arguments"]
+    assert events[1][2] == '{"city": "Pa'
+    assert parser.feed('ris"}  }') == [("arguments", 0, 'ris"}')]
+
+
+def test_nothing_after_the_arguments_is_passed_on():
+    parser = ToolCallParser()
+    parser.feed('{"name": "f", "arguments": {"a": 1}')
+    assert parser.feed(', "extra": ') == []
+    assert parser.feed("1") == []
+    with pytest.raises(MalformedJSON):
+        parser.feed("}")
+
+
+def test_trailing_whitespace_stays_out_of_the_arguments():
+    _, calls, _ = parse(['{"name": "f", "arguments": {"a": 1}', "  \n ", "}"])
+    assert calls == [("f", '{"a": 1}')]
+
+
+def test_single_call_mode_stops_after_the_first_call():
+    content, calls, parser = parse([WEATHER + "\n" + TIME], parallel=False)
+    assert [name for name, _ in calls] == ["get_weather"]
+    assert parser.rest.strip() == TIME
+
+
+@pytest.mark.parametrize("reply, expected", [
+    # Arguments first: the call is only known once it closes
+    ('{"arguments": {"a": 1}, "name": "f"}', [("f", '{"a": 1}')]),
+    ('[{"name": "f", "arguments": {"a": 1}}, {"name": "g", "arguments": "{}"}]', [("f", '{"a": 1}'), ("g", "{}")]),
+    ('{"tool_calls": [{"function": {"name": "f", "arguments": "{\\"a\\": 1}"}}]}', [("f", '{"a": 1}')]),
+    ('{"function_call": {"name": "f", "arguments": {"a": 1}}}', [("f", '{"a": 1}')]),
+])
+def test_other_call_shapes(reply, expected):
+    assert parse(splits(reply, 7))[1] == expected
+
+
+def test_arguments_without_an_envelope_go_to_the_only_tool():
+    assert parse(['{"city": "Paris"}'], default="get_weather")[1] == [("get_weather", '{"city": "Paris"}')]
+    with pytest.raises(MalformedJSON):
+        parse(['{"city": "Paris"}'])
+
+
+def test_reply_cut_inside_a_call_is_malformed():
+    with pytest.raises(MalformedJSON):
+        parse(['{"name": "f", "arguments": {"a": '])
+
+
+def test_scan_tool_calls_stops_reading_after_the_last_call():
+    read = []
+
+    async def tokens():
+        for token in [WEATHER + "\n", TIME + "\n``", "`\nLet me know", " if you need more."]:
+            read.append(token)
+            yield token
+
+    async def run():
+        return "".join([piece async for piece in scan_tool_calls(tokens(), ToolCallParser())])
+
+    assert asyncio.run(run()) == WEATHER + "\n" + TIME + "\n"
+    assert len(read) == 2
+
+
+def test_scan_tool_calls_keeps_the_events_it_read():
+    parser = ToolCallParser()
+
+    async def tokens():
+        for token in splits(WEATHER + "\n" + TIME, 3):
+            yield token
+
+    async def run():
+        return [piece async for piece in scan_tool_calls(tokens(), parser)]
+
+    asyncio.run(run())
+    names = [event[3] for event in parser.events if event[0] == "call"]
+    assert names == ["get_weather", "get_time"]
+
+
+def function_arguments(tokens):
+    parser = FunctionCallParser()
+    pieces = [parser.feed(token) for token in tokens]
+    return pieces, "".join(pieces) + parser.finish()
+
+
+@pytest.mark.parametrize("reply", [
+    '{"function_call": {"name": "f", "arguments": {"city": "Paris", "days": [1, 2]}}}',
+    '{"city": "Paris", "days": [1, 2]}',
+])
+def test_function_arguments_survive_any_token_split(reply):
+    for seed in range(100):
+        assert json.loads(function_arguments(splits(reply, seed))[1]) == {"city": "Paris", "days": [1, 2]}, seed
+
+
+def test_function_arguments_stream_out_of_the_envelope():
+    pieces, arguments = function_arguments(['{"function_call": {"name": "f", "arguments": {"a": ', "1, ", '"b": 2}}}'])
+    assert pieces == ['{"a": ', "1, ", '"b": 2}']
+    assert arguments == '{"a": 1, "b": 2}'
+
+
+def test_function_arguments_as_a_string_are_unwrapped_at_the_end():
+    pieces, arguments = function_arguments(['{"function_call": {"arguments": ', '"{\\"a\\": 1}", "name": "f"}}'])
+    assert pieces == ["", ""]
+    assert arguments == '{"a": 1}'
@@ -0,0 +1,70 @@
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from grok_client import tracing
+from grok_client.server import app
+
+COOKIE = {"Cookie": "sso=tracing"}
+
+
+@pytest.fixture
+def upstream(fake_upstream, monkeypatch):
+    monkeypatch.setenv("GROK_API_URL", fake_upstream.url)
+    return fake_upstream
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    assert tracing.configure_trace(str(path))
+    yield path
+    for handler in list(tracing.trace_logger.handlers):
+        tracing.trace_logger.removeHandler(handler)
+        handler.close()
+
+
+def body(content, **fields):
+    return {"model": "grok-3", "messages": [{"role": "user", "content": content}], **fields}
+
+
+def phases(server_timing):
+    return [entry.split(";")[0] for entry in server_timing.split(", ")]
+
+
+def test_timer_spans_are_offsets_from_arrival():
+    started = time.perf_counter()
+    timer = tracing.RequestTimer("r1", started)
+    timer.span("decode", started + 0.001, started + 0.003)
+    assert timer.spans == [("decode", pytest.approx(0.001), pytest.approx(0.002))]
+    assert timer.server_timing().startswith("decode;dur=2.0, total;dur=")
+
+
+def test_response_carries_the_breakdown_and_the_trace_records_it(upstream, trace_file):
+    response = TestClient(app).post("/v1/chat/completions", json=body("time me"), headers=COOKIE)
+    assert response.status_code == 200
+    names = phases(response.headers["Server-Timing"])
+    for name in ("decode", "assemble", "upstream_connect", "upstream_first_token", "serialize"):
+        assert name in names
+    assert names[-1] == "total"
+
+    record = json.loads(trace_file.read_text().splitlines()[-1])
+    assert record["request_id"] == response.headers["X-Request-ID"]
+    assert (record["model"], record["stream"], record["status"]) == ("grok-3", False, 200)
+    assert [span["name"] for span in record["spans"]] == names[:-1]
+
+
+def test_stream_ends_with_a_timing_comment(upstream, trace_file):
+    response = TestClient(app).post("/v1/chat/completions", json=body("time my stream", stream=True), headers=COOKIE)
+    events = response.text.strip().split("\n\n")
+    assert events[-1] == "data: [DONE]"
+    assert events[-2].startswith(": server-timing ")
+    names = phases(events[-2][len(": server-timing "):])
+    assert "upstream_first_token" in names and "serialize" in names
+
+    record = json.loads(trace_file.read_text().splitlines()[-1])
+    assert record["request_id"] == response.headers["X-Request-ID"]
+    assert (record["stream"], record["status"]) == (True, 200)
+    assert record["tokens"] > 0